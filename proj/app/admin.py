@@ -1,28 +1,65 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import reverse
 from django.http import HttpResponseRedirect
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import gettext_lazy as _, ngettext
 
 from .models import Enrollment, Professor
-from .views import approve_enrollment, reject_enrollment
 from .forms import ProfessorCreationForm
+from . import allocation, seats, waitlist
+
+
+def _format_ids(ids, limit=100):
+    """
+    Comma-separated IDs for admin messages, cut off after `limit`.
+    """
+
+    shown = ', '.join(str(pk) for pk in ids[:limit])
+    if len(ids) > limit:
+        shown += _(" and %(count)d more") % {'count': len(ids) - limit}
+    return shown
+
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ('student', 'course', 'status', 'admin')
-    actions = ['approve_selected_enrollments']
+    # The admin column is nullable, so the admin's default select_related() skips it
+    # and __str__ would load the user row by row
+    list_select_related = ('student__user', 'course', 'admin')
+    actions = ['approve_selected_enrollments', 'allocate_by_merit']
 
     def approve_selected_enrollments(self, request, queryset):
-        for enrollment in queryset:
-            # Set the admin field to the currently logged-in admin user
-            enrollment.admin = request.user 
-            enrollment.save() 
-        
-        self.message_user(request, f"{len(queryset)} enrollment(s) approved successfully.")
+        # One lock and one UPDATE per course instead of a save() per row
+        report = seats.approve_many(queryset, admin=request.user)
+
+        self.message_user(request, ngettext(
+            "%(count)d enrollment approved: %(ids)s.",
+            "%(count)d enrollments approved: %(ids)s.",
+            len(report['approved']),
+        ) % {'count': len(report['approved']), 'ids': _format_ids(report['approved'])}, messages.SUCCESS)
+        if report['full']:
+            self.message_user(request, _(
+                "%(count)d left pending because the course is full: %(ids)s."
+            ) % {'count': len(report['full']), 'ids': _format_ids(report['full'])}, messages.WARNING)
+        if report['skipped']:
+            self.message_user(request, _(
+                "%(count)d skipped because they were not pending: %(ids)s."
+            ) % {'count': len(report['skipped']), 'ids': _format_ids(report['skipped'])}, messages.INFO)
         return HttpResponseRedirect(reverse('admin:app_enrollment_changelist'))
 
     approve_selected_enrollments.short_description = _("Approve selected enrollments")
 
+    def allocate_by_merit(self, request, queryset):
+        # Allocates whole courses, not just the selected rows, so the ranking is fair
+        course_ids = list(queryset.order_by().values_list('course_id', flat=True).distinct())
+        result = allocation.allocate_by_merit(course_ids=course_ids, admin=request.user)
+
+        self.message_user(request, _(
+            "Seats allocated by merit in %(courses)d course(s): %(approved)d approved, %(rejected)d rejected."
+        ) % {'courses': len(course_ids), 'approved': result['approved'], 'rejected': result['rejected']}, messages.SUCCESS)
+        return HttpResponseRedirect(reverse('admin:app_enrollment_changelist'))
+
+    allocate_by_merit.short_description = _("Allocate seats by merit in the selected enrollments' courses")
+
     def save_model(self, request, obj, form, change):
         """
         Intercept saving of enrollment model instance and perform additional actions.
@@ -42,14 +79,22 @@ class EnrollmentAdmin(admin.ModelAdmin):
         if not obj.admin:
             obj.admin = request.user
 
+        # An approval has to claim a seat first, so save the row with its
+        # previous status and let seats.approve() flip it atomically
+        approving = obj.status == Enrollment.APPROVED and 'status' in form.changed_data
+        if approving:
+            obj.status = form.initial.get('status', Enrollment.PENDING)
+
         # Call the parent class's save_model method to save the model instance
         super().save_model(request, obj, form, change)
 
         # Perform additional actions after saving the model instance
-        if obj.status == Enrollment.APPROVED:
-            approve_enrollment(request, obj)
-        elif obj.status == Enrollment.REJECTED:
-            reject_enrollment(request, obj)
+        if approving:
+            if seats.approve(obj, admin=request.user) == seats.COURSE_FULL:
+                self.message_user(request, _("Course is already full, enrollment was not approved."), messages.ERROR)
+        elif change and 'status' in form.changed_data and form.initial.get('status') == Enrollment.APPROVED:
+            # The enrollment lost its seat; hand it to the head of the waitlist
+            waitlist.free_seat(obj.course_id)
 
 
 @admin.register(Professor)
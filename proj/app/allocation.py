@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Course, CourseSeatShard, Enrollment
+from . import seats
+
+# Enrollment IDs per UPDATE ... WHERE id IN (...)
+WRITE_BATCH = 10000
+
+
+def _merit_order(application):
+    # Course first so each course's applicants are contiguous, then best score first;
+    # ties go to the earlier request
+    enrollment_id, course_id, score = application
+    return course_id, -score, enrollment_id
+
+
+def rank(applications, free_seats):
+    """
+    Split applications into admitted and rejected ones by merit.
+
+    All applications are ordered with one sort on (course, -average_score, enrollment id),
+    then each course admits its first `free_seats[course]` applicants.
+
+    Parameters:
+    - applications: iterable of (enrollment_id, course_id, average_score)
+    - free_seats: dict of course_id -> seats left
+
+    Returns:
+    - tuple: (admitted enrollment IDs, rejected enrollment IDs, dict of course_id -> number admitted)
+    """
+
+    admitted, rejected, per_course = [], [], {}
+    ordered = sorted(applications, key=_merit_order)
+    for course_id, group in groupby(ordered, key=itemgetter(1)):
+        ids = [application[0] for application in group]
+        seats_left = max(0, free_seats.get(course_id, 0))
+        admitted.extend(ids[:seats_left])
+        rejected.extend(ids[seats_left:])
+        per_course[course_id] = min(seats_left, len(ids))
+    return admitted, rejected, per_course
+
+
+def _set_status(ids, status, admin):
+    admin_id = admin.pk if admin else None
+    for start in range(0, len(ids), WRITE_BATCH):
+        Enrollment.objects.filter(pk__in=ids[start:start + WRITE_BATCH]).update(status=status, admin_id=admin_id)
+
+
+@contextmanager
+def _phase(timings, name):
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def allocate_by_merit(course_ids=None, admin=None, dry_run=False, timings=None):
+    """
+    Allocate the seats of courses to their pending applicants by average_score.
+
+    Runs in one transaction: the courses (and in sharded mode their seat shards, which
+    sharded approvals update without touching the course row) are locked, all pending
+    applications with the students' scores are read in one query, ranked with rank(), the
+    seats are claimed, and the approvals and rejections are written back in batches.
+
+    Parameters:
+    - course_ids: courses to allocate, all courses with pending applications by default
+    - admin: the user recorded on the approved and rejected enrollments
+    - dry_run: compute the allocation but roll it back
+    - timings: optional dict the seconds spent in each phase ('lock', 'read', 'rank' and
+      'write') are added to
+
+    Returns:
+    - dict: 'approved' and 'rejected' counts, and 'courses' mapping course_id -> number approved
+    """
+
+    with transaction.atomic():
+        pending = Enrollment.objects.filter(status=Enrollment.PENDING)
+        if course_ids is not None:
+            pending = pending.filter(course_id__in=course_ids)
+
+        sharded = seats.shard_count() > 1
+        with _phase(timings, 'lock'):
+            courses = {
+                course.pk: course
+                for course in Course.objects.select_for_update()
+                .filter(pk__in=pending.values('course_id')).order_by('pk')
+            }
+            taken = {}
+            if sharded:
+                # Locked before any enrollment row is written, the order seats.approve() takes them in
+                for course_id, shard_taken in (
+                    CourseSeatShard.objects.select_for_update().filter(course_id__in=courses)
+                    .order_by('course_id', 'shard').values_list('course_id', 'taken')
+                ):
+                    taken[course_id] = taken.get(course_id, 0) + shard_taken
+        free_seats = {
+            pk: course.max_capacity - taken.get(pk, course.current_capacity)
+            for pk, course in courses.items()
+        }
+
+        with _phase(timings, 'read'):
+            applications = list(
+                pending.filter(course_id__in=courses)
+                .values_list('id', 'course_id', 'student__average_score').iterator(chunk_size=10000)
+            )
+        with _phase(timings, 'rank'):
+            admitted, rejected, per_course = rank(applications, free_seats)
+
+        with _phase(timings, 'write'):
+            if sharded:
+                claimed = {pk: seats.claim_locked_seats(courses[pk], count) for pk, count in per_course.items() if count}
+                if any(claimed[pk] < count for pk, count in per_course.items() if count):
+                    # Fewer seats were claimed than counted: admit only as many as were claimed
+                    admitted, rejected, per_course = rank(applications, {pk: claimed.get(pk, 0) for pk in courses})
+            else:
+                changed = []
+                for pk, count in per_course.items():
+                    if count:
+                        courses[pk].current_capacity = F('current_capacity') + count
+                        changed.append(courses[pk])
+                Course.objects.bulk_update(changed, ['current_capacity'])
+
+            _set_status(admitted, Enrollment.APPROVED, admin)
+            _set_status(rejected, Enrollment.REJECTED, admin)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    return {'approved': len(admitted), 'rejected': len(rejected), 'courses': per_course}
@@ -0,0 +1,147 @@
+"""
+Native async versions of the read-heavy endpoints, routed instead of the DRF views
+when ASYNC_READ_VIEWS is on (proj/asgi.py turns it on).
+
+Under ASGI the request itself never occupies a worker thread. Django 5.0's async ORM
+still runs each query through the sync database driver on a thread, so every view
+keeps its database work to a single awaited call.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import catalog, hashing, views
+from .backend.authentication import aauthenticate
+from .instrumentation import query_budget
+from .models import Student, Subject, UserProfile
+from .pagination import StudentCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import StudentCourseSerializer, StudentSerializer, student_rows, subject_rows
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    # Same renderer as the DRF views, so the bytes match theirs
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status_code)
+
+
+async def _authenticated_user(request):
+    """
+    The request's user, or an error response if the token is missing or invalid.
+    """
+
+    try:
+        user = await aauthenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed) as e:
+        return None, _json({'detail': str(e)}, status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return None, _json({'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED)
+    return user, None
+
+
+async def login(request):
+    """
+    Log in with email and password, see views.login. The event loop stays free while
+    the password is checked on the bounded hashing executor.
+    """
+
+    if request.method != 'POST':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        data = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]).data
+    except ParseError as e:
+        return _json({'detail': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    user = await UserProfile.objects.filter(email=data.get('email')).afirst()
+    try:
+        correct = user is not None and await hashing.acheck_password(user, data.get('password'))
+    except hashing.HashingBusy as e:
+        return _json({'detail': str(e.detail)}, e.status_code)
+    if not correct:
+        return _json({'error': 'Invalid credentials'}, status.HTTP_401_UNAUTHORIZED)
+
+    # Stateless tokens read the user's student and professor rows
+    return _json(await sync_to_async(views.login_tokens)(user, data.get('stateless')))
+
+
+@query_budget(2)
+async def subject_list(request, course_id):
+    """
+    Retrieve subjects for the specified course ID, served from the versioned catalog cache.
+    """
+
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def build():
+        values = subject_rows.values(Subject.objects.filter(course_id=course_id).order_by('pk'))
+        return subject_rows.to_rows([row async for row in values])
+
+    return await catalog.acached_response(request, f'subjects:{course_id}', build)
+
+
+@query_budget(3)
+async def courses_and_subjects(request, id):
+    """
+    Retrieves courses and subjects for a student, see views.courses_and_subjects.
+    """
+
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    courses = [course async for course in views.student_courses(id)]
+
+    if courses:
+        return _json(StudentCourseSerializer(courses, many=True).data)
+    elif await Student.objects.filter(pk=id).aexists():
+        return _json({'message': 'No courses found for this student'})
+    else:
+        return _json({'error': 'Student not found'}, status.HTTP_404_NOT_FOUND)
+
+
+async def student_profile(request, id):
+    """
+    GET a student profile natively; PUT goes to the DRF view.
+    """
+
+    if request.method != 'GET':
+        return await sync_to_async(views.student_profile)(request, id=id)
+
+    user, error = await _authenticated_user(request)
+    if error is not None:
+        return error
+
+    # Check if the authenticated user is the owner of the profile being accessed
+    if user.id != id:
+        return _json({'error': 'You are not authorized to access this profile'}, status.HTTP_403_FORBIDDEN)
+
+    try:
+        student = await Student.objects.aget(pk=id)
+    except Student.DoesNotExist:
+        return _json({'error': 'Student profile not found'}, status.HTTP_404_NOT_FOUND)
+
+    return _json(StudentSerializer(student).data)
+
+
+@query_budget(2)
+async def student_list(request):
+    """
+    Get a page of students, keyset-paginated like views.student_list.
+    """
+
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    user, error = await _authenticated_user(request)
+    if error is not None:
+        return error
+
+    paginator = StudentCursorPagination()
+    # The paginator evaluates its one page query itself
+    page = await sync_to_async(paginator.paginate_queryset)(student_rows.values(Student.objects.all(), 'pk'), Request(request))
+    return _json(paginator.get_paginated_response(student_rows.to_rows(page)).data)
@@ -1,12 +1,31 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .. import hashing, revocation
 
 UserModel = get_user_model()
 
+# Claim marking a token whose role claims can be trusted without a database lookup
+STATELESS_CLAIM = 'stateless'
+# Claim on access tokens holding the JTI of the refresh token they were made from
+REFRESH_JTI_CLAIM = 'rjti'
+# Issue time with microseconds; `iat` has whole seconds, too coarse to tell a login from a
+# revocation in the same second. Access tokens inherit it from their refresh token.
+ISSUED_AT_CLAIM = 'issued_at'
+
 class EmailAuthBackend(object):
     def authenticate(self, request, email=None, password=None):
         try:
             user = UserModel.objects.get(email=email)
-            if user.check_password(password):
+            # PBKDF2 runs on the bounded hashing executor, not on the request thread
+            if hashing.check_password(user, password):
                 return user
             return None
         except UserModel.DoesNotExist:
@@ -17,3 +36,188 @@ class EmailAuthBackend(object):
             return UserModel.objects.get(pk=user_id)
         except UserModel.DoesNotExist:
             return None
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built only from the claims of a stateless token.
+    Role checks and ownership checks (request.user.id) never touch the database.
+    """
+
+    @cached_property
+    def is_student(self):
+        return self.token.get('is_student', False)
+
+    @cached_property
+    def is_professor(self):
+        return self.token.get('is_professor', False)
+
+    @cached_property
+    def is_admin(self):
+        # Professor.is_admin
+        return self.token.get('is_admin', False)
+
+    @cached_property
+    def student_id(self):
+        return self.token.get('student_id')
+
+    @cached_property
+    def professor_id(self):
+        return self.token.get('professor_id')
+
+
+def refresh_token_for(user):
+    """
+    RefreshToken.for_user() stamped with ISSUED_AT_CLAIM, so that revoke_tokens() in the
+    same second as the login does not revoke it.
+    """
+
+    refresh = RefreshToken.for_user(user)
+    refresh[ISSUED_AT_CLAIM] = refresh.current_time.timestamp()
+    return refresh
+
+
+def stateless_token_for(user):
+    """
+    Create a refresh token carrying the user's roles as claims. Access tokens made
+    from it (at login or through the refresh endpoint) copy those claims.
+
+    Parameters:
+    - user: the UserProfile to issue the token for
+
+    Returns:
+    - RefreshToken
+    """
+
+    # Missing reverse one-to-ones raise RelatedObjectDoesNotExist, an AttributeError
+    student = getattr(user, 'student', None)
+    professor = getattr(user, 'professor', None)
+
+    refresh = refresh_token_for(user)
+    refresh[STATELESS_CLAIM] = True
+    refresh['is_student'] = user.is_student or student is not None
+    refresh['is_professor'] = user.is_professor or professor is not None
+    refresh['is_staff'] = user.is_staff
+    refresh['is_superuser'] = user.is_superuser
+    refresh['is_admin'] = bool(professor and professor.is_admin)
+    refresh['student_id'] = student.pk if student else None
+    refresh['professor_id'] = professor.pk if professor else None
+    return refresh
+
+
+def access_token_for(refresh):
+    """
+    Access token for a refresh token, carrying the refresh token's JTI so that
+    revoking the refresh token (see revoke_token()) revokes the access token too.
+    """
+
+    access = refresh.access_token
+    access[REFRESH_JTI_CLAIM] = refresh[jwt_settings.JTI_CLAIM]
+    return access
+
+
+def revoke_token(token):
+    """
+    Revoke a single token, refresh or access, until it expires. Revoking a refresh token
+    also revokes the access tokens made from it by access_token_for().
+    """
+
+    jti = token.get(jwt_settings.JTI_CLAIM)
+    remaining = token.get('exp', 0) - timezone.now().timestamp()
+    if not jti or remaining <= 0:
+        return
+    if token.get(jwt_settings.TOKEN_TYPE_CLAIM) == 'refresh':
+        # An access token made just before the refresh token expires outlives it
+        remaining += settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+    revocation.revoke(f'jti:{jti}', True, remaining)
+
+
+def revoke_tokens(user_id):
+    """
+    Invalidate every token issued to the user so far, stateless or not.
+    Role claims go stale when a user's roles change; app.signals calls this then.
+    """
+
+    revocation.revoke(
+        f'user:{user_id}',
+        timezone.now().timestamp(),
+        settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds(),
+    )
+
+
+def _revocation_names(token):
+    names = [f"user:{token.get('user_id')}"]
+    for claim in (jwt_settings.JTI_CLAIM, REFRESH_JTI_CLAIM):
+        if token.get(claim):
+            names.append(f'jti:{token[claim]}')
+    return names
+
+
+def _revoked(token, found):
+    not_before = found.pop(f"user:{token.get('user_id')}", None)
+    if not_before is None:
+        return bool(found)
+    # Tokens without ISSUED_AT_CLAIM only have `iat`: one issued in the second of the
+    # revocation cannot be told apart from one issued just before it, and is revoked
+    issued_at = token.get(ISSUED_AT_CLAIM, token.get('iat', 0))
+    return bool(found) or issued_at < not_before
+
+
+def is_revoked(token):
+    """
+    Check the token against its own JTI, the JTI of the refresh token it was made from
+    and its user's revocation timestamp. Usually answered by app.revocation's Bloom
+    filter without any I/O; at most one cache read, never a database query.
+    """
+
+    return _revoked(token, revocation.lookup(_revocation_names(token)))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the UserProfile lookup for stateless tokens and
+    returns a ClaimsUser instead. Regular tokens still load the user row.
+    """
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise InvalidToken("Token has been revoked")
+
+        if validated_token.get(STATELESS_CLAIM):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a plain (non-DRF) async request the way StatelessJWTAuthentication does.
+    Stateless tokens need no database access; other tokens load the user with the async ORM.
+
+    Returns:
+    - the user, or None if the request carries no token
+
+    Raises:
+    - InvalidToken / AuthenticationFailed for bad, revoked or inactive-user tokens
+    """
+
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    token = authentication.get_validated_token(raw_token)
+
+    if _revoked(token, await revocation.alookup(_revocation_names(token))):
+        raise InvalidToken("Token has been revoked")
+
+    if token.get(STATELESS_CLAIM):
+        return ClaimsUser(token)
+    try:
+        user = await UserModel.objects.aget(pk=token['user_id'])
+    except (KeyError, UserModel.DoesNotExist):
+        raise InvalidToken("User not found")
+    if not user.is_active:
+        raise InvalidToken("User is inactive")
+    return user
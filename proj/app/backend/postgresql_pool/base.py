@@ -0,0 +1,108 @@
+"""
+PostgreSQL backend that takes connections from a per-process pool instead of opening
+one per request. Configure it in DATABASES:
+
+    'ENGINE': 'app.backend.postgresql_pool',
+    'POOL': {'MIN_SIZE': 2, 'MAX_SIZE': 20, 'TIMEOUT': 10, 'HEALTH_CHECK': True},
+
+Django still "closes" the connection at the end of each request (keep CONN_MAX_AGE
+at 0); closing hands it back to the pool.
+"""
+
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+from .pool import ConnectionPool
+
+if is_psycopg3:
+    raise ImproperlyConfigured("app.backend.postgresql_pool is built on psycopg2.pool and needs psycopg2.")
+
+DEFAULT_POOL = {'MIN_SIZE': 2, 'MAX_SIZE': 20, 'TIMEOUT': 10, 'HEALTH_CHECK': True}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """
+    The pool for a database alias and its connection parameters, created on first use.
+    """
+
+    key = (alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = {**DEFAULT_POOL, **settings_dict.get('POOL', {})}
+            pool = _pools[key] = ConnectionPool(
+                options['MIN_SIZE'], options['MAX_SIZE'], options['TIMEOUT'], options['HEALTH_CHECK'], **conn_params
+            )
+        return pool
+
+
+def close_pools(alias=None):
+    """
+    Close every pooled connection, for one alias or all of them.
+    """
+
+    with _pools_lock:
+        for key in [key for key in _pools if alias is None or key[0] == alias]:
+            _pools.pop(key).closeall()
+
+
+def pool_stats():
+    """
+    Stats of every pool in this process, keyed by database alias and database name.
+
+    Returns:
+    - dict: {'<alias>/<dbname>': ConnectionPool.stats()}
+    """
+
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {f"{alias}/{dict(params).get('dbname', '')}": pool.stats() for (alias, params), pool in pools}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would block DROP DATABASE
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def _pooled(self):
+        # Connections without a database (used to create and drop the test database) are not pooled
+        return self.alias != NO_DB_ALIAS
+
+    def get_new_connection(self, conn_params):
+        if not self._pooled():
+            return super().get_new_connection(conn_params)
+
+        # Same isolation level handling as the postgresql backend, applied to the pooled connection
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {options['isolation_level']} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        connection = self.pool.checkout()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self._pooled():
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.checkin(self.connection)
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+
+# Counters reported by ConnectionPool.stats()
+COUNTERS = ('connects', 'checkouts', 'waits', 'timeouts', 'evictions')
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    No connection became free within the checkout timeout. Subclasses OperationalError
+    so Django surfaces it as django.db.OperationalError.
+    """
+
+
+class ConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that blocks up to `timeout` seconds for a free connection
+    instead of raising as soon as `max_size` connections are out, checks connections
+    on checkout and counts what it does.
+
+    `min_size` connections are opened up front. Connections handed back are kept
+    for reuse up to `max_size`.
+    """
+
+    def __init__(self, min_size, max_size, timeout, health_check=True, **conn_params):
+        self.timeout = timeout
+        self.health_check = health_check
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._stats_lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._wait_seconds = 0.0
+        super().__init__(min_size, max_size, **conn_params)
+        # psycopg2 closes returned connections once `minconn` are idle, which would
+        # throw away every connection opened for a burst
+        self.minconn = self.maxconn
+
+    def _count(self, name, seconds=0.0):
+        with self._stats_lock:
+            self._counters[name] += 1
+            self._wait_seconds += seconds
+
+    def _connect(self, key=None):
+        connection = super()._connect(key)
+        # Same as Django's postgresql backend: skip psycopg2's JSON decoding, JSONField decodes itself
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        self._count('connects')
+        return connection
+
+    def _healthy(self, connection):
+        if connection.closed or connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def checkout(self):
+        """
+        Take a healthy connection from the pool, opening one if none is idle.
+
+        Raises:
+        - PoolTimeout if all `max_size` connections stay in use for `timeout` seconds
+        """
+
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise PoolTimeout(
+                    f"No database connection became free within {self.timeout}s "
+                    f"({self.maxconn} connections in use)"
+                )
+            self._count('waits', time.monotonic() - started)
+
+        try:
+            for _ in range(self.maxconn):
+                connection = self.getconn()
+                if self._healthy(connection):
+                    break
+                self._count('evictions')
+                self.putconn(connection, close=True)
+            else:
+                # Every idle connection was broken; a fresh one raises its own connection errors
+                connection = self.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._count('checkouts')
+        return connection
+
+    def checkin(self, connection):
+        """
+        Hand a connection back. Open transactions are rolled back; closed or lost
+        connections are dropped.
+        """
+
+        try:
+            if connection.closed or connection.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._count('evictions')
+            if not self.closed:
+                self.putconn(connection)
+            else:
+                connection.close()
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """
+        Counters since the pool was created plus current sizes.
+
+        Returns:
+        - dict: connects, checkouts, waits, timeouts, evictions, wait_seconds,
+          in_use, idle, max_size
+        """
+
+        with self._lock:
+            in_use, idle = len(self._used), len(self._pool)
+        with self._stats_lock:
+            stats = dict(self._counters, wait_seconds=round(self._wait_seconds, 6))
+        stats.update(in_use=in_use, idle=idle, max_size=self.maxconn)
+        return stats
@@ -0,0 +1,319 @@
+"""
+Endpoint benchmarks: a seeded dataset, one or more scenarios per route and a
+comparison against a stored baseline. Run them with `manage.py bench_endpoints`.
+
+Requests go through the full middleware stack in-process (django.test.Client), so the
+numbers measure the application and its queries rather than a web server.
+"""
+
+import random
+import re
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import Course, CourseType, Enrollment, Professor, Student, Subject, UserProfile
+from .test_runner import LOCAL_CACHES
+
+PASSWORD = 'bench-password'
+
+# Metrics compared against the baseline; all but rps are worse when they go up
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'queries')
+HIGHER_IS_BETTER = {'rps'}
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+Dataset = namedtuple('Dataset', 'courses students pending admin professor')
+
+# route: URL name the scenario covers; request(dataset, i) returns (method, path, data, user);
+# limit caps the measured requests of slow scenarios (the ones hashing passwords)
+Scenario = namedtuple('Scenario', 'name route request limit', defaults=[None])
+
+
+def add_database_arguments(parser):
+    """
+    The options of benchmark_database() for a benchmark command.
+    """
+
+    parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs')
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Run the block against a throwaway test database, set up as the test runner would, and
+    with a cache of its own (LOCAL_CACHES) so nothing a benchmark caches or clears reaches
+    the shared cache of a running deployment.
+    """
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        with override_settings(CACHES=LOCAL_CACHES):
+            yield
+    finally:
+        # Benchmarks running threads leave connections behind
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def seed(students=1000, courses=20, subjects_per_course=8, random_seed=0):
+    """
+    Create a benchmark dataset: courses with subjects, students spread over them, one
+    pending enrollment per student and an admin and a professor. All users share
+    PASSWORD, hashed once.
+
+    Returns:
+    - Dataset
+    """
+
+    rng = random.Random(random_seed)
+    password = make_password(PASSWORD)
+
+    course_type = CourseType.objects.create(name=f'Benchmark {random_seed}')
+    course_list = Course.objects.bulk_create([
+        Course(name=f'Benchmark course {i}', course_type=course_type, max_capacity=students + 1)
+        for i in range(courses)
+    ])
+    Subject.objects.bulk_create([
+        Subject(description=f'Subject {j} of {course.name}', course=course, ects_points=rng.randint(2, 8))
+        for course in course_list for j in range(subjects_per_course)
+    ])
+
+    users = UserProfile.objects.bulk_create([
+        UserProfile(email=f'bench.student{i}@example.com', password=password, is_student=True)
+        for i in range(students)
+    ])
+    student_list = Student.objects.bulk_create([
+        Student(user=user, course=course_list[i % courses], average_score=round(rng.uniform(2, 5), 2))
+        for i, user in enumerate(users)
+    ])
+    pending = Enrollment.objects.bulk_create([
+        Enrollment(student=student, course=course_list[i % courses])
+        for i, student in enumerate(student_list)
+    ])
+
+    admin = UserProfile.objects.create(
+        email='bench.admin@example.com', password=password, is_staff=True, is_superuser=True, is_professor=True,
+    )
+    Professor.objects.create(user=admin, is_admin=True)
+    professor = UserProfile.objects.create(email='bench.professor@example.com', password=password, is_professor=True)
+    Professor.objects.create(user=professor, is_admin=False)
+
+    return Dataset(course_list, student_list, pending, admin, professor)
+
+
+def _student(dataset, i):
+    return dataset.students[i % len(dataset.students)]
+
+
+def _course(dataset, i):
+    return dataset.courses[i % len(dataset.courses)]
+
+
+def _new_enrollment(dataset, i):
+    # Seeded enrollments pair student i with course i; shift by one so new requests do not collide
+    student = _student(dataset, i)
+    offset = 1 + i // len(dataset.students)
+    course = dataset.courses[(i + offset) % len(dataset.courses)]
+    return ('POST', f'/student/{student.pk}/course_enrollment/', {'course_id': course.pk}, student.user)
+
+
+def _registration(prefix):
+    def request(dataset, i):
+        return ('POST', f'/{prefix}/register/', {
+            'name': 'Bench', 'surname': f'User{i}', 'email': f'bench.{prefix}.{i}.{time.time_ns()}@example.com',
+            'password': PASSWORD,
+        }, None)
+    return request
+
+
+def _bulk_registration(dataset, i):
+    stamp = time.time_ns()
+    rows = [
+        {'name': 'Bench', 'surname': f'Row{j}', 'email': f'bench.bulk.{i}.{j}.{stamp}@example.com', 'password': PASSWORD}
+        for j in range(10)
+    ]
+    return ('POST', '/students/register/', rows, dataset.admin)
+
+
+SCENARIOS = [
+    Scenario('login', 'login', lambda d, i: (
+        'POST', '/login/', {'email': _student(d, i).user.email, 'password': PASSWORD}, None), 50),
+    Scenario('refresh_token', 'refresh_token', lambda d, i: (
+        'POST', '/refresh/', {'refresh': str(RefreshToken.for_user(_student(d, i).user))}, None)),
+    Scenario('logout', 'logout', lambda d, i: (
+        'POST', '/logout/', {'refresh': str(RefreshToken.for_user(_student(d, i).user))}, None)),
+    Scenario('student_registration', 'student_registration', _registration('student'), 50),
+    Scenario('bulk_student_registration', 'bulk_student_registration', _bulk_registration, 20),
+    Scenario('student_profile', 'student_profile', lambda d, i: (
+        'GET', f'/student/{_student(d, i).pk}/profile/', None, _student(d, i).user)),
+    Scenario('student_profile [PUT]', 'student_profile', lambda d, i: (
+        'PUT', f'/student/{_student(d, i).pk}/profile/', {'school': f'School {i % 7}'}, _student(d, i).user)),
+    Scenario('courses_and_subjects', 'courses_and_subjects', lambda d, i: (
+        'GET', f'/student/{_student(d, i).pk}/courses/', None, None)),
+    Scenario('course_enrollment', 'course_enrollment', _new_enrollment),
+    Scenario('student_list', 'student_list', lambda d, i: (
+        'GET', '/students/?page_size=100', None, _student(d, i).user)),
+    Scenario('export_data', 'export_data', lambda d, i: (
+        'GET', '/export/students/', None, d.admin)),
+    Scenario('database_pool_metrics', 'database_pool_metrics', lambda d, i: (
+        'GET', '/metrics/db-pool/', None, d.admin)),
+    Scenario('login_metrics', 'login_metrics', lambda d, i: (
+        'GET', '/metrics/login/', None, d.admin)),
+    Scenario('professor_registration', 'professor_registration', _registration('professor'), 50),
+    Scenario('professor_profile', 'professor_profile', lambda d, i: (
+        'GET', f'/professor/{d.professor.pk}/profile/', None, d.admin)),
+    Scenario('course_list', 'course_list', lambda d, i: (
+        'GET', '/courses/', None, None)),
+    Scenario('catalog_search', 'catalog_search', lambda d, i: (
+        'GET', f'/search/?q=course+{i % len(d.courses)}', None, None)),
+    Scenario('course_subjects', 'course_subjects', lambda d, i: (
+        'GET', f'/course/{_course(d, i).pk}/subjects/', None, None)),
+    Scenario('pending_enrollments', 'pending_enrollments', lambda d, i: (
+        'GET', f'/course/{_course(d, i).pk}/enrollments/pending/', None, d.admin)),
+    Scenario('claim_pending_enrollments', 'claim_pending_enrollments', lambda d, i: (
+        'POST', f'/course/{_course(d, i).pk}/enrollments/claim/', {'size': 20}, d.admin)),
+    Scenario('approve_enrollment', 'approve_enrollment', lambda d, i: (
+        'POST', f'/enrollment/{d.pending[i % len(d.pending)].pk}/change/', None, d.admin)),
+]
+
+
+def route_names():
+    """
+    Names of the routes in app/urls.py plus the top-level approval route.
+    """
+
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and getattr(pattern.urlconf_module, '__name__', '') == 'app.urls':
+            names.update(p.name for p in pattern.url_patterns if p.name)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def missing_routes():
+    """
+    Routes without a scenario; new routes must get one.
+    """
+
+    return sorted(route_names() - {scenario.route for scenario in SCENARIOS})
+
+
+class _Runner:
+
+    def __init__(self):
+        self.client = Client()
+        self.tokens = {}
+
+    def headers(self, user):
+        if user is None:
+            return {}
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(AccessToken.for_user(user))
+        return {'Authorization': f'Bearer {self.tokens[user.pk]}'}
+
+    def send(self, method, path, data, user):
+        kwargs = {'headers': self.headers(user)}
+        if data is not None:
+            kwargs.update(data=data, content_type='application/json')
+        response = getattr(self.client, method.lower())(path, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(dataset, requests=200, warmup=10, only=None):
+    """
+    Run every scenario (or those named in `only`) `requests` times, or up to its limit,
+    after `warmup` unmeasured runs.
+
+    Returns:
+    - dict: scenario name -> route, method, requests, errors (non-2xx responses),
+      p50_ms, p95_ms, p99_ms, mean_ms, rps and queries (median per request)
+    """
+
+    runner = _Runner()
+    results = {}
+    counter = 0
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only and scenario.route not in only:
+            continue
+
+        for _ in range(warmup):
+            runner.send(*scenario.request(dataset, counter))
+            counter += 1
+
+        count = min(requests, scenario.limit or requests)
+        latencies, queries, errors = [], [], 0
+        method = None
+        started = time.perf_counter()
+        for _ in range(count):
+            method, path, data, user = scenario.request(dataset, counter)
+            counter += 1
+            request_started = time.perf_counter()
+            response = runner.send(method, path, data, user)
+            latencies.append(time.perf_counter() - request_started)
+            match = _SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+            queries.append(int(match.group(1)) if match else 0)
+            if not 200 <= response.status_code < 300:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results[scenario.name] = {
+            'route': scenario.route,
+            'method': method,
+            'requests': count,
+            'errors': errors,
+            'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'rps': round(count / elapsed, 1) if elapsed else 0.0,
+            'queries': statistics.median(queries),
+        }
+    return results
+
+
+def regressions(results, baseline, thresholds):
+    """
+    Compare results with a baseline run.
+
+    Parameters:
+    - results, baseline: scenario name -> metrics, as returned by run()
+    - thresholds: metric -> allowed relative change, e.g. {'p95_ms': 0.25} allows p95 to grow by 25%
+
+    Returns:
+    - list of str: one line per metric that got worse by more than its threshold
+    """
+
+    found = []
+    for name, metrics in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, allowed in thresholds.items():
+            if metric not in metrics or metric not in before:
+                continue
+            old, new = before[metric], metrics[metric]
+            change = -allowed if metric in HIGHER_IS_BETTER else allowed
+            limit = old * (1 + change)
+            if (new < limit) if metric in HIGHER_IS_BETTER else (new > limit):
+                found.append(f'{name}: {metric} {old} -> {new} (allowed {change:+.0%})')
+    return found
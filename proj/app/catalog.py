@@ -0,0 +1,114 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .renderers import FastJSONRenderer
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_version():
+    """
+    Current catalog version. It is the time of the last change in microseconds,
+    which also gives responses their Last-Modified date.
+    """
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Cache was flushed or never set; start a fresh version so no old entry can match
+        version = time.time_ns() // 1000
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+async def aget_version():
+    """
+    Async get_version().
+    """
+
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = time.time_ns() // 1000
+        if not await cache.aadd(VERSION_KEY, version, timeout=None):
+            version = await cache.aget(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """
+    Start a new catalog version. Called whenever a CourseType, Course or Subject changes
+    (see app.signals); every cached catalog response is then out of date.
+    """
+
+    version = max(time.time_ns() // 1000, get_version() + 1)
+    cache.set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def _validators(version, name):
+    return f'"{version:x}-{name}"', version // 1_000_000
+
+
+def _response(body, etag, last_modified):
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Let clients keep the body but make them revalidate every time
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(request, name, build):
+    """
+    Serve a catalog response from the cache, rendered once per catalog version.
+
+    Clients revalidating with If-None-Match or If-Modified-Since get a 304 after a single
+    cache read, without any database or serialization work.
+
+    Parameters:
+    - request: the request object
+    - name: unique name of the response, e.g. 'subjects:3'
+    - build: callable returning the data to render when the cache has no entry
+
+    Returns:
+    - HttpResponse
+    """
+
+    version = get_version()
+    etag, last_modified = _validators(version, name)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    key = f'catalog:{version}:{name}'
+    body = cache.get(key)
+    if body is None:
+        body = FastJSONRenderer().render(build())
+        cache.set(key, body, timeout=getattr(settings, 'CATALOG_CACHE_TTL', 24 * 60 * 60))
+    return _response(body, etag, last_modified)
+
+
+async def acached_response(request, name, build):
+    """
+    Async cached_response(); `build` is a coroutine function.
+    """
+
+    version = await aget_version()
+    etag, last_modified = _validators(version, name)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    key = f'catalog:{version}:{name}'
+    body = await cache.aget(key)
+    if body is None:
+        body = FastJSONRenderer().render(await build())
+        await cache.aset(key, body, timeout=getattr(settings, 'CATALOG_CACHE_TTL', 24 * 60 * 60))
+    return _response(body, etag, last_modified)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+# Backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Token revocations (app.revocation), cached roles and the catalog version live in the
+    default cache. With a cache private to each process, a logout or a role change only
+    reaches the worker that handled it, so this is an error outside DEBUG.
+    """
+
+    backend = settings.CACHES.get('default', {}).get('BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    level, check_id = (Warning, 'app.W001') if settings.DEBUG else (Error, 'app.E001')
+    return [level(
+        f"The default cache ({backend.rsplit('.', 1)[-1]}) is not shared between worker processes.",
+        hint=(
+            "Revoked tokens stay valid on every other worker, and role and catalog changes "
+            "reach only one of them. Configure a shared cache such as Redis (REDIS_URL)."
+        ),
+        id=check_id,
+    )]
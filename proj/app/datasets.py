@@ -0,0 +1,258 @@
+"""
+Reproducible synthetic datasets for load testing, see `manage.py generate_dataset`.
+
+Rows are generated lazily from one seeded random.Random, so the same seed and sizes
+always give the same data, and loaded table by table: with COPY on PostgreSQL,
+with batched bulk_create elsewhere. Primary keys are assigned up front (after the
+current maximum) so foreign keys can be written without reading anything back.
+"""
+
+import bisect
+import csv
+import io
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import catalog, seats
+from .models import Course, CourseSeatShard, CourseType, Enrollment, Professor, Student, Subject, UserProfile
+
+PASSWORD = 'generated-password'
+
+FIRST_NAMES = ['Ana', 'Ivan', 'Marko', 'Petra', 'Luka', 'Maja', 'Josip', 'Ivana', 'Filip', 'Lucija', 'Karlo', 'Sara']
+LAST_NAMES = ['Horvat', 'Kovacevic', 'Babic', 'Maric', 'Juric', 'Novak', 'Knezevic', 'Vukovic', 'Markovic', 'Petrovic']
+PLACES = ['Zagreb', 'Split', 'Rijeka', 'Osijek', 'Zadar', 'Pula', 'Slavonski Brod', 'Karlovac', 'Varazdin', 'Sibenik']
+COURSE_AREAS = ['Informaticki', 'Elektrotehnicki', 'Strojarski', 'Gradevinski', 'Ekonomski', 'Pravni', 'Medicinski']
+COURSE_WORDS = ['Racunarstvo', 'Matematika', 'Fizika', 'Kemija', 'Biologija', 'Menadzment', 'Mehanika', 'Statistika']
+
+# Share of a course's expected demand it has seats for; popular courses fill up
+CAPACITY_RATIO = 0.6
+# Of the requests that can still get a seat, how many are already approved
+APPROVED_SHARE = 0.5
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_NULL = r'\N'
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def _copy_value(value):
+    if value is None:
+        return _NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _copy(model, columns, batch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    sql = (
+        f'COPY {quote(model._meta.db_table)} ({", ".join(quote(model._meta.get_field(c).column) for c in columns)}) '
+        f"FROM STDIN WITH (FORMAT csv, NULL '{_NULL}')"
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def load_rows(model, columns, rows, batch_size=100_000):
+    """
+    Insert rows into a model's table: COPY on PostgreSQL, bulk_create otherwise.
+
+    Parameters:
+    - model: the model class
+    - columns: field attnames, e.g. ['id', 'course_id', 'ects_points']
+    - rows: iterable of tuples in `columns` order; consumed lazily, batch by batch
+
+    Returns:
+    - int: number of rows inserted
+    """
+
+    use_copy = connection.vendor == 'postgresql'
+    total = 0
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        if use_copy:
+            _copy(model, columns, batch)
+        else:
+            model.objects.bulk_create([model(**dict(zip(columns, row))) for row in batch], batch_size=5_000)
+        total += len(batch)
+    return total
+
+
+def _zipf_weights(rng, count, skew):
+    # Popularity by rank, with ranks shuffled so course IDs say nothing about popularity
+    weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return weights
+
+
+def _pick_distinct(rng, ids, cum_weights, count):
+    picked = []
+    while len(picked) < count:
+        course_id = ids[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+        if course_id not in picked:
+            picked.append(course_id)
+    return picked
+
+
+def generate(random_seed=0, course_types=10, courses=200, subjects_per_course=8, students=10_000,
+             professors=100, enrollments=None, skew=1.1, batch_size=100_000, log=None):
+    """
+    Generate and load a dataset in one transaction.
+
+    Course popularity follows a Zipf distribution (`skew`): a few courses get most of
+    the enrollment requests and fill up, with the rest of their requests pending,
+    rejected or waitlisted; current_capacity, and the seat shards when SEAT_COUNTER_SHARDS > 1,
+    match the approved requests.
+    Every generated user has the password PASSWORD, hashed once.
+
+    Parameters:
+    - random_seed: same seed and sizes, same data; emails carry the seed, so a seed loads once per database
+    - enrollments: total enrollment requests, defaults to 5 per student (at most one per student and course)
+    - log: optional callable receiving progress lines
+
+    Returns:
+    - dict: model name -> rows inserted
+    """
+
+    log = log or (lambda line: None)
+    enrollments = students * 5 if enrollments is None else enrollments
+    if students and enrollments > students * courses:
+        raise ValueError("More enrollments than student/course pairs.")
+    if UserProfile.objects.filter(email__startswith=f'gen{random_seed}.').exists():
+        raise ValueError(f"A dataset with seed {random_seed} is already loaded.")
+
+    rng = random.Random(random_seed)
+    password = make_password(PASSWORD)
+    counts = {}
+
+    with transaction.atomic():
+        type_start, course_start, subject_start = _next_id(CourseType), _next_id(Course), _next_id(Subject)
+        user_start, enrollment_start = _next_id(UserProfile), _next_id(Enrollment)
+
+        type_ids = list(range(type_start, type_start + course_types))
+        course_ids = list(range(course_start, course_start + courses))
+        weights = _zipf_weights(rng, courses, skew)
+        cum_weights = list(itertools.accumulate(weights))
+        capacity = {
+            course_id: max(10, round(enrollments * weight / cum_weights[-1] * CAPACITY_RATIO))
+            for course_id, weight in zip(course_ids, weights)
+        }
+
+        counts['CourseType'] = load_rows(CourseType, ['id', 'name'], (
+            (type_id, f'{COURSE_AREAS[i % len(COURSE_AREAS)]} {random_seed}-{i}')
+            for i, type_id in enumerate(type_ids)
+        ), batch_size)
+        counts['Course'] = load_rows(Course, ['id', 'name', 'course_type_id', 'max_capacity', 'current_capacity'], (
+            (course_id, f'{COURSE_WORDS[i % len(COURSE_WORDS)]} {i}', type_ids[i % course_types], capacity[course_id], 0)
+            for i, course_id in enumerate(course_ids)
+        ), batch_size)
+        counts['Subject'] = load_rows(Subject, ['id', 'description', 'course_id', 'ects_points'], (
+            (subject_start + i * subjects_per_course + j, f'Subject {j + 1}', course_id, rng.choice((2, 4, 5, 6, 8)))
+            for i, course_id in enumerate(course_ids) for j in range(subjects_per_course)
+        ), batch_size)
+        log(f"Loaded {courses} courses of {course_types} types with {counts['Subject']} subjects")
+
+        user_columns = [
+            'id', 'password', 'is_superuser', 'first_name', 'last_name', 'date_joined',
+            'email', 'is_active', 'is_staff', 'is_student', 'is_professor',
+        ]
+        professor_start = user_start + students
+
+        def users():
+            for i in range(students + professors):
+                is_professor = i >= students
+                # Every tenth professor is an admin
+                is_admin = is_professor and (i - students) % 10 == 0
+                role, number = ('professor', i - students) if is_professor else ('student', i)
+                yield (
+                    user_start + i, password, False, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                    _EPOCH + timedelta(minutes=i), f'gen{random_seed}.{role}{number}@example.com',
+                    True, is_admin, not is_professor, is_professor,
+                )
+
+        counts['UserProfile'] = load_rows(UserProfile, user_columns, users(), batch_size)
+        counts['Student'] = load_rows(Student, ['user_id', 'course_id', 'place_of_birth', 'school', 'average_score'], (
+            (
+                user_start + i, _pick_distinct(rng, course_ids, cum_weights, 1)[0], rng.choice(PLACES),
+                f'Gimnazija {rng.randint(1, 20)}', Decimal(rng.randint(200, 500)) / 100,
+            )
+            for i in range(students)
+        ), batch_size)
+        counts['Professor'] = load_rows(Professor, ['user_id', 'is_admin'], (
+            (professor_start + i, i % 10 == 0) for i in range(professors)
+        ), batch_size)
+        log(f"Loaded {students} students and {professors} professors")
+
+        admins = [professor_start + i for i in range(0, professors, 10)] or [None]
+        approved = dict.fromkeys(course_ids, 0)
+
+        def enrollment_rows():
+            per_student, extra = divmod(enrollments, students) if students else (0, 0)
+            enrollment_id = enrollment_start
+            for i in range(students):
+                for course_id in _pick_distinct(rng, course_ids, cum_weights, per_student + (i < extra)):
+                    if approved[course_id] < capacity[course_id]:
+                        status = Enrollment.APPROVED if rng.random() < APPROVED_SHARE else Enrollment.PENDING
+                    else:
+                        status = Enrollment.WAITLISTED if rng.random() < 0.5 else Enrollment.REJECTED
+                    admin = None
+                    if status in (Enrollment.APPROVED, Enrollment.REJECTED):
+                        admin = rng.choice(admins)
+                    if status == Enrollment.APPROVED:
+                        approved[course_id] += 1
+                    yield (enrollment_id, user_start + i, course_id, status, admin, 0)
+                    enrollment_id += 1
+
+        counts['Enrollment'] = load_rows(
+            Enrollment, ['id', 'student_id', 'course_id', 'status', 'admin_id', 'waitlist_priority'],
+            enrollment_rows(), batch_size,
+        )
+        log(f"Loaded {counts['Enrollment']} enrollments")
+
+        # Seats taken are the approved requests
+        Course.objects.bulk_update(
+            [Course(pk=course_id, current_capacity=taken) for course_id, taken in approved.items() if taken],
+            ['current_capacity'], batch_size=1_000,
+        )
+        shards = seats.shard_count()
+        if shards > 1:
+            # Sharded approvals claim seats on the shards, which must hold the same count
+            counts['CourseSeatShard'] = load_rows(CourseSeatShard, ['course_id', 'shard', 'capacity', 'taken'], (
+                (course_id, index, shard_capacity, taken)
+                for course_id in course_ids
+                for index, (shard_capacity, taken) in enumerate(
+                    seats.shard_layout(capacity[course_id], approved[course_id], shards)
+                )
+            ), batch_size)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [CourseType, Course, Subject, UserProfile, Enrollment]):
+                cursor.execute(sql)
+
+    # Bulk loads send no signals, so cached catalog responses must be dropped here
+    catalog.bump_version()
+
+    if connection.vendor == 'postgresql':
+        # Fresh statistics so the planner knows about the new rows right away
+        with connection.cursor() as cursor:
+            for model in (CourseType, Course, CourseSeatShard, Subject, UserProfile, Student, Professor, Enrollment):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    return counts
@@ -0,0 +1,82 @@
+import csv
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Enrollment, Student
+
+# Rows fetched per round trip. On PostgreSQL QuerySet.iterator() reads through a
+# server-side cursor, so only this many rows are held in memory at a time.
+CHUNK_SIZE = 2000
+
+# name -> (queryset factory, exported columns)
+DATASETS = {
+    'students': (
+        lambda: Student.objects.order_by('pk'),
+        ['user_id', 'user__email', 'user__first_name', 'user__last_name',
+         'course_id', 'school', 'place_of_birth', 'average_score'],
+    ),
+    'enrollments': (
+        lambda: Enrollment.objects.order_by('pk'),
+        ['id', 'student_id', 'course_id', 'status', 'admin_id'],
+    ),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class _Echo:
+    """
+    File-like object whose write() just hands the line back, so csv.writer can
+    format rows one at a time without buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _rows(dataset, chunk_size):
+    queryset, columns = DATASETS[dataset]
+    return columns, queryset().values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def _batched(lines, size):
+    # Join lines into chunk-sized blocks so the response is not written row by row
+    while True:
+        block = ''.join(islice(lines, size))
+        if not block:
+            return
+        yield block
+
+
+def stream(dataset, output='ndjson', chunk_size=CHUNK_SIZE):
+    """
+    Yield a dataset as blocks of NDJSON or CSV text.
+
+    Parameters:
+    - dataset: one of DATASETS
+    - output: 'ndjson' or 'csv'
+    - chunk_size: rows fetched from the database (and written out) per block
+
+    Returns:
+    - generator of str
+    """
+
+    columns, rows = _rows(dataset, chunk_size)
+    # Export plain column names, e.g. 'user__email' -> 'email'
+    header = [column.rsplit('__', 1)[-1] for column in columns]
+
+    if output == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow(row) for row in rows)
+        yield writer.writerow(header)
+    else:
+        encoder = DjangoJSONEncoder()
+        lines = (encoder.encode(dict(zip(header, row))) + '\n' for row in rows)
+
+    yield from _batched(lines, chunk_size)
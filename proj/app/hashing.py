@@ -0,0 +1,190 @@
+"""
+Password verification on a dedicated, size-bounded thread pool.
+
+PBKDF2 is pure CPU work; run on request threads, a login burst occupies every worker
+and starves the other endpoints. Here at most LOGIN_HASH_WORKERS checks run at
+once (hashlib releases the GIL, so that is also the number of cores logins can
+use) and at most LOGIN_HASH_QUEUE more wait for a thread. A check that cannot get
+a queue slot, or waits longer than LOGIN_HASH_QUEUE_TIMEOUT seconds for a thread,
+fails fast with HashingBusy (503) instead of piling up.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+
+
+class HashingExecutor:
+    """
+    Bounded executor for password checks with queue metrics.
+
+    Parameters:
+    - workers: threads checking passwords
+    - queue_size: checks that may wait for a thread; more are rejected right away
+    - timeout: seconds a check may wait for a thread before it is dropped
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers, self.queue_size, self.timeout = workers, queue_size, timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ('submitted', 'completed', 'rejected', 'timeouts', 'queued', 'running', 'wait_seconds', 'wait_max_seconds'), 0,
+        )
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, change in changes.items():
+                self._stats[name] += change
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count(rejected=1)
+            raise HashingBusy()
+        self._count(submitted=1, queued=1)
+        queued_at = time.monotonic()
+
+        def run():
+            wait = time.monotonic() - queued_at
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['running'] += 1
+                self._stats['wait_seconds'] += wait
+                self._stats['wait_max_seconds'] = max(self._stats['wait_max_seconds'], wait)
+            try:
+                return fn(*args)
+            finally:
+                self._count(running=-1, completed=1)
+
+        future = self._executor.submit(run)
+        # Runs for cancelled checks too, so every slot is given back
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def _give_up(self, future):
+        # Still waiting for a thread: drop it. Already running: the caller waits for the result.
+        if future.cancel():
+            self._count(queued=-1, timeouts=1)
+            raise HashingBusy()
+
+    def call(self, fn, *args):
+        """
+        Run fn(*args) on the pool and wait for the result.
+        """
+
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._give_up(future)
+            return future.result()
+
+    async def acall(self, fn, *args):
+        """
+        Async call(); the event loop is free while the check waits and runs.
+        """
+
+        future = self._submit(fn, *args)
+        result = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), self.timeout)
+        except asyncio.TimeoutError:
+            self._give_up(future)
+            return await result
+
+    def stats(self):
+        """
+        Returns:
+        - dict: workers, queue_size, queued and running checks, and counters of submitted,
+          completed, rejected (queue full) and timed-out checks and of seconds spent waiting for a thread
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 6)
+        stats['wait_max_seconds'] = round(stats['wait_max_seconds'], 6)
+        return {'workers': self.workers, 'queue_size': self.queue_size, **stats}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    This process's executor, created from the LOGIN_HASH_* settings on first use.
+    """
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor(
+                getattr(settings, 'LOGIN_HASH_WORKERS', None) or max(1, (os.cpu_count() or 2) // 2),
+                getattr(settings, 'LOGIN_HASH_QUEUE', 64),
+                getattr(settings, 'LOGIN_HASH_QUEUE_TIMEOUT', 2.0),
+            )
+        return _executor
+
+
+def reset_executor():
+    """
+    Drop the executor so the next check builds one from the current settings.
+    """
+
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+
+
+def _check(password, encoded):
+    # Runs on the executor and never touches the database: an outdated hash is
+    # re-hashed here and handed back for the caller to save
+    upgraded = []
+    correct = hashers.check_password(password, encoded, setter=lambda raw: upgraded.append(hashers.make_password(raw)))
+    return correct, upgraded[0] if upgraded else None
+
+
+def check_password(user, password):
+    """
+    user.check_password() on the hashing executor. Raises HashingBusy when the executor is saturated.
+
+    Returns:
+    - bool: whether the password is correct; an outdated hash is upgraded and saved
+    """
+
+    correct, upgraded = get_executor().call(_check, password, user.password)
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return correct
+
+
+async def acheck_password(user, password):
+    """
+    Async check_password().
+    """
+
+    correct, upgraded = await get_executor().acall(_check, password, user.password)
+    if upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+    return correct
@@ -0,0 +1,105 @@
+"""
+Per-request SQL accounting used by app.middleware.QueryInstrumentationMiddleware.
+
+record_query() is installed as an execute wrapper on every database connection
+(see signals.py) and adds to the stats of the request running in the current context,
+so queries that async views run on other threads are counted too.
+"""
+
+import contextvars
+import re
+import time
+from collections import Counter
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    A view ran more queries than its @query_budget allows (raised only with QUERY_BUDGET_STRICT).
+    """
+
+
+class RequestStats:
+    """
+    Queries run while handling one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold):
+        """
+        SQL shapes run at least `threshold` times, most frequent first: probable N+1 queries.
+        """
+
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_stats = contextvars.ContextVar('request_query_stats', default=None)
+
+
+def start_request():
+    """
+    Start collecting stats in the current context. Returns (stats, token for end_request()).
+    """
+
+    stats = RequestStats()
+    return stats, _stats.set(stats)
+
+
+def end_request(token):
+    _stats.reset(token)
+
+
+def sql_shape(sql):
+    """
+    Normalize SQL so that queries differing only in parameters, IN-list length or
+    inlined numbers (LIMIT/OFFSET) compare equal.
+    """
+
+    shape = _WHITESPACE.sub(' ', sql).strip()
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    return _NUMBER.sub('?', shape)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries += 1
+        stats.shapes[sql_shape(sql)] += 1
+
+
+def install(connection):
+    """
+    Add record_query() to a connection's execute wrappers, once.
+    """
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def query_budget(limit):
+    """
+    Declare the most queries a view may run per request, authentication included.
+
+    Put it above @api_view. Requests over the budget are logged, and fail with
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (as it is in tests).
+    """
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
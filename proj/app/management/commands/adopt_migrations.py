@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from app.models import Course, CourseType, Enrollment, Professor, Student, Subject, UserProfile
+
+INITIAL = ('app', '0001_initial')
+
+
+class Command(BaseCommand):
+    help = (
+        "Record app's 0001_initial migration as applied on a database whose tables were created "
+        "before the app had migrations, so that `migrate` applies the later ones. "
+        "`migrate app 0001 --fake` cannot do it there: admin's migrations are already applied "
+        "and depend on it, which migrate refuses as an inconsistent history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        recorder = MigrationRecorder(connection)
+        if INITIAL in recorder.applied_migrations():
+            self.stdout.write("Nothing to do: 0001_initial is already recorded.")
+            return
+
+        tables = set(connection.introspection.table_names())
+        missing = [
+            model._meta.db_table
+            for model in (UserProfile, CourseType, Course, Subject, Student, Professor, Enrollment)
+            if model._meta.db_table not in tables
+        ]
+        if missing:
+            raise CommandError(f"Missing tables {', '.join(missing)}: this database needs `migrate`, not adopting.")
+
+        recorder.record_applied(*INITIAL)
+        self.stdout.write(self.style.SUCCESS("Recorded 0001_initial as applied; now run `migrate`."))
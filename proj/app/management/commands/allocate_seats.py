@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app import allocation
+
+
+class Command(BaseCommand):
+    help = (
+        "Allocate course seats to pending applicants by average score once the application "
+        "window has closed. Applicants who do not get a seat are rejected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help="Only allocate this course (can be repeated). Defaults to every course with pending applications.")
+        parser.add_argument('--dry-run', action='store_true', help="Show the result without saving it.")
+
+    def handle(self, *args, **options):
+        result = allocation.allocate_by_merit(course_ids=options['courses'], dry_run=options['dry_run'])
+
+        for course_id, approved in sorted(result['courses'].items()):
+            self.stdout.write(f"course {course_id}: {approved} approved")
+        self.stdout.write(
+            f"{result['approved']} approved, {result['rejected']} rejected"
+            + (" (dry run, nothing saved)" if options['dry_run'] else "")
+        )
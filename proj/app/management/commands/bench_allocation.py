@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import allocation, benchmarks, datasets
+from app.models import Course, CourseSeatShard, Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        "Time allocation.allocate_by_merit() on a seeded, skewed set of pending applications in a "
+        "throwaway test database, split into the row locks, the read of the applications, the "
+        "merit ranking and the status and seat count writes. The allocation is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applications', type=int, default=500_000)
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        benchmarks.add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database(options['keepdb']):
+            self.seed(options)
+            self.run_once(options)
+
+    def seed(self, options):
+        try:
+            datasets.generate(
+                random_seed=options['seed'], courses=options['courses'], subjects_per_course=0,
+                students=max(1, options['applications'] // 5), professors=0,
+                enrollments=options['applications'],
+            )
+        except ValueError:
+            # Loaded by an earlier run with --keepdb
+            pass
+        # Every request is pending and every seat free again
+        Enrollment.objects.update(status=Enrollment.PENDING, admin=None)
+        Course.objects.update(current_capacity=0)
+        CourseSeatShard.objects.update(taken=0)
+
+    def run_once(self, options):
+        timings = {}
+        started = time.perf_counter()
+        result = allocation.allocate_by_merit(dry_run=True, timings=timings)
+        elapsed = time.perf_counter() - started
+
+        pending = result['approved'] + result['rejected']
+        phases = ', '.join(f"{phase} {timings[phase]:.2f}s" for phase in ('lock', 'read', 'rank', 'write'))
+        self.stdout.write(
+            f"{pending} applications across {len(result['courses'])} courses allocated in {elapsed:.2f}s "
+            f"({pending / elapsed:.0f}/s; {phases}): {result['approved']} approved, {result['rejected']} rejected"
+        )
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route against a seeded dataset in a throwaway test database. "
+        "Writes latency percentiles, throughput and query counts per endpoint to a JSON "
+        "file and fails if a metric regressed past BENCHMARK_THRESHOLDS compared to the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Seeded dataset size')
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--only', nargs='*', help='Scenario or route names to run')
+        parser.add_argument('--output', default='bench-results.json')
+        parser.add_argument('--baseline', default=os.path.join('benchmarks', 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument(
+            '--threshold', action='append', default=[], metavar='METRIC=FRACTION',
+            help='Override a regression threshold, e.g. p95_ms=0.5',
+        )
+        benchmarks.add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        missing = benchmarks.missing_routes()
+        if missing:
+            raise CommandError(f"Routes without a benchmark scenario: {', '.join(missing)}")
+
+        thresholds = dict(settings.BENCHMARK_THRESHOLDS)
+        for override in options['threshold']:
+            metric, _, value = override.partition('=')
+            if metric not in benchmarks.METRICS:
+                raise CommandError(f"Unknown metric {metric!r}, use one of {', '.join(benchmarks.METRICS)}")
+            thresholds[metric] = float(value)
+
+        # One log line per request would drown the report
+        logging.getLogger('app.requests').setLevel(logging.WARNING)
+        with benchmarks.benchmark_database(options['keepdb']):
+            cache.clear()
+            dataset = benchmarks.seed(students=options['students'], courses=options['courses'])
+            results = benchmarks.run(dataset, options['requests'], options['warmup'], options['only'])
+
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'students': options['students'],
+                'courses': options['courses'],
+                'requests': options['requests'],
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, metrics in results.items():
+            self.stdout.write(
+                f"{name:>28}: p50 {metrics['p50_ms']:8.2f}ms  p95 {metrics['p95_ms']:8.2f}ms  "
+                f"p99 {metrics['p99_ms']:8.2f}ms  {metrics['rps']:8.1f} req/s  "
+                f"{metrics['queries']:g} queries  {metrics['errors']} errors"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            with open(options['baseline'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f"No baseline at {options['baseline']}, nothing to compare against")
+            return
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('students') != options['students']:
+            self.stderr.write("The baseline was recorded with a different dataset size; comparing anyway")
+
+        found = benchmarks.regressions(results, baseline['endpoints'], thresholds)
+        if found:
+            raise CommandError("Performance regressions:\n" + '\n'.join(found))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
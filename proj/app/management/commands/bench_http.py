@@ -0,0 +1,66 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GET requests at a running server and report requests/sec and "
+        "latency percentiles. Run it against the same endpoint served by gunicorn "
+        "(proj.wsgi) and by uvicorn (proj.asgi) to compare the sync and async read views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Full URLs, requested round-robin')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--token', help='Access token sent as "Authorization: Bearer <token>"')
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+        urls = options['urls']
+        lock = threading.Lock()
+        latencies, errors = [], {}
+
+        def fetch(index):
+            request = urllib.request.Request(urls[index % len(urls)], headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                outcome = None
+            except urllib.error.HTTPError as e:
+                outcome = e.code
+            except OSError as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                if outcome is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            self.stderr.write(f"No successful requests, errors: {errors}")
+            return
+
+        latencies.sort()
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{len(latencies)} ok in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s) "
+            f"at concurrency {options['concurrency']}, latency p50 {percentiles[49] * 1000:.1f}ms "
+            f"p99 {percentiles[98] * 1000:.1f}ms max {latencies[-1] * 1000:.1f}ms"
+        )
+        if errors:
+            self.stdout.write(f"errors: {errors}")
@@ -0,0 +1,78 @@
+import logging
+import re
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from app import benchmarks
+from app.models import Course, CourseType
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure registrations/sec of POST /student/register/ in a throwaway test database, "
+        "with queries per registration. Every tenth registration reuses an email, so the "
+        "duplicate path is measured too."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=200)
+        parser.add_argument(
+            '--fast-hasher', action='store_true',
+            help='Hash with MD5 so the numbers show the database work rather than PBKDF2',
+        )
+        benchmarks.add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if options['fast_hasher'] else None
+        # One log line per request would drown the report; duplicates are logged as bad requests
+        logging.getLogger('app.requests').setLevel(logging.WARNING)
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with benchmarks.benchmark_database(options['keepdb']):
+            cache.clear()
+            course_type = CourseType.objects.create(name=f'Registration benchmark {time.time_ns()}')
+            course = Course.objects.create(name='Registration benchmark', course_type=course_type, max_capacity=10)
+            if hashers:
+                with override_settings(PASSWORD_HASHERS=hashers):
+                    results = self.run(options['registrations'], course.pk)
+            else:
+                results = self.run(options['registrations'], course.pk)
+
+        for outcome, (latencies, queries) in results.items():
+            if not latencies:
+                continue
+            latencies.sort()
+            self.stdout.write(
+                f"{outcome:>9}: {len(latencies) / sum(latencies):8.1f} registrations/s  "
+                f"p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms  "
+                f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f}ms  "
+                f"{statistics.median(queries):g} queries"
+            )
+
+    def run(self, count, course_id):
+        client = Client()
+        stamp = time.time_ns()
+        results = {'created': ([], []), 'duplicate': ([], [])}
+        for i in range(count):
+            duplicate = i % 10 == 9
+            email = f'bench.register.{stamp}.{i - 1 if duplicate else i}@example.com'
+            started = time.perf_counter()
+            response = client.post('/student/register/', {
+                'name': 'Bench', 'surname': f'User{i}', 'email': email, 'password': 'bench-password', 'course': course_id,
+            }, content_type='application/json')
+            latency = time.perf_counter() - started
+            expected = 400 if duplicate else 201
+            if response.status_code != expected:
+                raise RuntimeError(f"Registration {i} returned {response.status_code}: {response.content[:200]!r}")
+
+            latencies, queries = results['duplicate' if duplicate else 'created']
+            latencies.append(latency)
+            match = _SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+            queries.append(int(match.group(1)) if match else 0)
+        return results
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from app import benchmarks, seats
+from app.models import Course, CourseSeatShard, CourseType, Enrollment, Student, UserProfile
+
+
+class _CounterTimer:
+    """
+    Execute wrapper adding up the time spent in UPDATEs of the seat counter rows. Such an
+    UPDATE blocks while another transaction holds the row lock, and takes well under a
+    millisecond otherwise, so under contention its time is the lock wait.
+    """
+
+    def __init__(self):
+        quote = connection.ops.quote_name
+        self.prefixes = tuple(f'UPDATE {quote(model._meta.db_table)} ' for model in (Course, CourseSeatShard))
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(self.prefixes):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def _p99(values):
+    return values[max(0, int(len(values) * 0.99) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare approvals/sec, approval latency and seat counter lock wait of the single-row "
+        "course counter against the sharded counter under concurrent approvals, in a throwaway "
+        "test database. Needs PostgreSQL for meaningful numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applicants', type=int, default=2000)
+        parser.add_argument('--capacity', type=int, default=1500)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--shards', type=int, default=16)
+        benchmarks.add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        with benchmarks.benchmark_database(options['keepdb']):
+            for label, shards in (('single-row', 1), (f"sharded x{options['shards']}", options['shards'])):
+                with override_settings(SEAT_COUNTER_SHARDS=shards):
+                    result = self.run_once(options)
+                self.stdout.write(
+                    f"{label:>14}: {result['approved']} approved in {result['elapsed']:.2f}s "
+                    f"({result['approved'] / result['elapsed']:.0f} approvals/s), "
+                    f"approve() mean {result['latency_mean'] * 1000:.2f}ms p99 {result['latency_p99'] * 1000:.2f}ms, "
+                    f"counter lock wait mean {result['wait_mean'] * 1000:.2f}ms p99 {result['wait_p99'] * 1000:.2f}ms, "
+                    f"oversold {result['oversold']}"
+                )
+
+    def run_once(self, options):
+        course_type = CourseType.objects.create(name=f'bench_seat_counters {time.time_ns()}')
+        course = Course.objects.create(name='bench', course_type=course_type, max_capacity=options['capacity'])
+        users = UserProfile.objects.bulk_create([
+            UserProfile(email=f'bench_seat_{course.pk}_{i}@example.com', is_student=True)
+            for i in range(options['applicants'])
+        ])
+        students = Student.objects.bulk_create([Student(user=user, course=course) for user in users])
+        queue = Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+        if seats.shard_count() > 1:
+            seats.rebalance_shards(course.pk)
+
+        lock = threading.Lock()
+        latencies, waits = [], []
+
+        def worker():
+            timer = _CounterTimer()
+            try:
+                with connection.execute_wrapper(timer):
+                    while True:
+                        with lock:
+                            if not queue:
+                                return
+                            enrollment = queue.pop()
+                        timer.seconds = 0.0
+                        started = time.perf_counter()
+                        seats.approve(enrollment)
+                        latency = time.perf_counter() - started
+                        with lock:
+                            latencies.append(latency)
+                            waits.append(timer.seconds)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        approved = Enrollment.objects.filter(course=course, status=Enrollment.APPROVED).count()
+        latencies.sort()
+        waits.sort()
+        result = {
+            'approved': approved,
+            'elapsed': elapsed,
+            'latency_mean': statistics.fmean(latencies),
+            'latency_p99': _p99(latencies),
+            'wait_mean': statistics.fmean(waits),
+            'wait_p99': _p99(waits),
+            'oversold': max(0, approved - course.max_capacity),
+        }
+
+        # Cascades to the course, shards, students' enrollments
+        UserProfile.objects.filter(pk__in=[user.pk for user in users]).delete()
+        course_type.delete()
+        return result
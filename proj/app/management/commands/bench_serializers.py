@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from app import benchmarks, datasets
+from app.models import Student, Subject
+from app.renderers import FastJSONRenderer
+from app.serializers import StudentSerializer, SubjectSerializer, student_rows, subject_rows
+
+
+def _best(repeat, run):
+    # Best of `repeat` runs: the least disturbed by everything else on the machine
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = run()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of ModelSerializer + JSONRenderer with the values_list() read path "
+        "+ FastJSONRenderer on pages of students and subjects, in a throwaway test database. "
+        "Fails if the two paths render different bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best one counts')
+        benchmarks.add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with benchmarks.benchmark_database(options['keepdb']):
+            if not Student.objects.exists():
+                datasets.generate(
+                    course_types=1, courses=1, subjects_per_course=rows, students=rows, professors=0, enrollments=0,
+                )
+            pages = [
+                ('students', Student.objects.order_by('pk')[:rows], StudentSerializer, student_rows),
+                ('subjects', Subject.objects.order_by('pk')[:rows], SubjectSerializer, subject_rows),
+            ]
+            for name, queryset, serializer_class, read_serializer in pages:
+                self.compare(name, queryset, serializer_class, read_serializer, repeat)
+
+    def compare(self, name, queryset, serializer_class, read_serializer, repeat):
+        count = queryset.count()
+        instances, values = list(queryset), list(read_serializer.values(queryset))
+        measurements = {
+            'serializer': (
+                lambda: JSONRenderer().render(serializer_class(queryset.all(), many=True).data),
+                lambda: JSONRenderer().render(serializer_class(instances, many=True).data),
+            ),
+            'values_list': (
+                lambda: FastJSONRenderer().render(read_serializer.to_rows(read_serializer.values(queryset.all()))),
+                lambda: FastJSONRenderer().render(read_serializer.to_rows(values)),
+            ),
+        }
+
+        bodies = {}
+        for path, (with_query, without_query) in measurements.items():
+            total, bodies[path] = _best(repeat, with_query)
+            encoding, _ = _best(repeat, without_query)
+            self.stdout.write(
+                f"{name:>8} {path:>11}: {count / total:10,.0f} rows/s with the query, "
+                f"{count / encoding:10,.0f} rows/s serializing and rendering only ({len(bodies[path]):,} bytes)"
+            )
+
+        if bodies['serializer'] != bodies['values_list']:
+            raise CommandError(f"{name}: the values_list() path renders different bytes than {serializer_class.__name__}")
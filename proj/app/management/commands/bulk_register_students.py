@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import registration
+
+
+class Command(BaseCommand):
+    help = "Register a batch of students from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or JSON list of students.")
+        parser.add_argument('--chunk-size', type=int, default=registration.CHUNK_SIZE)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1, help="Password hashing processes (default: CPU count).",
+        )
+
+    def handle(self, *args, **options):
+        content_type = 'csv' if options['path'].endswith('.csv') else 'json'
+        try:
+            with open(options['path'], encoding='utf-8-sig') as batch:
+                rows = registration.read_rows(batch.read(), content_type)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        report = registration.bulk_register_students(
+            rows, chunk_size=options['chunk_size'], workers=options['workers']
+        )
+
+        failed = [entry for entry in report if 'errors' in entry]
+        for entry in failed:
+            self.stderr.write(f"row {entry['row']} ({entry['email']}): {entry['errors']}")
+        self.stdout.write(f"{len(report) - len(failed)} student(s) registered, {len(failed)} failed.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app import exports
+
+
+class Command(BaseCommand):
+    help = "Stream students or enrollments as NDJSON or CSV without loading them into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', dest='output', choices=exports.FORMATS, default='ndjson')
+        parser.add_argument('--output-file', help="Write to this file instead of stdout.")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        blocks = exports.stream(options['dataset'], options['output'], options['chunk_size'])
+
+        if options['output_file']:
+            with open(options['output_file'], 'w', newline='') as output:
+                output.writelines(blocks)
+        else:
+            for block in blocks:
+                self.stdout.write(block, ending='')
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import datasets
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset (course types, courses, subjects, students, "
+        "professors and enrollments with skewed course popularity) and bulk-load it, "
+        "with COPY on PostgreSQL. Every generated user's password is 'generated-password'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--professors', type=int, default=100)
+        parser.add_argument('--course-types', type=int, default=10)
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--subjects-per-course', type=int, default=8)
+        parser.add_argument('--enrollments', type=int, help='Total enrollment requests, 5 per student by default')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of course popularity')
+        parser.add_argument('--batch-size', type=int, default=100_000, help='Rows per COPY / bulk_create batch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def log(line):
+            self.stdout.write(f"[{time.perf_counter() - started:7.1f}s] {line}")
+
+        try:
+            counts = datasets.generate(
+                random_seed=options['seed'],
+                course_types=options['course_types'],
+                courses=options['courses'],
+                subjects_per_course=options['subjects_per_course'],
+                students=options['students'],
+                professors=options['professors'],
+                enrollments=options['enrollments'],
+                skew=options['skew'],
+                batch_size=options['batch_size'],
+                log=log,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s): "
+            + ', '.join(f'{count} {name}' for name, count in counts.items())
+        ))
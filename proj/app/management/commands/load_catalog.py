@@ -0,0 +1,110 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app import catalog
+from app.models import Course, CourseType, Subject
+
+DEFAULT_CATALOG = Path(__file__).resolve().parents[2] / 'fixtures' / 'catalog.csv'
+
+
+def read_catalog(path):
+    """
+    Yield catalog rows one at a time from a CSV file with a header row or an NDJSON file.
+    Each row has course_type, course, max_capacity, subject and ects_points.
+    """
+
+    with open(path, newline='', encoding='utf-8-sig') as catalog_file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(catalog_file)
+        else:
+            for line in catalog_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load course types, courses and subjects from a catalog file. Rows are upserted "
+        "in batches, so running it again updates the catalog instead of duplicating it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_CATALOG),
+                            help="CSV or NDJSON catalog file (default: app/fixtures/catalog.csv).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Natural key -> primary key of rows already upserted in this run
+        self.type_ids = {}
+        self.course_ids = {}
+        subjects = 0
+
+        rows = read_catalog(options['path'])
+        try:
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    subjects += self.load_batch(batch)
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not load catalog: {e!r}")
+
+        # bulk_create sends no signals, so start a new catalog version by hand
+        catalog.bump_version()
+        self.stdout.write(
+            f"{len(self.type_ids)} course type(s), {len(self.course_ids)} course(s) "
+            f"and {subjects} subject(s) loaded."
+        )
+
+    def load_batch(self, batch):
+        new_types = {row['course_type'] for row in batch} - self.type_ids.keys()
+        if new_types:
+            created = CourseType.objects.bulk_create(
+                [CourseType(name=name) for name in new_types],
+                update_conflicts=True, unique_fields=['name'], update_fields=['name'],
+            )
+            self.type_ids.update(self.ids(created, CourseType, lambda t: t.name, name__in=new_types))
+
+        new_courses = {}
+        for row in batch:
+            key = (row['course'], self.type_ids[row['course_type']])
+            if key not in self.course_ids:
+                new_courses[key] = Course(name=key[0], course_type_id=key[1], max_capacity=int(row['max_capacity']))
+        if new_courses:
+            created = Course.objects.bulk_create(
+                new_courses.values(),
+                update_conflicts=True, unique_fields=['name', 'course_type'], update_fields=['max_capacity'],
+            )
+            self.course_ids.update(self.ids(
+                created, Course, lambda c: (c.name, c.course_type_id),
+                name__in={name for name, _ in new_courses}, course_type_id__in={type_id for _, type_id in new_courses},
+            ))
+
+        # Later rows for the same subject win
+        subjects = {}
+        for row in batch:
+            course_id = self.course_ids[(row['course'], self.type_ids[row['course_type']])]
+            subjects[(course_id, row['subject'])] = Subject(
+                course_id=course_id, description=row['subject'], ects_points=int(row['ects_points']),
+            )
+        Subject.objects.bulk_create(
+            subjects.values(),
+            update_conflicts=True, unique_fields=['course', 'description'], update_fields=['ects_points'],
+        )
+        return len(subjects)
+
+    def ids(self, objects, model, natural_key, **lookup):
+        """
+        Map natural keys to primary keys of upserted objects. Backends that do not
+        return primary keys from bulk_create (MySQL) are looked up with one query.
+        """
+
+        if all(obj.pk is not None for obj in objects):
+            return {natural_key(obj): obj.pk for obj in objects}
+        return {natural_key(obj): obj.pk for obj in model.objects.filter(**lookup)}
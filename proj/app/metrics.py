@@ -0,0 +1,18 @@
+def to_prometheus(prefix, label, stats_by_label):
+    """
+    Render nested stats in the Prometheus text format, one sample per stat and label value.
+
+    Parameters:
+    - prefix: metric name prefix, e.g. 'db_pool'
+    - label: label name, e.g. 'database'
+    - stats_by_label: {label value: {stat name: number}}
+
+    Returns:
+    - str: e.g. 'db_pool_checkouts{database="default/my_database"} 42'
+    """
+
+    lines = []
+    for value, stats in sorted(stats_by_label.items()):
+        for name, number in sorted(stats.items()):
+            lines.append(f'{prefix}_{name}{{{label}="{value}"}} {number}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,134 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import instrumentation, routers
+
+logger = logging.getLogger('app.requests')
+
+
+class ReadPrimaryMiddleware:
+    """
+    Read-your-writes for the replica router. A request that writes gets a cookie that
+    sends the client's reads to the primary for READ_PRIMARY_PIN_SECONDS; clients without
+    a cookie jar can send the X-Read-Primary header instead.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start_request(self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.process_response(response, wrote)
+
+    async def __acall__(self, request):
+        token = routers.start_request(self.pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.process_response(response, wrote)
+
+    def pinned(self, request):
+        return settings.READ_PRIMARY_COOKIE in request.COOKIES or 'X-Read-Primary' in request.headers
+
+    def process_response(self, response, wrote):
+        if wrote:
+            response.set_cookie(
+                settings.READ_PRIMARY_COOKIE, '1',
+                max_age=settings.READ_PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, database time, view time (from process_view() to the response,
+    rendering included) and total time of every request. They are sent back in a
+    Server-Timing header and logged as one JSON line on the 'app.requests' logger,
+    together with SQL shapes repeated QUERY_REPEAT_THRESHOLD or more times (probable
+    N+1 queries) and the view's @query_budget if it went over it.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.process_response(request, response, stats, started, time.perf_counter())
+
+    async def __acall__(self, request):
+        stats, token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.process_response(request, response, stats, started, time.perf_counter())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
+
+    def process_response(self, request, response, stats, started, finished):
+        match = getattr(request, 'resolver_match', None)
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        # None when no view ran, e.g. a 404 from the URL resolver
+        view_started = getattr(request, '_view_started', None)
+        view_ms = round((finished - view_started) * 1000, 2) if view_started is not None else None
+
+        timings = [f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries"']
+        if view_ms is not None:
+            timings.append(f'view;dur={view_ms:.2f}')
+        timings.append(f'total;dur={(finished - started) * 1000:.2f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        over_budget = budget is not None and stats.queries > budget
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': round(stats.db_seconds * 1000, 2),
+            'view_ms': view_ms,
+            'total_ms': round((finished - started) * 1000, 2),
+        }
+        if repeated:
+            record['repeated_queries'] = [{'sql': shape, 'count': count} for shape, count in repeated]
+        if over_budget:
+            record['query_budget'] = budget
+        logger.log(logging.WARNING if repeated or over_budget else logging.INFO, json.dumps(record))
+
+        if over_budget and settings.QUERY_BUDGET_STRICT:
+            raise instrumentation.QueryBudgetExceeded(
+                f"{record['view']} ran {stats.queries} queries, its budget is {budget}: "
+                + '; '.join(f'{count}x {shape}' for shape, count in stats.shapes.most_common(5))
+            )
+        return response
@@ -0,0 +1,85 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+# Of duplicate enrollment requests the one furthest along is kept: a decision over an open
+# request, an approval over a rejection
+STATUS_RANK = {'approved': 0, 'rejected': 1, 'pending': 2, 'waitlisted': 3}
+
+
+def _duplicate_groups(model, fields):
+    """
+    Values of `fields` shared by more than one row, with the lowest ID among those rows.
+    """
+
+    return model.objects.values(*fields).annotate(rows=Count('id'), keep=Min('id')).filter(rows__gt=1)
+
+
+def merge_course_types(apps):
+    CourseType, Course = apps.get_model('app', 'CourseType'), apps.get_model('app', 'Course')
+    for group in _duplicate_groups(CourseType, ['name']):
+        duplicates = CourseType.objects.filter(name=group['name']).exclude(pk=group['keep'])
+        Course.objects.filter(course_type__in=duplicates).update(course_type_id=group['keep'])
+        duplicates.delete()
+
+
+def merge_courses(apps):
+    Course = apps.get_model('app', 'Course')
+    merged = []
+    for group in _duplicate_groups(Course, ['name', 'course_type']):
+        duplicates = Course.objects.filter(name=group['name'], course_type_id=group['course_type']).exclude(pk=group['keep'])
+        for model, field in (('Subject', 'course'), ('Enrollment', 'course'), ('Student', 'course')):
+            apps.get_model('app', model).objects.filter(**{f'{field}__in': duplicates}).update(**{f'{field}_id': group['keep']})
+        # Cascades to their seat shards
+        duplicates.delete()
+        merged.append(group['keep'])
+    return merged
+
+
+def merge_subjects(apps):
+    Subject = apps.get_model('app', 'Subject')
+    for group in _duplicate_groups(Subject, ['course', 'description']):
+        Subject.objects.filter(course_id=group['course'], description=group['description']).exclude(pk=group['keep']).delete()
+
+
+def merge_enrollments(apps):
+    Enrollment = apps.get_model('app', 'Enrollment')
+    changed = set()
+    for group in _duplicate_groups(Enrollment, ['student', 'course']):
+        rows = list(Enrollment.objects.filter(student_id=group['student'], course_id=group['course']).values_list('id', 'status'))
+        keep = min(rows, key=lambda row: (STATUS_RANK.get(row[1], len(STATUS_RANK)), row[0]))[0]
+        Enrollment.objects.filter(pk__in=[pk for pk, _ in rows if pk != keep]).delete()
+        changed.add(group['course'])
+    return changed
+
+
+def recount_seats(apps, course_ids):
+    # Seats taken are the approved requests; shards are rebuilt from current_capacity on first use
+    Course, Enrollment = apps.get_model('app', 'Course'), apps.get_model('app', 'Enrollment')
+    for course_id in course_ids:
+        approved = Enrollment.objects.filter(course_id=course_id, status='approved').count()
+        Course.objects.filter(pk=course_id).update(current_capacity=approved)
+    apps.get_model('app', 'CourseSeatShard').objects.filter(course_id__in=course_ids).delete()
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merge the rows 0004 makes unique, keeping the lowest ID and moving references to it.
+    Databases created before the constraints may have them: course_enrollment created a
+    request on every POST, and the old create_courses.py could be run more than once.
+    """
+
+    merge_course_types(apps)
+    merged_courses = merge_courses(apps)
+    merge_subjects(apps)
+    recount_seats(apps, set(merged_courses) | merge_enrollments(apps))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_seat_shards_and_queues'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='course',
+            constraint=models.UniqueConstraint(fields=('name', 'course_type'), name='unique_course_name_type'),
+        ),
+        migrations.AddConstraint(
+            model_name='coursetype',
+            constraint=models.UniqueConstraint(fields=('name',), name='unique_course_type_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_student_course_enrollment'),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.UniqueConstraint(fields=('course', 'description'), name='unique_subject_per_course'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class PostgreSQLRunSQL(migrations.RunSQL):
+    """
+    RunSQL that does nothing on other databases, where the search runs in its basic mode.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class PostgreSQLTrigramExtension(TrigramExtension):
+    """
+    TrigramExtension whose reverse, like its forward, does nothing on other databases.
+    """
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def search_columns(table, text):
+    # IF NOT EXISTS: databases migrated before this migration got the same objects from a
+    # post_migrate handler
+    return PostgreSQLRunSQL(
+        [
+            f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce(\"{text}\", ''))) STORED",
+            f'CREATE INDEX IF NOT EXISTS "{table}_search_vector" ON "{table}" USING gin (search_vector)',
+            f'CREATE INDEX IF NOT EXISTS "{table}_{text}_trgm" ON "{table}" USING gin ("{text}" gin_trgm_ops)',
+        ],
+        [
+            f'DROP INDEX IF EXISTS "{table}_{text}_trgm"',
+            f'DROP INDEX IF EXISTS "{table}_search_vector"',
+            f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS search_vector',
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    The catalog search's generated tsvector columns (text search configuration 'simple')
+    with their GIN indexes, and trigram GIN indexes on the text. They are not model
+    fields, so only app.search's raw queries read them. Creating pg_trgm needs a database
+    user allowed to create extensions, or the extension created beforehand.
+    """
+
+    dependencies = [
+        ('app', '0004_unique_catalog_and_enrollments'),
+    ]
+
+    operations = [
+        PostgreSQLTrigramExtension(),
+        search_columns('app_course', 'name'),
+        search_columns('app_subject', 'description'),
+    ]
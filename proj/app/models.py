@@ -1,11 +1,15 @@
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.forms import ValidationError
 
 class CourseType(models.Model):
     name = models.CharField(max_length=100)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name'], name='unique_course_type_name'),
+        ]
+
 class Course(models.Model):
     name = models.CharField(max_length=100)
     course_type = models.ForeignKey(CourseType, on_delete=models.CASCADE)
@@ -14,18 +18,39 @@ class Course(models.Model):
     # Current number of enrolled students 
     current_capacity = models.PositiveIntegerField(default=0)  
 
-    def save(self, *args, **kwargs):
-        # Check if a course with the same name and course type already exists
-        if Course.objects.filter(name=self.name, course_type=self.course_type).exists():
-            # If it exists, raise a validation error
-            raise ValidationError("A course with the same name and course type already exists.")
-        super().save(*args, **kwargs)
+    class Meta:
+        constraints = [
+            # A course with the same name and course type must not exist twice
+            models.UniqueConstraint(fields=['name', 'course_type'], name='unique_course_name_type'),
+        ]
+
+class CourseSeatShard(models.Model):
+    """
+    One slice of a course's seat counter, used when SEAT_COUNTER_SHARDS > 1.
+    Each shard owns part of max_capacity so it can be claimed without touching the Course row.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='seat_shards')
+    shard = models.PositiveSmallIntegerField()
+    # Seats of the course assigned to this shard
+    capacity = models.PositiveIntegerField(default=0)
+    # Seats of this shard already claimed
+    taken = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'shard'], name='unique_course_seat_shard'),
+        ]
 
 class Subject(models.Model):
     description = models.CharField(max_length=300)
     ects_points = models.IntegerField(default=1)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'description'], name='unique_subject_per_course'),
+        ]
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -81,17 +106,37 @@ class Enrollment(models.Model):
     PENDING = 'pending'
     APPROVED = 'approved'
     REJECTED = 'rejected'
+    WAITLISTED = 'waitlisted'
 
     STATUS_CHOICES = [
         (PENDING, 'Pending'),
         (APPROVED, 'Approved'),
         (REJECTED, 'Rejected'),
+        (WAITLISTED, 'Waitlisted'),
     ]
 
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
     admin = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # Reviewer currently working on this pending request, see review_queue.claim_batch()
+    claimed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_enrollments')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    # Waitlist order: higher priority first, then arrival. Stays 0 unless WAITLIST_ORDER is 'score'
+    waitlist_priority = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # A student can request each course only once
+            models.UniqueConstraint(fields=['student', 'course'], name='unique_student_course_enrollment'),
+        ]
+        indexes = [
+            # The review queue: pending requests of a course in arrival order.
+            # Partial, so historical approved/rejected rows do not bloat it.
+            models.Index(fields=['course', 'id'], condition=models.Q(status='pending'), name='enrollment_pending_queue'),
+            # The waitlist of a course in promotion order, so taking its head is one index probe
+            models.Index(fields=['course', '-waitlist_priority', 'id'], condition=models.Q(status='waitlisted'), name='enrollment_waitlist'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.course} - {self.status}"
\ No newline at end of file
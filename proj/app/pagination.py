@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class StudentCursorPagination(CursorPagination):
+    """
+    Keyset pagination over students ordered by primary key.
+
+    Every page is a single `WHERE user_id > %s ORDER BY user_id LIMIT n` query,
+    so deep pages cost the same as the first one. Cursors are opaque.
+    """
+
+    ordering = 'pk'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class PendingEnrollmentCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a course's pending enrollments in arrival order,
+    served from the enrollment_pending_queue partial index at any queue depth.
+    """
+
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
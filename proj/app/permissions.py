@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from rest_framework.permissions import BasePermission
-from .models import Professor
+from .roles import get_roles
 
 class IsProfessorOrAdmin(permissions.BasePermission):
     """
@@ -12,12 +12,8 @@ class IsProfessorOrAdmin(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        # Check if the user is a professor or an admin
-        try:
-            professor = Professor.objects.get(user=request.user)
-            return professor.is_admin
-        except Professor.DoesNotExist:
-            return False
+        # Check if the user is an admin professor; roles are cached, so repeated calls cost no queries
+        return get_roles(request.user).is_admin
 
 class CanRegisterProfessor(BasePermission):
    """
@@ -29,4 +25,5 @@ class CanRegisterProfessor(BasePermission):
             return False
         
         # Check if the user is an admin or a professor
-        return request.user.is_admin or request.user.is_professor
\ No newline at end of file
+        roles = get_roles(request.user)
+        return roles.is_admin or roles.is_professor
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Read-only serialization straight from QuerySet.values_list().
+
+A ReadSerializer takes the fields of an existing ModelSerializer once and turns
+value tuples into the same dicts the serializer's `.data` would hold, without
+building model instances or walking the serializer's field machinery per row.
+Rendered with renderers.FastJSONRenderer, the bytes match serializer + JSONRenderer.
+"""
+
+from functools import cached_property
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+# Fields whose to_representation() returns database values unchanged
+_PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.EmailField,
+    serializers.IntegerField, serializers.ReadOnlyField,
+)
+
+
+def _converter(field):
+    if type(field) in _PASSTHROUGH_FIELDS:
+        return None
+    if type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+        # values_list() already returns the related object's primary key
+        return None
+    return field.to_representation
+
+
+class ReadSerializer:
+    """
+    Compiled read path for a ModelSerializer.
+
+    Only fields backed by a plain model attribute are supported (no dotted sources,
+    method fields or nested serializers); anything else raises ImproperlyConfigured
+    when the serializer is first used.
+
+    Usage:
+        rows = ReadSerializer(SubjectSerializer)
+        rows.to_rows(rows.values(Subject.objects.filter(course_id=1)))
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def _fields(self):
+        names, sources, conversions = [], [], []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source or isinstance(
+                field, (serializers.BaseSerializer, serializers.SerializerMethodField)
+            ):
+                raise ImproperlyConfigured(
+                    f'{self.serializer_class.__name__}.{name} cannot be read from values_list().'
+                )
+            names.append(name)
+            sources.append(field.source)
+            convert = _converter(field)
+            if convert is not None:
+                conversions.append((name, convert))
+        return tuple(names), tuple(sources), tuple(conversions)
+
+    @property
+    def names(self):
+        return self._fields[0]
+
+    def values(self, queryset, *extra):
+        """
+        The queryset as value tuples in field order.
+
+        Parameters:
+        - queryset: a queryset of the serializer's model
+        - extra: more fields to append to each row, e.g. 'pk' for CursorPagination, which
+          then reads them as attributes (the rows become named tuples)
+
+        Returns:
+        - QuerySet
+        """
+
+        return queryset.values_list(*self._fields[1], *extra, named=bool(extra))
+
+    def to_rows(self, values):
+        """
+        Turn value tuples from values() into serialized rows; trailing extra fields are dropped.
+
+        Returns:
+        - list of dict
+        """
+
+        names, _, conversions = self._fields
+        rows = [dict(zip(names, row)) for row in values]
+        for name, convert in conversions:
+            for row in rows:
+                value = row[name]
+                if value is not None:
+                    row[name] = convert(value)
+        return rows
@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import BaseUserManager
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .models import Course, Student, UserProfile
+from .serializers import BulkStudentRowSerializer
+
+# Rows inserted per bulk_create / transaction
+CHUNK_SIZE = 1000
+
+# Below this many passwords the process pool costs more than it saves
+POOL_THRESHOLD = 64
+
+DUPLICATE_EMAIL = "A user with this email already exists."
+CONCURRENT_CHANGE = "Changed by another request while this batch was saved, try again."
+
+
+def read_rows(data, content_type):
+    """
+    Turn a CSV or JSON batch into a list of row dicts.
+
+    Empty CSV cells are dropped so optional fields fall back to their defaults.
+
+    Parameters:
+    - data: str with the batch contents
+    - content_type: 'csv' or 'json'
+
+    Returns:
+    - list of dict
+    """
+
+    if content_type == 'csv':
+        return [
+            {key: value for key, value in row.items() if value not in ('', None)}
+            for row in csv.DictReader(io.StringIO(data))
+        ]
+    rows = json.loads(data)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON list of students.")
+    return rows
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hash passwords with the configured hasher, optionally spreading the work over a
+    process pool because PBKDF2 is CPU-bound and holds the GIL. The pool is meant for
+    the bulk_register_students command; web workers hash in-process rather than fork.
+
+    Parameters:
+    - passwords: list of raw passwords
+    - workers: pool size; 1 (the default) hashes in-process, None uses one process per CPU
+
+    Returns:
+    - list of encoded passwords, in the same order
+    """
+
+    if workers == 1 or len(passwords) < POOL_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _validate(rows):
+    """
+    Validate every row and run the batch-wide email and course checks with one
+    query each. Returns (valid, report) where report has one entry per row.
+    """
+
+    report = [{'row': index, 'email': row.get('email') if isinstance(row, dict) else None}
+              for index, row in enumerate(rows, start=1)]
+    valid = []
+    seen = set()
+
+    for entry, row in zip(report, rows):
+        serializer = BulkStudentRowSerializer(data=row)
+        if not serializer.is_valid():
+            entry['errors'] = serializer.errors
+            continue
+        data = serializer.validated_data
+        data['email'] = BaseUserManager.normalize_email(data['email'])
+        entry['email'] = data['email']
+        if data['email'] in seen:
+            entry['errors'] = {'email': ["Duplicate email in this batch."]}
+            continue
+        seen.add(data['email'])
+        valid.append((entry, data))
+
+    return _check_database(valid), report
+
+
+def _check_database(pairs):
+    """
+    Report rows whose email is taken or whose course does not exist, with one query
+    each, and return the other (report entry, data) pairs.
+    """
+
+    existing = set(
+        UserProfile.objects.filter(email__in=[data['email'] for _, data in pairs])
+        .values_list('email', flat=True)
+    )
+    course_ids = {data['course'] for _, data in pairs if data.get('course') is not None}
+    known_courses = set(Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True))
+
+    accepted = []
+    for entry, data in pairs:
+        if data['email'] in existing:
+            entry['errors'] = {'email': [DUPLICATE_EMAIL]}
+        elif data.get('course') is not None and data['course'] not in known_courses:
+            entry['errors'] = {'course': [f"Invalid pk \"{data['course']}\" - object does not exist."]}
+        else:
+            accepted.append((entry, data))
+    return accepted
+
+
+def _insert_chunk(chunk):
+    """
+    Insert one chunk of (report entry, data) pairs in a single transaction.
+    """
+
+    with transaction.atomic():
+        users = UserProfile.objects.bulk_create([
+            UserProfile(
+                email=data['email'],
+                password=data['password'],
+                first_name=data['name'],
+                last_name=data['surname'],
+                is_student=True,
+            )
+            for _, data in chunk
+        ])
+        if any(user.pk is None for user in users):
+            # Backends without RETURNING (MySQL) do not set primary keys on bulk_create
+            ids = dict(UserProfile.objects.filter(email__in=[user.email for user in users]).values_list('email', 'pk'))
+            for user in users:
+                user.pk = ids[user.email]
+
+        Student.objects.bulk_create([
+            Student(
+                user=user,
+                course_id=data.get('course'),
+                school=data['school'],
+                place_of_birth=data.get('place_of_birth'),
+                average_score=data['average_score'],
+            )
+            for user, (_, data) in zip(users, chunk)
+        ])
+
+    for user, (entry, _) in zip(users, chunk):
+        entry['user_id'] = user.pk
+
+
+def bulk_register_students(rows, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Register a batch of students.
+
+    Emails and courses are checked for the whole batch with one query each,
+    passwords are hashed (on a process pool if `workers` asks for one) and
+    users/students are inserted with bulk_create in chunks of `chunk_size`,
+    each chunk in its own transaction.
+
+    Parameters:
+    - rows: list of dicts with name, surname, email, password and optionally
+      course, school, place_of_birth, average_score
+    - chunk_size: rows per insert
+    - workers: password hashing processes, see hash_passwords()
+
+    Returns:
+    - list of dict: one report per input row with 'row', 'email' and either 'user_id' or 'errors'
+    """
+
+    accepted, report = _validate(rows)
+
+    hashed = hash_passwords([data['password'] for _, data in accepted], workers=workers)
+    for (_, data), password in zip(accepted, hashed):
+        data['password'] = password
+
+    for start in range(0, len(accepted), chunk_size):
+        chunk = accepted[start:start + chunk_size]
+        try:
+            _insert_chunk(chunk)
+            continue
+        except IntegrityError:
+            # Someone registered one of these emails, or deleted one of these courses,
+            # since validation; report those rows and retry the rest once
+            remaining = _check_database(chunk)
+        if not remaining:
+            continue
+        try:
+            _insert_chunk(remaining)
+        except IntegrityError:
+            # Raced again: report the rows instead of retrying without end
+            for entry, _ in remaining:
+                entry['errors'] = {api_settings.NON_FIELD_ERRORS_KEY: [CONCURRENT_CHANGE]}
+
+    return report
+
+
+def register_student(data):
+    """
+    Register one student: the user and student rows are inserted in one transaction,
+    so a failure never leaves a user without its student.
+
+    The password is hashed before the transaction starts, and email uniqueness is left
+    to the unique constraint: a taken email makes the user INSERT fail, which is reported
+    like a validation error. A successful registration is exactly two INSERTs.
+
+    Parameters:
+    - data: validated StudentRegistrationSerializer data (course is a Course or None)
+
+    Returns:
+    - UserProfile: the new user
+
+    Raises:
+    - ValidationError: the email is taken, or the course was deleted in the meantime
+    """
+
+    password = make_password(data['password'])
+    try:
+        with transaction.atomic():
+            try:
+                user = UserProfile.objects.create(
+                    email=BaseUserManager.normalize_email(data['email']),
+                    password=password,
+                    first_name=data['name'],
+                    last_name=data['surname'],
+                    is_student=True,
+                )
+            except IntegrityError:
+                # email is the only unique column the insert can violate
+                raise ValidationError({'email': [DUPLICATE_EMAIL]})
+            Student.objects.create(user=user, course=data.get('course'))
+    except IntegrityError:
+        # Foreign keys are checked at commit: the course was deleted after validation
+        raise ValidationError({'course': [f"Invalid pk \"{data['course'].pk}\" - object does not exist."]})
+    return user
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Enrollment
+
+
+def pending(course_id):
+    """
+    Pending enrollment requests of a course in arrival order.
+    Filtering on status='pending' and course, ordered by id, matches the
+    enrollment_pending_queue partial index.
+    """
+
+    return Enrollment.objects.filter(course_id=course_id, status=Enrollment.PENDING).order_by('id')
+
+
+def claim_batch(course_id, reviewer, size):
+    """
+    Claim up to `size` unclaimed pending requests of a course for a reviewer.
+
+    Rows are picked with SELECT ... FOR UPDATE SKIP LOCKED, so reviewers claiming at the
+    same time get disjoint batches without waiting on each other. A claim expires after
+    REVIEW_CLAIM_LEASE so requests of a reviewer who walked away go back to the queue.
+
+    Parameters:
+    - course_id: the ID of the course
+    - reviewer: the user claiming the requests; a UserProfile or the token user of a stateless token
+    - size: maximum number of requests to claim
+
+    Returns:
+    - list of Enrollment: the claimed requests
+    """
+
+    # By ID: a stateless token's user is not a model instance
+    reviewer_id = reviewer.pk
+    now = timezone.now()
+    expired = now - settings.REVIEW_CLAIM_LEASE
+
+    with transaction.atomic():
+        batch = list(
+            pending(course_id)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=expired) | Q(claimed_by_id=reviewer_id))
+            .select_for_update(skip_locked=True)[:size]
+        )
+        Enrollment.objects.filter(pk__in=[enrollment.pk for enrollment in batch]).update(
+            claimed_by_id=reviewer_id, claimed_at=now
+        )
+
+    for enrollment in batch:
+        enrollment.claimed_by_id = reviewer_id
+        enrollment.claimed_at = now
+    return batch
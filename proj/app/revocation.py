@@ -0,0 +1,225 @@
+"""
+Token revocation without database queries.
+
+Revocations (a token's JTI, or a cut-off time for all of a user's tokens) are kept in
+the Django cache until the tokens they cover expire. Every process also keeps a
+Bloom filter of everything revoked, so the common case, a token nobody revoked,
+is answered without any I/O; only keys the filter may contain are read from the cache.
+
+Processes learn about revocations made elsewhere from a numbered log in the cache:
+each revocation takes the next number and is stored under it. At most once every
+REVOCATION_SYNC_INTERVAL seconds a process reads the counter and adds the new
+entries to its filter, so a revocation reaches the other processes within that
+interval; the process that made it sees it at once. Filters are rotated every
+REFRESH_TOKEN_LIFETIME + ACCESS_TOKEN_LIFETIME, the longest any revocation has to be
+remembered, so expired revocations do not fill them up.
+"""
+
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+SEQUENCE_KEY = 'jwt:revocations:sequence'
+# Changes when the cache loses the log (flush, eviction); filters are then rebuilt
+EPOCH_KEY = 'jwt:revocations:epoch'
+
+# How long a log number that was taken but not yet written is retried
+_PENDING_GRACE = 10
+_SYNC_BATCH = 1000
+
+
+def _key(name):
+    return f'jwt:revoked:{name}'
+
+
+def _log_key(number):
+    return f'jwt:revocations:{number}'
+
+
+def _retention():
+    # An access token made at the end of a refresh token's life is the last token it covers
+    return (settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'] + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']).total_seconds()
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and about `error_rate` false positives
+    while it holds up to `capacity` keys.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class _RevocationFilter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _new_filter(self):
+        return BloomFilter(
+            getattr(settings, 'REVOCATION_BLOOM_CAPACITY', 100_000),
+            getattr(settings, 'REVOCATION_BLOOM_ERROR_RATE', 0.001),
+        )
+
+    def _reset(self):
+        self.current, self.previous = self._new_filter(), None
+        self.rotate_at = time.monotonic() + _retention()
+        self.epoch, self.synced = None, 0
+        self.pending = {}
+        self.sync_at = 0.0
+
+    def add(self, key):
+        with self._lock:
+            self.current.add(key)
+
+    def __contains__(self, key):
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+    def due(self):
+        return time.monotonic() >= self.sync_at
+
+    def sync(self):
+        """
+        Add the revocations logged since the last sync. Other threads keep answering from
+        the filter meanwhile instead of waiting.
+        """
+
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            self.sync_at = now + getattr(settings, 'REVOCATION_SYNC_INTERVAL', 1)
+            if now >= self.rotate_at:
+                # Everything in `previous` has expired by now; keep the newer half
+                self.previous, self.current = self.current, self._new_filter()
+                self.rotate_at = now + _retention()
+
+            state = cache.get_many([EPOCH_KEY, SEQUENCE_KEY])
+            epoch, sequence = state.get(EPOCH_KEY), state.get(SEQUENCE_KEY, 0)
+            if epoch is None:
+                cache.add(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+                epoch = cache.get(EPOCH_KEY)
+
+            target, rebuild = self.current, epoch != self.epoch or sequence < self.synced
+            if rebuild:
+                # A new log: whatever was learned from the old one is gone from the cache as well.
+                # The new filter is filled before it replaces the old one, so lookups never see it empty.
+                target, self.synced, self.pending = self._new_filter(), 0, {}
+
+            numbers = list(self.pending) + list(range(self.synced + 1, sequence + 1))
+            for start in range(0, len(numbers), _SYNC_BATCH):
+                batch = numbers[start:start + _SYNC_BATCH]
+                found = cache.get_many([_log_key(number) for number in batch])
+                for number in batch:
+                    key = found.get(_log_key(number))
+                    if key is not None:
+                        target.add(key)
+                        self.pending.pop(number, None)
+                    elif number > self.synced and not rebuild:
+                        # Numbered but not written yet by the revoking process; retry for a while.
+                        # When rebuilding, missing entries have simply expired.
+                        self.pending.setdefault(number, now + _PENDING_GRACE)
+
+            self.pending = {number: until for number, until in self.pending.items() if until > now}
+            self.synced = max(self.synced, sequence)
+            if rebuild:
+                self.current, self.previous, self.epoch = target, None, epoch
+        finally:
+            self._lock.release()
+
+
+_filter = _RevocationFilter()
+
+
+def revoke(name, value, timeout):
+    """
+    Record a revocation in the cache and the revocation log.
+
+    Parameters:
+    - name: what is revoked, e.g. 'jti:<jti>' or 'user:<id>'
+    - value: what lookups of the name return, e.g. True or a cut-off timestamp
+    - timeout: seconds until the revoked tokens have expired anyway
+    """
+
+    timeout = max(1, int(timeout))
+    cache.set(_key(name), value, timeout=timeout)
+    while True:
+        if cache.add(SEQUENCE_KEY, 0, timeout=None):
+            # A new counter starts a new log; processes rebuild their filters from it
+            cache.set(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        try:
+            number = cache.incr(SEQUENCE_KEY)
+            break
+        except ValueError:
+            # Evicted between add() and incr()
+            continue
+    cache.set(_log_key(number), name, timeout=timeout)
+    _filter.add(name)
+
+
+def lookup(names):
+    """
+    Revocations recorded for any of `names`. Names the Bloom filter has never seen are
+    skipped without touching the cache, so for tokens nobody revoked this does no I/O
+    (apart from a sync at most once every REVOCATION_SYNC_INTERVAL).
+
+    Returns:
+    - dict: name -> the value passed to revoke(), for the revoked names
+    """
+
+    if _filter.due():
+        _filter.sync()
+    candidates = [name for name in names if name in _filter]
+    if not candidates:
+        return {}
+    found = cache.get_many([_key(name) for name in candidates])
+    return {name: found[_key(name)] for name in candidates if _key(name) in found}
+
+
+async def alookup(names):
+    """
+    Async lookup().
+    """
+
+    if _filter.due():
+        await sync_to_async(_filter.sync)()
+    candidates = [name for name in names if name in _filter]
+    if not candidates:
+        return {}
+    found = await cache.aget_many([_key(name) for name in candidates])
+    return {name: found[_key(name)] for name in candidates if _key(name) in found}
+
+
+def reset():
+    """
+    Forget this process's filter; the next lookup rebuilds it from the log.
+    """
+
+    with _filter._lock:
+        _filter._reset()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .backend.authentication import ClaimsUser
+from .models import UserProfile
+
+Roles = namedtuple('Roles', ['is_student', 'is_professor', 'is_staff', 'is_admin'])
+
+NO_ROLES = Roles(False, False, False, False)
+
+
+class _LocalLRU:
+    """
+    Small thread-safe LRU with a per-entry TTL, kept per process in front of the shared cache.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Other processes only see an invalidation once their local entry expires,
+# so the local TTL is kept much shorter than the shared one.
+_local = _LocalLRU(
+    maxsize=getattr(settings, 'ROLE_CACHE_LOCAL_SIZE', 10000),
+    ttl=getattr(settings, 'ROLE_CACHE_LOCAL_TTL', 30),
+)
+
+
+def _cache_key(user_id):
+    return f'roles:{user_id}'
+
+
+def _load(user_id):
+    # One query: the user's flags plus LEFT JOINs to its student and professor rows
+    row = UserProfile.objects.filter(pk=user_id).values(
+        'is_staff', 'is_student', 'is_professor', 'student__user', 'professor__user', 'professor__is_admin'
+    ).first()
+    if row is None:
+        return NO_ROLES
+    return Roles(
+        is_student=row['is_student'] or row['student__user'] is not None,
+        is_professor=row['is_professor'] or row['professor__user'] is not None,
+        is_staff=row['is_staff'],
+        is_admin=bool(row['professor__is_admin']),
+    )
+
+
+def get_roles(user):
+    """
+    Resolve the roles of a request user.
+
+    Stateless tokens answer from their claims. Otherwise roles come from the
+    per-process LRU, then the shared Django cache, and only then from the database.
+    Entries are dropped by the save/delete signals in app.signals.
+
+    Parameters:
+    - user: request.user
+
+    Returns:
+    - Roles
+    """
+
+    if not user.is_authenticated:
+        return NO_ROLES
+    if isinstance(user, ClaimsUser):
+        return Roles(user.is_student, user.is_professor, user.is_staff, user.is_admin)
+
+    key = _cache_key(user.pk)
+    roles = _local.get(key)
+    if roles is not None:
+        return roles
+
+    cached = cache.get(key)
+    if cached is not None:
+        roles = Roles(*cached)
+    else:
+        roles = _load(user.pk)
+        cache.set(key, tuple(roles), timeout=getattr(settings, 'ROLE_CACHE_TTL', 300))
+    _local.set(key, roles)
+    return roles
+
+
+def invalidate(user_id):
+    """
+    Forget the cached roles of a user in this process and in the shared cache.
+    """
+
+    key = _cache_key(user_id)
+    _local.delete(key)
+    cache.delete(key)
+
+
+def clear_local():
+    """
+    Empty this process's LRU. The shared cache is left alone.
+    """
+
+    _local.clear()
@@ -0,0 +1,79 @@
+"""
+Send reads to the replicas in DATABASE_REPLICAS and writes to the primary ('default').
+
+A request is pinned to the primary, reads included, once it writes anything, while
+it runs inside a transaction on the primary, and for READ_PRIMARY_PIN_SECONDS after
+the client's last write (see app.middleware.ReadPrimaryMiddleware). That way clients
+always see their own writes even if the replicas lag.
+"""
+
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+
+
+class Pin:
+    """
+    Read routing state of one request.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_pin = contextvars.ContextVar('read_primary_pin', default=None)
+
+
+def start_request(pinned=False):
+    """
+    Begin tracking a request. Returns the token for end_request().
+    """
+
+    return _pin.set(Pin(pinned))
+
+
+def end_request(token):
+    """
+    Stop tracking the request started with `token`.
+
+    Returns:
+    - bool: True if the request wrote to the primary
+    """
+
+    pin = _pin.get()
+    _pin.reset(token)
+    return pin is not None and pin.wrote
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases:
+            return PRIMARY
+        pin = _pin.get()
+        if pin is not None and pin.pinned:
+            return PRIMARY
+        # Reads inside a transaction must see its writes and hold its locks
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        pin = _pin.get()
+        if pin is not None:
+            pin.pinned = pin.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
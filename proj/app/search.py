@@ -0,0 +1,146 @@
+"""
+Catalog search over Course.name and Subject.description.
+
+On PostgreSQL both tables get a `search_vector` tsvector column, generated from the
+text by the database itself (so saves, bulk_create and COPY all keep it current),
+with a GIN index, plus a trigram GIN index on the text (pg_trgm). The columns are
+not model fields: migration 0005_search_columns adds them, and only the raw queries
+below read them. A search is one ranked full-text query of word prefixes; when it
+finds nothing, a trigram query catches typos.
+
+Other databases get a degraded mode: every word must occur in the text (icontains),
+and texts starting with the query rank first. No typo tolerance and no index.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connections, router
+
+from .models import Course, Subject
+
+FULLTEXT = 'fulltext'
+TRIGRAM = 'trigram'
+BASIC = 'basic'
+
+# Text search configuration of the generated columns (see 0005_search_columns). Changing it
+# means a migration replacing the columns.
+TS_CONFIG = 'simple'
+
+# At most this many words of a query are used
+MAX_TERMS = 8
+
+_WORD = re.compile(r'\w+')
+
+# (model, text column, course id column)
+_TABLES = [(Course, 'name', 'id'), (Subject, 'description', 'course_id')]
+
+
+def terms(query):
+    """
+    The lowercased words of a search query, at most MAX_TERMS.
+    """
+
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def _candidates():
+    # Best matches kept per table before the two tables are merged and paged. Pages past
+    # this many results of one table are empty, whatever the offset.
+    return getattr(settings, 'SEARCH_MAX_CANDIDATES', 1000)
+
+
+def _union(select, quote):
+    """
+    Both tables' candidate queries joined into one ranked page. `select` renders one
+    table's SELECT (kind, id, text, course, rank) from the database's quote_name and the
+    table's model, text and course columns.
+    """
+
+    parts = ' UNION ALL '.join(f'({select(quote, model, text, course)})' for model, text, course in _TABLES)
+    return (
+        f'SELECT kind, id, text, course, rank FROM ({parts}) AS matches '
+        'ORDER BY rank DESC, kind, id LIMIT %(limit)s OFFSET %(offset)s'
+    )
+
+
+# The candidates of a table are its best matches, with ties broken by id, so that every
+# page of a search sees the same candidates; the GIN indexes still find the matches
+_TOP_CANDIDATES = 'ORDER BY rank DESC, id LIMIT %(candidates)s'
+
+
+def _fulltext_sql(quote, model, text, course):
+    table = quote(model._meta.db_table)
+    return (
+        f"SELECT '{model._meta.model_name}' AS kind, id, {quote(text)} AS text, {quote(course)} AS course, "
+        f'ts_rank(search_vector, query) AS rank '
+        f"FROM {table}, to_tsquery('{TS_CONFIG}', %(tsquery)s) AS query "
+        f'WHERE search_vector @@ query {_TOP_CANDIDATES}'
+    )
+
+
+def _trigram_sql(quote, model, text, course):
+    table, text = quote(model._meta.db_table), quote(text)
+    # <% is word similarity above pg_trgm.word_similarity_threshold, answered by the trigram index
+    return (
+        f"SELECT '{model._meta.model_name}' AS kind, id, {text} AS text, {quote(course)} AS course, "
+        f'word_similarity(%(query)s, {text}) AS rank '
+        f'FROM {table} WHERE %(query)s <%% {text} {_TOP_CANDIDATES}'
+    )
+
+
+def _run(database, select, params):
+    with database.cursor() as cursor:
+        cursor.execute(_union(select, database.ops.quote_name), params)
+        return [
+            {'type': kind, 'id': pk, 'text': text, 'course': course, 'rank': round(rank, 6)}
+            for kind, pk, text, course, rank in cursor.fetchall()
+        ]
+
+
+def _basic(words, query, limit, offset):
+    prefix = query.strip().lower()
+    rows = []
+    for model, text, course in _TABLES:
+        queryset = model.objects.all()
+        for word in words:
+            queryset = queryset.filter(**{f'{text}__icontains': word})
+        for pk, value, course_id in queryset.order_by('pk').values_list('pk', text, course)[:_candidates()]:
+            rows.append({
+                'type': model._meta.model_name, 'id': pk, 'text': value, 'course': course_id,
+                'rank': 1.0 if value.lower().startswith(prefix) else 0.5,
+            })
+    rows.sort(key=lambda row: (-row['rank'], row['type'], row['id']))
+    return rows[offset:offset + limit]
+
+
+def search(query, limit, offset=0, mode=None):
+    """
+    Search courses and subjects.
+
+    Parameters:
+    - query: the user's search text
+    - limit, offset: the page of ranked results
+    - mode: FULLTEXT or TRIGRAM to stay in the mode of an earlier page; by default
+      full-text matching, falling back to trigrams when the first page is empty
+
+    Returns:
+    - (list of dict, str): results with type ('course' or 'subject'), id, text, course
+      and rank, best first, and the mode used: FULLTEXT, TRIGRAM or BASIC
+    """
+
+    words = terms(query)
+    if not words:
+        return [], mode or FULLTEXT
+    # A read like any other: on a replica when there are replicas
+    database = connections[router.db_for_read(Subject)]
+    if database.vendor != 'postgresql':
+        return _basic(words, query, limit, offset), BASIC
+
+    params = {'limit': limit, 'offset': offset, 'candidates': _candidates()}
+    if mode != TRIGRAM:
+        # Every word as a prefix, so partly typed words match too
+        rows = _run(database, _fulltext_sql, {**params, 'tsquery': ' & '.join(f'{word}:*' for word in words)})
+        if rows or offset or mode == FULLTEXT:
+            return rows, FULLTEXT
+    return _run(database, _trigram_sql, {**params, 'query': ' '.join(words)}), TRIGRAM
@@ -0,0 +1,323 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Course, CourseSeatShard, Enrollment
+
+# Outcomes of approve()
+SEAT_CLAIMED = 'claimed'
+COURSE_FULL = 'full'
+ALREADY_APPROVED = 'already_approved'
+
+
+def shard_count():
+    """
+    Number of seat counter shards per course. 1 means the single-row counter on Course.
+    """
+
+    return max(1, getattr(settings, 'SEAT_COUNTER_SHARDS', 1))
+
+
+def reserve_seat(course_id):
+    """
+    Claim one seat in a course with a single conditional UPDATE.
+
+    The capacity check and the increment run in the same statement
+    (UPDATE ... SET current_capacity = current_capacity + 1
+    WHERE id = %s AND current_capacity < max_capacity), so concurrent
+    callers can never push current_capacity past max_capacity.
+
+    In sharded mode the same conditional UPDATE runs against one randomly
+    picked CourseSeatShard row instead, so concurrent approvals for a
+    popular course are spread over several row locks.
+
+    Parameters:
+    - course_id: the ID of the course
+
+    Returns:
+    - bool: True if a seat was claimed, False if the course is full or does not exist
+    """
+
+    shards = shard_count()
+    if shards > 1:
+        return _reserve_sharded(course_id, shards)
+
+    return Course.objects.filter(
+        pk=course_id, current_capacity__lt=F('max_capacity')
+    ).update(current_capacity=F('current_capacity') + 1) == 1
+
+
+def release_seat(course_id):
+    """
+    Give back one seat in a course. Never drops the count below zero.
+
+    Returns:
+    - bool: True if a seat was released
+    """
+
+    shards = shard_count()
+    if shards > 1:
+        start = random.randrange(shards)
+        for offset in range(shards):
+            if CourseSeatShard.objects.filter(
+                course_id=course_id, shard=(start + offset) % shards, taken__gt=0
+            ).update(taken=F('taken') - 1):
+                return True
+        if CourseSeatShard.objects.filter(course_id=course_id).exists():
+            return False
+
+    return Course.objects.filter(
+        pk=course_id, current_capacity__gt=0
+    ).update(current_capacity=F('current_capacity') - 1) == 1
+
+
+def seat_count(course):
+    """
+    Number of seats taken in a course. In sharded mode this is the sum over the shards.
+    """
+
+    if shard_count() > 1:
+        taken = course.seat_shards.aggregate(total=Sum('taken'))['total']
+        if taken is not None:
+            return taken
+    return course.current_capacity
+
+
+def has_free_seat(course):
+    """
+    Cheap, advisory check used to reject requests for full courses early.
+    The authoritative check is reserve_seat().
+    """
+
+    return seat_count(course) < course.max_capacity
+
+
+def approve(enrollment, admin=None):
+    """
+    Approve an enrollment and claim its seat in one transaction.
+
+    The seat is claimed first so the course row lock is taken before the
+    enrollment row; if the enrollment turns out to be approved already the
+    whole transaction is rolled back and no seat is consumed.
+
+    Parameters:
+    - enrollment: the Enrollment instance to approve
+    - admin: the user approving the enrollment; a UserProfile or, for stateless
+      tokens, a ClaimsUser, so only its pk is used
+
+    Returns:
+    - str: SEAT_CLAIMED, COURSE_FULL or ALREADY_APPROVED
+    """
+
+    admin_id = admin.pk if admin is not None else None
+    with transaction.atomic():
+        if not reserve_seat(enrollment.course_id):
+            return COURSE_FULL
+
+        updated = Enrollment.objects.filter(pk=enrollment.pk).exclude(
+            status=Enrollment.APPROVED
+        ).update(status=Enrollment.APPROVED, admin_id=admin_id)
+        if not updated:
+            transaction.set_rollback(True)
+            return ALREADY_APPROVED
+
+    enrollment.status = Enrollment.APPROVED
+    enrollment.admin_id = admin_id
+    return SEAT_CLAIMED
+
+
+def approve_many(enrollments, admin=None):
+    """
+    Approve a selection of enrollments, course by course, up to the seats left.
+
+    Each course is locked once; its pending enrollments from the selection are approved
+    in arrival order with one UPDATE and the course's seat count goes up by the number
+    approved, so the work per course is a fixed number of queries however many rows
+    were selected. Courses are locked in ID order so concurrent calls cannot deadlock.
+
+    Parameters:
+    - enrollments: queryset of Enrollment rows to approve
+    - admin: the user approving the enrollments
+
+    Returns:
+    - dict: 'approved' and 'full' (left pending because the course was full) map to lists of enrollment IDs;
+      'skipped' lists selected enrollments that were not pending
+    """
+
+    selection = enrollments.order_by()
+    report = {
+        'approved': [],
+        'full': [],
+        'skipped': list(selection.exclude(status=Enrollment.PENDING).order_by('id').values_list('id', flat=True)),
+    }
+
+    course_ids = sorted(set(selection.filter(status=Enrollment.PENDING).values_list('course_id', flat=True)))
+    for course_id in course_ids:
+        with transaction.atomic():
+            try:
+                course = Course.objects.select_for_update().get(pk=course_id)
+            except Course.DoesNotExist:
+                continue
+            # Seat counters before enrollment rows, the order approve() locks them in
+            lock_seat_shards(course)
+            pending_ids = list(
+                selection.filter(course_id=course_id, status=Enrollment.PENDING)
+                .select_for_update().order_by('id').values_list('id', flat=True)
+            )
+            approved = pending_ids[:claim_locked_seats(course, len(pending_ids))]
+            if approved:
+                Enrollment.objects.filter(pk__in=approved).update(
+                    status=Enrollment.APPROVED, admin_id=admin.pk if admin else None
+                )
+
+        report['approved'].extend(approved)
+        report['full'].extend(pending_ids[len(approved):])
+
+    return report
+
+
+def lock_seat_shards(course):
+    """
+    In sharded mode, bring the shards of a course whose row is locked by the caller in
+    sync with max_capacity and lock them. approve() claims seats on the shards without
+    touching the course row, so callers about to lock enrollment rows must lock the
+    shards first. Returns the locked shards, none in single-row mode.
+    """
+
+    shards = shard_count()
+    if shards <= 1:
+        return []
+    if not _shards_in_sync(course.pk, shards):
+        rebalance_shards(course.pk, shards)
+    return list(CourseSeatShard.objects.select_for_update().filter(course=course).order_by('shard'))
+
+
+def claim_locked_seats(course, count):
+    """
+    Claim up to `count` seats in a course whose row is locked by the caller.
+    Returns the number of seats claimed.
+    """
+
+    if shard_count() <= 1:
+        claimed = max(0, min(count, course.max_capacity - course.current_capacity))
+        if claimed:
+            Course.objects.filter(pk=course.pk).update(current_capacity=F('current_capacity') + claimed)
+        return claimed
+
+    course_shards = lock_seat_shards(course)
+    remaining = count
+    for shard in course_shards:
+        take = max(0, min(remaining, shard.capacity - shard.taken))
+        shard.taken += take
+        remaining -= take
+    CourseSeatShard.objects.bulk_update(course_shards, ['taken'])
+    return count - remaining
+
+
+def _split(total, parts):
+    """
+    Split `total` into `parts` integers that differ by at most one.
+    """
+
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def shard_layout(max_capacity, taken, shards):
+    """
+    (capacity, taken) of each of a course's shards holding `taken` seats.
+
+    Capacities add up to max_capacity and are filled in order; anything over
+    max_capacity (after a capacity cut) stays on the first shard so no new seats
+    can be claimed until it drains.
+    """
+
+    layout = []
+    remaining = taken
+    for capacity in _split(max_capacity, shards):
+        shard_taken = min(capacity, remaining)
+        remaining -= shard_taken
+        layout.append((capacity, shard_taken))
+    layout[0] = (layout[0][0], layout[0][1] + remaining)
+    return layout
+
+
+def _claim_shard(course_id, shards):
+    # Start at a random shard and walk the rest only if it is full
+    start = random.randrange(shards)
+    for offset in range(shards):
+        if CourseSeatShard.objects.filter(
+            course_id=course_id, shard=(start + offset) % shards, taken__lt=F('capacity')
+        ).update(taken=F('taken') + 1):
+            return True
+    return False
+
+
+def _shards_in_sync(course_id, shards):
+    state = CourseSeatShard.objects.filter(course_id=course_id).aggregate(
+        count=Count('id'), capacity=Sum('capacity')
+    )
+    if state['count'] != shards:
+        return False
+    return Course.objects.filter(pk=course_id, max_capacity=state['capacity']).exists()
+
+
+def _reserve_sharded(course_id, shards):
+    if _claim_shard(course_id, shards):
+        return True
+
+    # Every shard is full. Either the course really is full, or its shards
+    # are missing or out of date with max_capacity; fix those and retry once.
+    if _shards_in_sync(course_id, shards):
+        return False
+    rebalance_shards(course_id, shards)
+    return _claim_shard(course_id, shards)
+
+
+def rebalance_shards(course_id, shards=None):
+    """
+    Create or resize the seat shards of a course so that their capacities add up to
+    max_capacity, keeping the number of taken seats. Also writes the current total
+    back to Course.current_capacity.
+
+    Takes row locks on the course and all of its shards, so call it when the number
+    of shards or max_capacity changes, not on the hot path.
+
+    Parameters:
+    - course_id: the ID of the course
+    - shards: number of shards, defaults to SEAT_COUNTER_SHARDS
+    """
+
+    shards = shards or shard_count()
+
+    with transaction.atomic():
+        try:
+            course = Course.objects.select_for_update().get(pk=course_id)
+        except Course.DoesNotExist:
+            return
+
+        existing = {
+            shard.shard: shard
+            for shard in CourseSeatShard.objects.select_for_update().filter(course=course)
+        }
+        if existing:
+            taken = sum(shard.taken for shard in existing.values())
+        else:
+            taken = course.current_capacity
+
+        to_update, to_create = [], []
+        for index, (capacity, shard_taken) in enumerate(shard_layout(course.max_capacity, taken, shards)):
+            shard = existing.pop(index, None)
+            if shard is None:
+                to_create.append(CourseSeatShard(course=course, shard=index, capacity=capacity, taken=shard_taken))
+            else:
+                shard.capacity, shard.taken = capacity, shard_taken
+                to_update.append(shard)
+
+        CourseSeatShard.objects.filter(pk__in=[shard.pk for shard in existing.values()]).delete()
+        CourseSeatShard.objects.bulk_update(to_update, ['capacity', 'taken'])
+        CourseSeatShard.objects.bulk_create(to_create)
+
+        Course.objects.filter(pk=course.pk).update(current_capacity=taken)
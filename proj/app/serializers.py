@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Course, Subject, UserProfile, Student, Professor, Course, CourseType
+from .models import Course, Subject, UserProfile, Student, Professor, Course, CourseType, Enrollment
 from rest_framework_simplejwt.tokens import RefreshToken
+from .read_serializers import ReadSerializer
+from . import seats
 
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -62,60 +64,33 @@ class StudentSerializer(serializers.ModelSerializer):
         
         return Student.objects.create(**validated_data)
 
-class StudentRegistrationSerializer(serializers.ModelSerializer):
-    name = serializers.CharField()
-    surname = serializers.CharField()
-    email = serializers.EmailField()
+class StudentRegistrationSerializer(serializers.Serializer):
+    """
+    Input of student registration, see registration.register_student().
+    The email is not looked up here: a taken email fails the insert instead.
+    """
+
+    name = serializers.CharField(max_length=150)
+    surname = serializers.CharField(max_length=150)
+    email = serializers.EmailField(max_length=254)
     password = serializers.CharField(write_only=True)
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all(), required=False, allow_null=True)
 
-    class Meta:
-        model = Student
-        fields = ['name', 'surname', 'email', 'password', 'course']
 
-    def validate_email(self, value):
-        """
-        Validate the email value and check if it already exists in the UserProfile objects. 
-        Raises a serializers.ValidationError if a user with the email already exists. 
-        Returns the email value.
-        """
+class BulkStudentRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk registration batch. Validates the row's shape only;
+    email and course checks are done for the whole batch at once.
+    """
 
-        if UserProfile.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this email already exists.")
-        return value
-    
-    def create(self, validated_data):
-        """
-        Create user profile and student profile using the provided validated data.
-        
-        Parameters:
-            validated_data (dict): A dictionary containing the validated data for creating user and student profiles.
-        
-        Returns:
-            User: The user profile created.
-        """
-        
-        user_data = {
-            'email': validated_data.pop('email'),
-            'password': validated_data.pop('password'),
-            'first_name': validated_data.pop('name'),
-            'last_name': validated_data.pop('surname'),
-        }
-        user_serializer = UserSerializer(data=user_data)
-        if user_serializer.is_valid():
-            user = user_serializer.save()
-        else:
-            raise serializers.ValidationError(user_serializer.errors)
-
-        # Create student profile
-        validated_data['user'] = user.pk  # Assign user's primary key
-        student_serializer = StudentSerializer(data=validated_data)
-        if student_serializer.is_valid():
-            student = student_serializer.save()
-        else:
-            raise serializers.ValidationError(student_serializer.errors)
-
-        return user
+    name = serializers.CharField()
+    surname = serializers.CharField()
+    email = serializers.EmailField()
+    password = serializers.CharField(write_only=True)
+    course = serializers.IntegerField(required=False, allow_null=True)
+    school = serializers.CharField(required=False, default="")
+    place_of_birth = serializers.CharField(required=False, allow_null=True)
+    average_score = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, default=0)
 
 
 class ProfessorSerializer(serializers.ModelSerializer):
@@ -141,6 +116,50 @@ class CourseSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'course_type', 'max_capacity', 'current_capacity']
         read_only_fields = ['id']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # With sharded seat counters approvals only update the shards, and
+        # Course.current_capacity catches up only in seats.rebalance_shards()
+        data['current_capacity'] = seats.seat_count(instance)
+        return data
+
+class CatalogCourseSerializer(serializers.ModelSerializer):
+    """
+    Course fields that only change with the catalog, so listings can be cached.
+    current_capacity moves with every approval and is left out.
+    """
+
+    class Meta:
+        model = Course
+        fields = ['id', 'name', 'course_type', 'max_capacity']
+
+class CourseSubjectSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Subject
+        fields = ['id', 'description', 'ects_points']
+
+class StudentCourseSerializer(serializers.ModelSerializer):
+    """
+    A student's course with its subjects. Expects the queryset to prefetch
+    `subject_set` and annotate `total_ects`.
+    """
+
+    subjects = CourseSubjectSerializer(source='subject_set', many=True, read_only=True)
+    total_ects = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'name', 'total_ects', 'subjects']
+
+class PendingEnrollmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'student', 'course', 'status', 'claimed_by', 'claimed_at']
+        read_only_fields = fields
+
+class ClaimBatchSerializer(serializers.Serializer):
+    size = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
 class CourseAndDetailsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
@@ -166,4 +185,8 @@ class CourseAndDetailsSerializer(serializers.ModelSerializer):
         return student
 
 class CourseSelectionSerializer(serializers.Serializer):
-    course_ids = serializers.ListField(child=serializers.IntegerField())
\ No newline at end of file
+    course_ids = serializers.ListField(child=serializers.IntegerField())
+
+# values_list() read paths of the list endpoints, same output as the serializers above
+student_rows = ReadSerializer(StudentSerializer)
+subject_rows = ReadSerializer(SubjectSerializer)
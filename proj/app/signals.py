@@ -0,0 +1,94 @@
+from django.db import models, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import catalog, instrumentation, roles, waitlist
+from .backend.authentication import revoke_tokens
+from .models import Course, CourseType, Enrollment, Professor, Student, Subject, UserProfile
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
+
+
+def _invalidate_roles(user_id, using):
+    # Now, for reads later in this transaction, and again after commit: a concurrent
+    # request may have cached the old roles before the change became visible to it
+    roles.invalidate(user_id)
+    transaction.on_commit(lambda: roles.invalidate(user_id), using=using)
+
+
+def _revoke_tokens(user_id, using):
+    # Stateless tokens carry the old roles as claims; after commit, so a token issued
+    # before the change became visible cannot slip past the cut-off
+    transaction.on_commit(lambda: revoke_tokens(user_id), using=using)
+
+
+# Fields stateless tokens copy into their claims (see stateless_token_for)
+_ROLE_FIELDS = {
+    UserProfile: ('is_active', 'is_staff', 'is_superuser', 'is_student', 'is_professor'),
+    Professor: ('is_admin',),
+}
+
+
+def _role_state(instance):
+    # From __dict__, so deferred fields are not loaded
+    return tuple(instance.__dict__.get(name) for name in _ROLE_FIELDS[type(instance)])
+
+
+@receiver(post_init, sender=UserProfile)
+@receiver(post_init, sender=Professor)
+def remember_roles(sender, instance, **kwargs):
+    instance._saved_roles = _role_state(instance)
+
+
+def _roles_changed(instance):
+    state = _role_state(instance)
+    changed = state != instance._saved_roles
+    instance._saved_roles = state
+    return changed
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_user_roles(sender, instance, created, using, **kwargs):
+    _invalidate_roles(instance.pk, using)
+    # A new user has no tokens yet; last_login or password updates change no role
+    if _roles_changed(instance) and not created:
+        _revoke_tokens(instance.pk, using)
+
+
+@receiver(post_save, sender=Professor)
+@receiver(post_save, sender=Student)
+def invalidate_profile_roles(sender, instance, created, using, **kwargs):
+    _invalidate_roles(instance.user_id, using)
+    # Becoming a student or professor is a role change, a student changing course is not
+    if created or (sender is Professor and _roles_changed(instance)):
+        _revoke_tokens(instance.user_id, using)
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=Professor)
+@receiver(post_delete, sender=Student)
+def revoke_deleted_roles(sender, instance, using, **kwargs):
+    user_id = instance.pk if sender is UserProfile else instance.user_id
+    _invalidate_roles(user_id, using)
+    _revoke_tokens(user_id, using)
+
+
+@receiver([post_save, post_delete], sender=CourseType)
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Subject)
+def bump_catalog_version(sender, using, **kwargs):
+    # After commit: bumped earlier, a concurrent request could cache the old rows
+    # under the new version and serve them until CATALOG_CACHE_TTL
+    transaction.on_commit(catalog.bump_version, using=using)
+
+
+@receiver(post_delete, sender=Enrollment)
+def free_deleted_enrollment_seat(sender, instance, origin=None, **kwargs):
+    # Deleting an approved enrollment frees its seat, unless its course is being deleted as well
+    origin_model = type(origin) if isinstance(origin, models.Model) else getattr(origin, 'model', None)
+    if instance.status == Enrollment.APPROVED and origin_model not in (Course, CourseType):
+        waitlist.free_seat(instance.course_id)
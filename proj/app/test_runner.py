@@ -0,0 +1,37 @@
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Tests and benchmarks run in one process against throwaway databases, so they get a cache of
+# their own: clearing it must never flush the shared cache of a running deployment
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# The shared cache checks of app.checks, which LOCAL_CACHES would fail
+LOCAL_CACHE_CHECKS = ['app.E001', 'app.W001']
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that makes views going over their @query_budget fail the test.
+    Request log lines are kept quiet unless they flag a problem, and the cache is
+    LOCAL_CACHES instead of the shared one.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._local_cache = override_settings(
+            CACHES=LOCAL_CACHES, SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, *LOCAL_CACHE_CHECKS],
+        )
+        self._local_cache.enable()
+        self._saved_strict = settings.QUERY_BUDGET_STRICT
+        settings.QUERY_BUDGET_STRICT = True
+        self._request_logger = logging.getLogger('app.requests')
+        self._saved_level = self._request_logger.level
+        self._request_logger.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_BUDGET_STRICT = self._saved_strict
+        self._request_logger.setLevel(self._saved_level)
+        self._local_cache.disable()
+        super().teardown_test_environment(**kwargs)
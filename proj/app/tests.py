@@ -1,8 +1,50 @@
-from django.test import TestCase
-from django.urls import reverse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APIClient
-from .models import Professor
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import Professor, Course, CourseSeatShard, CourseType, Enrollment, Student, Subject, UserProfile
+from . import allocation, async_views, benchmarks, catalog, checks, datasets, hashing, metrics, registration, review_queue, revocation, roles, routers, search, seats, views, waitlist
+from .instrumentation import QueryBudgetExceeded, query_budget
+from .middleware import QueryInstrumentationMiddleware, ReadPrimaryMiddleware
+from .pagination import StudentCursorPagination
+from .permissions import CanRegisterProfessor
+from .read_serializers import ReadSerializer
+from .renderers import FastJSONRenderer
+from .serializers import CourseSerializer, StudentSerializer, SubjectSerializer, student_rows, subject_rows
+from .routers import PrimaryReplicaRouter
+from .test_runner import LOCAL_CACHES
+from .backend.authentication import (
+    ISSUED_AT_CLAIM, access_token_for, is_revoked, refresh_token_for, revoke_token, revoke_tokens, stateless_token_for,
+)
+from .backend.postgresql_pool.base import pool_stats
+from .backend.postgresql_pool.pool import ConnectionPool, PoolTimeout
 
 class ProfessorRegistrationTestCase(TestCase):
     fixtures = ['professors.json']
@@ -34,3 +76,1876 @@ class ProfessorRegistrationTestCase(TestCase):
 
         # Check if registration failed due to duplicate email (HTTP status code 400)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def create_students(count, course=None, prefix='student'):
+    """
+    Create `count` students (with their user profiles) and return them.
+    """
+
+    students = []
+    for i in range(count):
+        user = UserProfile.objects.create(email=f'{prefix}{i}@example.com', is_student=True)
+        students.append(Student.objects.create(user=user, course=course))
+    return students
+
+
+class SeatReservationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=2)
+
+    def test_reserve_seat_stops_at_max_capacity(self):
+        self.assertTrue(seats.reserve_seat(self.course.pk))
+        self.assertTrue(seats.reserve_seat(self.course.pk))
+        self.assertFalse(seats.reserve_seat(self.course.pk))
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.current_capacity, 2)
+
+    def test_approve_claims_one_seat_per_enrollment(self):
+        student = create_students(1)[0]
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+
+        self.assertEqual(seats.approve(enrollment), seats.SEAT_CLAIMED)
+        # Approving twice must not consume a second seat
+        self.assertEqual(seats.approve(enrollment), seats.ALREADY_APPROVED)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.current_capacity, 1)
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.status, Enrollment.APPROVED)
+
+    def test_approve_leaves_enrollment_pending_when_full(self):
+        students = create_students(3)
+        enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in students]
+
+        results = [seats.approve(e) for e in enrollments]
+
+        self.assertEqual(results, [seats.SEAT_CLAIMED, seats.SEAT_CLAIMED, seats.COURSE_FULL])
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.PENDING).count(), 1)
+
+
+class StudentListPaginationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        self.students = create_students(25, course=course)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.students[0].user)
+
+    def test_pages_walk_all_students_in_constant_queries(self):
+        seen = []
+        url = '/students/?page_size=10'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 10)
+            seen.extend(row['user'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [student.pk for student in self.students])
+
+    def test_page_size_is_bounded(self):
+        # Lower the cap so 25 students are enough to see a request above it clamped
+        with mock.patch.object(StudentCursorPagination, 'max_page_size', 10):
+            response = self.client.get('/students/?page_size=100000')
+
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(StudentCursorPagination.max_page_size, 1000)
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        self.students = create_students(5, course=self.course)
+        Enrollment.objects.bulk_create([Enrollment(student=s, course=self.course) for s in self.students])
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserProfile.objects.create(email='registrar@example.com', is_staff=True))
+
+    def test_students_ndjson_stream(self):
+        response = self.client.get('/export/students/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['user_id'] for row in rows], [s.pk for s in self.students])
+        self.assertEqual(rows[0]['email'], 'student0@example.com')
+
+    def test_enrollments_csv_stream(self):
+        response = self.client.get('/export/enrollments/?output=csv')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,student_id,course_id,status,admin_id')
+        self.assertEqual(len(lines), 6)
+
+    def test_export_requires_staff(self):
+        self.client.force_authenticate(user=self.students[0].user)
+
+        response = self.client.get('/export/students/')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_command_matches_endpoint(self):
+        output = io.StringIO()
+        call_command('export_data', 'enrollments', '--format', 'csv', '--chunk-size', '2', stdout=output)
+
+        response = self.client.get('/export/enrollments/?output=csv')
+        self.assertEqual(output.getvalue().encode(), b''.join(response.streaming_content))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkStudentRegistrationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        create_students(1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserProfile.objects.create(email='registrar@example.com', is_staff=True))
+
+    def row(self, email, **extra):
+        return {'name': 'Ana', 'surname': 'Anic', 'email': email, 'password': 'secret123', **extra}
+
+    def test_batch_reports_each_row(self):
+        rows = [
+            self.row('new0@example.com', course=self.course.pk),
+            self.row('student0@example.com'),
+            self.row('new1@example.com', course=999),
+            self.row('new0@example.com'),
+            {'email': 'new2@example.com'},
+            self.row('new3@example.com'),
+        ]
+
+        # One existing-email query, one course query, then one insert each for users
+        # and students inside a savepoint
+        with self.assertNumQueries(6):
+            report = registration.bulk_register_students(rows)
+
+        self.assertEqual([('user_id' in entry) for entry in report], [True, False, False, False, False, True])
+        self.assertIn('email', report[1]['errors'])
+        self.assertIn('course', report[2]['errors'])
+        self.assertIn('email', report[3]['errors'])
+        self.assertIn('password', report[4]['errors'])
+
+        student = Student.objects.get(user__email='new0@example.com')
+        self.assertEqual(student.course, self.course)
+        self.assertTrue(student.user.check_password('secret123'))
+
+    @override_settings(MAX_BULK_ROWS=2)
+    def test_batch_over_the_row_limit_is_refused(self):
+        rows = [self.row(f'new{i}@example.com') for i in range(3)]
+
+        response = self.client.post('/students/register/', rows, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('bulk_register_students', response.data['error'])
+        self.assertFalse(UserProfile.objects.filter(email__startswith='new').exists())
+        self.assertEqual(self.client.post('/students/register/', rows[:2], format='json').status_code, status.HTTP_201_CREATED)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_upload_over_the_size_limit_is_refused(self):
+        body = 'name,surname,email,password,course\n' + 'Ana,Anic,csv@example.com,secret123,\n' * 3
+        upload = SimpleUploadedFile('students.csv', body.encode(), content_type='text/csv')
+
+        response = self.client.post('/students/register/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_csv_upload(self):
+        body = 'name,surname,email,password,course\nAna,Anic,csv0@example.com,secret123,\nIvo,Ivic,csv1@example.com,secret123,%d\n' % self.course.pk
+
+        response = self.client.post('/students/register/', body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Student.objects.filter(course=self.course).count(), 1)
+
+    def test_email_taken_during_import_is_reported(self):
+        def hash_and_race(passwords, workers=1):
+            UserProfile.objects.create(email='race@example.com')
+            return [make_password(password) for password in passwords]
+
+        with mock.patch.object(registration, 'hash_passwords', hash_and_race):
+            report = registration.bulk_register_students([self.row('race@example.com'), self.row('calm@example.com')])
+
+        self.assertEqual(report[0]['errors'], {'email': [registration.DUPLICATE_EMAIL]})
+        self.assertTrue(Student.objects.filter(user__email='calm@example.com').exists())
+
+    def test_failed_retry_is_reported(self):
+        with mock.patch.object(registration, '_insert_chunk', side_effect=IntegrityError):
+            report = registration.bulk_register_students([self.row('new0@example.com'), self.row('new1@example.com')])
+
+        self.assertEqual([entry['errors'] for entry in report], [
+            {'non_field_errors': [registration.CONCURRENT_CHANGE]},
+        ] * 2)
+
+    def test_requests_hash_in_process(self):
+        with mock.patch.object(registration, 'ProcessPoolExecutor') as pool:
+            response = self.client.post('/students/register/', [
+                self.row(f'web{i}@example.com') for i in range(registration.POOL_THRESHOLD)
+            ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pool.assert_not_called()
+
+    def test_password_hashing_on_process_pool(self):
+        passwords = [f'secret{i}' for i in range(registration.POOL_THRESHOLD)]
+
+        hashed = registration.hash_passwords(passwords, workers=2)
+
+        self.assertTrue(all(check_password(p, h) for p, h in zip(passwords, hashed)))
+
+
+class StatelessTokenTestCase(TestCase):
+
+    def setUp(self):
+        self.student = create_students(1)[0]
+        self.student.user.set_password('secret123')
+        self.student.user.save()
+        professor_user = UserProfile.objects.create_user(email='prof@example.com', password='secret123')
+        self.professor = Professor.objects.create(user=professor_user, is_admin=True)
+        self.client = APIClient()
+
+    def tearDown(self):
+        # Revocations live in the cache, which is not rolled back with the database
+        cache.clear()
+
+    def login(self, email, stateless):
+        response = self.client.post('/login/', {'email': email, 'password': 'secret123', 'stateless': stateless}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_stateless_token_saves_the_user_query(self):
+        url = f'/student/{self.student.pk}/profile/'
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.login('student0@example.com', False)['access'])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.login('student0@example.com', True)['access'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_professor_permission_from_claims(self):
+        tokens = self.login('prof@example.com', True)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/professor/{self.professor.pk}/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Claims survive the refresh endpoint
+        access = self.client.post('/refresh/', {'refresh': tokens['refresh']}, format='json').data['access']
+        self.assertTrue(AccessToken(access)['is_admin'])
+
+    def test_role_changes_revoke_stateless_tokens(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        enrollment = Enrollment.objects.create(student=self.student, course=course)
+        admin_tokens = self.login('prof@example.com', True)
+        student_tokens = self.login('student0@example.com', True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.professor.is_admin = False
+            self.professor.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + admin_tokens['access'])
+        self.assertEqual(self.client.post(f'/enrollment/{enrollment.pk}/change/').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post('/refresh/', {'refresh': admin_tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.user.is_active = False
+            self.student.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + student_tokens['access'])
+        self.assertEqual(self.client.get(f'/student/{self.student.pk}/profile/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_saves_that_change_no_role_keep_tokens(self):
+        tokens = self.login('student0@example.com', True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.course = Course.objects.create(
+                name='Course1', course_type=CourseType.objects.create(name='Informaticki'), max_capacity=10,
+            )
+            self.student.save(update_fields=['course'])
+            self.student.user.set_password('secret456')
+            self.student.user.save()
+            self.professor.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+        self.assertEqual(self.client.get(f'/student/{self.student.pk}/profile/').status_code, status.HTTP_200_OK)
+
+    def test_revoked_tokens_are_rejected(self):
+        tokens = self.login('student0@example.com', True)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+
+        revoke_tokens(self.student.pk)
+
+        self.assertEqual(self.client.get(f'/student/{self.student.pk}/profile/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post('/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Logging in again right away, usually within the same second, gives working tokens
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.login('student0@example.com', True)['access'])
+        self.assertEqual(self.client.get(f'/student/{self.student.pk}/profile/').status_code, status.HTTP_200_OK)
+
+    def test_revocation_cut_off_is_sub_second(self):
+        revoke_tokens(self.student.pk)
+        cut_off = revocation.lookup([f'user:{self.student.pk}'])[f'user:{self.student.pk}']
+
+        before, after, legacy = (refresh_token_for(self.student.user) for _ in range(3))
+        for token in (before, after, legacy):
+            token['iat'] = int(cut_off)
+        before[ISSUED_AT_CLAIM] = cut_off - 0.001
+        after[ISSUED_AT_CLAIM] = cut_off + 0.001
+        del legacy[ISSUED_AT_CLAIM]
+
+        self.assertTrue(is_revoked(before))
+        self.assertFalse(is_revoked(after))
+        self.assertFalse(is_revoked(after.access_token))
+        # Without the claim a token from the second of the revocation may predate it
+        self.assertTrue(is_revoked(legacy))
+
+    def test_admin_approves_with_stateless_token(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        enrollment = Enrollment.objects.create(student=self.student, course=course)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.login('student0@example.com', True)['access'])
+        response = self.client.post(f'/enrollment/{enrollment.pk}/change/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.login('prof@example.com', True)['access'])
+        response = self.client.post(f'/enrollment/{enrollment.pk}/change/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        enrollment.refresh_from_db()
+        self.assertEqual((enrollment.status, enrollment.admin_id), (Enrollment.APPROVED, self.professor.user_id))
+
+
+class RoleCacheTestCase(TestCase):
+
+    def setUp(self):
+        user = UserProfile.objects.create_user(email='prof@example.com', password='secret123')
+        self.professor = Professor.objects.create(user=user, is_admin=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def tearDown(self):
+        cache.clear()
+        roles.clear_local()
+
+    def test_repeated_professor_calls_cost_no_role_queries(self):
+        url = f'/professor/{self.professor.pk}/profile/'
+
+        # Role lookup + professor profile
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        # Professor profile only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_shared_cache_serves_other_processes(self):
+        roles.get_roles(self.professor.user)
+        roles.clear_local()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.get_roles(self.professor.user).is_admin)
+
+    def test_professor_save_invalidates_roles(self):
+        url = f'/professor/{self.professor.pk}/profile/'
+        self.client.get(url)
+
+        self.professor.is_admin = False
+        self.professor.save()
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_roles_cached_before_commit_are_dropped_after_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.professor.is_admin = False
+                self.professor.save()
+                # A concurrent request that still sees the committed row caches the old roles
+                cache.set(f'roles:{self.professor.user_id}', (False, True, False, True))
+
+        self.assertFalse(roles.get_roles(self.professor.user).is_admin)
+
+    def test_can_register_professor_uses_roles(self):
+        request = APIRequestFactory().post('/professor/register/')
+        request.user = self.professor.user
+
+        self.assertTrue(CanRegisterProfessor().has_permission(request, None))
+
+
+class CatalogCacheTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        Subject.objects.create(description='Subject 1 for Informaticki', course=self.course, ects_points=5)
+        self.url = f'/course/{self.course.pk}/subjects/'
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_revalidation_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['ects_points'], 5)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_catalog_change_starts_new_version(self):
+        response = self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(description='Subject 2 for Informaticki', course=self.course, ects_points=3)
+
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.json()), 2)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_version_is_bumped_after_commit(self):
+        version = catalog.get_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Subject.objects.create(description='Subject 2 for Informaticki', course=self.course, ects_points=3)
+                # Until the commit other requests still see the old rows, so they keep the old version
+                self.assertEqual(catalog.get_version(), version)
+
+        self.assertGreater(catalog.get_version(), version)
+
+    def test_course_list_leaves_out_current_capacity(self):
+        response = self.client.get('/courses/')
+
+        self.assertEqual(response.json(), [
+            {'id': self.course.pk, 'name': 'Course1', 'course_type': self.course.course_type_id, 'max_capacity': 10},
+        ])
+
+
+class CoursesAndSubjectsTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.courses = [
+            Course.objects.create(name=f'Course{i}', course_type=course_type, max_capacity=10) for i in range(4)
+        ]
+        for course in self.courses:
+            Subject.objects.bulk_create([
+                Subject(description=f'Subject {i} for {course.name}', course=course, ects_points=i + 1) for i in range(3)
+            ])
+        self.student = create_students(1, course=self.courses[0])[0]
+
+    def test_courses_with_subjects_and_ects_in_constant_queries(self):
+        Enrollment.objects.create(student=self.student, course=self.courses[1], status=Enrollment.APPROVED)
+        Enrollment.objects.create(student=self.student, course=self.courses[2], status=Enrollment.PENDING)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/student/{self.student.pk}/courses/')
+
+        data = response.json()
+        self.assertEqual([course['id'] for course in data], [self.courses[0].pk, self.courses[1].pk])
+        self.assertEqual(data[0]['total_ects'], 6)
+        self.assertEqual(data[0]['subjects'][0], {
+            'id': data[0]['subjects'][0]['id'], 'description': 'Subject 0 for Course0', 'ects_points': 1,
+        })
+
+        # Adding courses does not add queries
+        for course in self.courses[2:]:
+            Enrollment.objects.update_or_create(student=self.student, course=course, defaults={'status': Enrollment.APPROVED})
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/student/{self.student.pk}/courses/')
+        self.assertEqual(len(response.json()), 4)
+
+    def test_unknown_student(self):
+        response = self.client.get('/student/999/courses/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CatalogImportTestCase(TestCase):
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_load_catalog_is_idempotent(self):
+        call_command('load_catalog', stdout=io.StringIO())
+        call_command('load_catalog', '--batch-size', '4', stdout=io.StringIO())
+
+        self.assertEqual(CourseType.objects.count(), 3)
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Subject.objects.count(), 9)
+        self.assertEqual(Course.objects.get(name='Course2').max_capacity, 120)
+
+    def test_load_catalog_updates_existing_rows(self):
+        call_command('load_catalog', stdout=io.StringIO())
+        course = Course.objects.get(name='Course3')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as catalog_file:
+            catalog_file.write(json.dumps({
+                'course_type': 'Matematicki', 'course': 'Course3', 'max_capacity': 15,
+                'subject': 'Subject 1 for Matematicki', 'ects_points': 8,
+            }) + '\n')
+        self.addCleanup(os.remove, catalog_file.name)
+        call_command('load_catalog', catalog_file.name, stdout=io.StringIO())
+
+        course.refresh_from_db()
+        self.assertEqual(course.max_capacity, 15)
+        self.assertEqual(Subject.objects.get(course=course, description='Subject 1 for Matematicki').ects_points, 8)
+        self.assertEqual(Subject.objects.count(), 9)
+
+    def test_course_update_and_duplicate(self):
+        call_command('load_catalog', stdout=io.StringIO())
+        course = Course.objects.get(name='Course1')
+        other = Course.objects.get(name='Course2')
+
+        def put(data):
+            request = APIRequestFactory().put(f'/course/{course.pk}/', data, format='json')
+            return views.update_course(request, course_id=course.pk)
+
+        response = put({'name': 'Course1', 'course_type': course.course_type_id, 'max_capacity': 30, 'current_capacity': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = put({'name': 'Course2', 'course_type': other.course_type_id, 'max_capacity': 30, 'current_capacity': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReviewQueueTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        self.students = create_students(12, course=self.course)
+        self.enrollments = Enrollment.objects.bulk_create([Enrollment(student=s, course=self.course) for s in self.students])
+        Enrollment.objects.filter(pk=self.enrollments[0].pk).update(status=Enrollment.APPROVED)
+        self.reviewers = [UserProfile.objects.create(email=f'reviewer{i}@example.com', is_staff=True) for i in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reviewers[0])
+
+    def test_pending_queue_pages_in_constant_queries(self):
+        seen = []
+        url = f'/course/{self.course.pk}/enrollments/pending/?page_size=5'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [e.pk for e in self.enrollments[1:]])
+
+    def test_reviewers_claim_disjoint_batches(self):
+        first = review_queue.claim_batch(self.course.pk, self.reviewers[0], 4)
+        second = review_queue.claim_batch(self.course.pk, self.reviewers[1], 4)
+
+        self.assertEqual([e.pk for e in first], [e.pk for e in self.enrollments[1:5]])
+        self.assertEqual([e.pk for e in second], [e.pk for e in self.enrollments[5:9]])
+
+    def test_expired_claims_return_to_the_queue(self):
+        review_queue.claim_batch(self.course.pk, self.reviewers[0], 11)
+        Enrollment.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        client = APIClient()
+        client.force_authenticate(user=self.reviewers[1])
+        response = client.post(f'/course/{self.course.pk}/enrollments/claim/', {'size': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['claimed_by'] for row in response.data], [self.reviewers[1].pk] * 3)
+
+    def test_admin_claims_with_stateless_token(self):
+        client = APIClient()
+        refresh = stateless_token_for(self.reviewers[1])
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(access_token_for(refresh)))
+        response = client.post(f'/course/{self.course.pk}/enrollments/claim/', {'size': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['claimed_by'] for row in response.data], [self.reviewers[1].pk] * 3)
+        self.assertEqual(
+            list(Enrollment.objects.filter(claimed_by=self.reviewers[1]).order_by('id').values_list('id', flat=True)),
+            [e.pk for e in self.enrollments[1:4]],
+        )
+
+    def test_duplicate_enrollment_request_is_rejected(self):
+        other = Course.objects.create(name='Course2', course_type=self.course.course_type, max_capacity=10)
+        client = APIClient()
+        client.force_authenticate(user=self.students[0].user)
+        url = f'/student/{self.students[0].pk}/course_enrollment/'
+
+        self.assertEqual(client.post(url, {'course_id': other.pk}, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(client.post(url, {'course_id': other.pk}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Enrollment.objects.filter(course=other).count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs SELECT ... FOR UPDATE SKIP LOCKED')
+class ConcurrentReviewQueueTestCase(TransactionTestCase):
+
+    def test_claim_skips_rows_locked_by_another_reviewer(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+        students = create_students(10, course=course)
+        enrollments = Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+        reviewer = UserProfile.objects.create(email='reviewer@example.com', is_staff=True)
+        locked, done = threading.Event(), threading.Event()
+
+        def hold_first_five():
+            try:
+                with transaction.atomic():
+                    list(review_queue.pending(course.pk).select_for_update()[:5])
+                    locked.set()
+                    done.wait(10)
+            finally:
+                connections.close_all()
+
+        holder = threading.Thread(target=hold_first_five)
+        holder.start()
+        locked.wait(10)
+        try:
+            batch = review_queue.claim_batch(course.pk, reviewer, 5)
+        finally:
+            done.set()
+            holder.join()
+
+        self.assertEqual([e.pk for e in batch], [e.pk for e in enrollments[5:]])
+
+
+class BulkApprovalTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.small = Course.objects.create(name='Course1', course_type=course_type, max_capacity=2)
+        self.large = Course.objects.create(name='Course2', course_type=course_type, max_capacity=50)
+        students = create_students(40)
+        self.small_enrollments = Enrollment.objects.bulk_create([Enrollment(student=s, course=self.small) for s in students[:5]])
+        self.large_enrollments = Enrollment.objects.bulk_create([Enrollment(student=s, course=self.large) for s in students[5:]])
+        Enrollment.objects.filter(pk=self.large_enrollments[0].pk).update(status=Enrollment.REJECTED)
+
+    def test_approves_up_to_remaining_seats_per_course(self):
+        # Skipped rows and course list, then per course a savepoint around the course lock,
+        # the pending select, the seat count update and the approval update
+        with self.assertNumQueries(2 + 2 * 6):
+            report = seats.approve_many(Enrollment.objects.all())
+
+        self.assertEqual(report['approved'], [e.pk for e in self.small_enrollments[:2]] + [e.pk for e in self.large_enrollments[1:]])
+        self.assertEqual(report['full'], [e.pk for e in self.small_enrollments[2:]])
+        self.assertEqual(report['skipped'], [self.large_enrollments[0].pk])
+
+        self.small.refresh_from_db()
+        self.large.refresh_from_db()
+        self.assertEqual((self.small.current_capacity, self.large.current_capacity), (2, 34))
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.APPROVED).count(), 36)
+
+    @override_settings(SEAT_COUNTER_SHARDS=4)
+    def test_sharded_counters(self):
+        report = seats.approve_many(Enrollment.objects.filter(course=self.small))
+
+        self.assertEqual(len(report['approved']), 2)
+        self.assertEqual(seats.seat_count(self.small), 2)
+
+    @override_settings(SEAT_COUNTER_SHARDS=4)
+    def test_sharded_counters_are_locked_before_the_enrollments(self):
+        # approve() updates a shard, then the enrollment; taking the locks the other way round could deadlock with it
+        with CaptureQueriesContext(connection) as queries:
+            seats.approve_many(Enrollment.objects.filter(course=self.small))
+
+        sql = [query['sql'] for query in queries.captured_queries]
+        course_lock = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and 'FROM "app_course" ' in q)
+        after = sql[course_lock:]
+        shard_lock = next(i for i, q in enumerate(after) if 'ORDER BY "app_courseseatshard"."shard"' in q)
+        enrollment_lock = next(i for i, q in enumerate(after) if q.startswith('SELECT') and 'FROM "app_enrollment"' in q)
+        self.assertLess(shard_lock, enrollment_lock)
+
+    def test_admin_action(self):
+        admin_user = UserProfile.objects.create_superuser(email='admin@example.com', password='secret123')
+        self.client.force_login(admin_user)
+
+        response = self.client.post('/admin/app/enrollment/', {
+            'action': 'approve_selected_enrollments',
+            '_selected_action': [e.pk for e in self.small_enrollments],
+        }, follow=True)
+
+        messages = [str(m) for m in response.context['messages']]
+        self.assertIn('2 enrollments approved', messages[0])
+        self.assertIn('3 left pending because the course is full', messages[1])
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.APPROVED, admin=admin_user).count(), 2)
+
+
+class MeritAllocationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=3, current_capacity=1)
+        self.students = create_students(5)
+        for student, score in zip(self.students, ['4.50', '3.20', '4.90', '3.20', '2.00']):
+            student.average_score = Decimal(score)
+            student.save()
+        self.enrollments = Enrollment.objects.bulk_create([Enrollment(student=s, course=self.course) for s in self.students])
+
+    def test_rank_is_deterministic_on_ties(self):
+        applications = [(1, 10, Decimal('3.00')), (2, 10, Decimal('4.00')), (3, 10, Decimal('3.00')), (4, 11, Decimal('1.00'))]
+
+        admitted, rejected, per_course = allocation.rank(applications, {10: 2, 11: 5})
+
+        self.assertEqual(admitted, [2, 1, 4])
+        self.assertEqual(rejected, [3])
+        self.assertEqual(per_course, {10: 2, 11: 1})
+
+    def test_allocate_fills_remaining_seats_by_score(self):
+        result = allocation.allocate_by_merit()
+
+        self.assertEqual((result['approved'], result['rejected']), (2, 3))
+        approved = set(Enrollment.objects.filter(status=Enrollment.APPROVED).values_list('student_id', flat=True))
+        self.assertEqual(approved, {self.students[2].pk, self.students[0].pk})
+        self.assertFalse(Enrollment.objects.filter(status=Enrollment.PENDING).exists())
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.current_capacity, 3)
+
+    @override_settings(SEAT_COUNTER_SHARDS=4)
+    def test_sharded_allocation_counts_seats_on_the_shards(self):
+        seats.rebalance_shards(self.course.pk)
+        CourseSeatShard.objects.filter(course=self.course, shard=1).update(taken=1)
+
+        result = allocation.allocate_by_merit()
+
+        self.assertEqual(result['approved'], 1)
+        self.assertEqual(
+            list(Enrollment.objects.filter(status=Enrollment.APPROVED).values_list('student_id', flat=True)),
+            [self.students[2].pk],
+        )
+        self.assertEqual(seats.seat_count(self.course), 3)
+
+    @override_settings(SEAT_COUNTER_SHARDS=4)
+    def test_sharded_allocation_approves_only_the_seats_claimed(self):
+        seats.rebalance_shards(self.course.pk)
+        claim = seats.claim_locked_seats
+
+        with mock.patch.object(seats, 'claim_locked_seats', lambda course, count: claim(course, count - 1)):
+            result = allocation.allocate_by_merit()
+
+        self.assertEqual((result['approved'], result['rejected']), (1, 4))
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.APPROVED).get().student, self.students[2])
+        self.assertEqual(seats.seat_count(self.course), 2)
+
+    def test_allocation_reports_the_time_of_each_phase(self):
+        timings = {}
+
+        result = allocation.allocate_by_merit(dry_run=True, timings=timings)
+
+        self.assertEqual(result['approved'], 2)
+        self.assertEqual(set(timings), {'lock', 'read', 'rank', 'write'})
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
+
+    def test_dry_run_saves_nothing(self):
+        output = io.StringIO()
+        call_command('allocate_seats', '--dry-run', stdout=output)
+
+        self.assertIn('2 approved, 3 rejected', output.getvalue())
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.PENDING).count(), 5)
+
+
+class WaitlistTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=1)
+        self.students = create_students(4)
+        self.approved = Enrollment.objects.create(student=self.students[0], course=self.course)
+        seats.approve(self.approved)
+        self.staff = UserProfile.objects.create(email='registrar@example.com', is_staff=True)
+
+    def enroll(self, student):
+        client = APIClient()
+        client.force_authenticate(user=student.user)
+        return client.post(f'/student/{student.pk}/course_enrollment/', {'course_id': self.course.pk}, format='json')
+
+    def test_full_course_returns_queue_position(self):
+        responses = [self.enroll(student) for student in self.students[1:]]
+
+        self.assertEqual([r.status_code for r in responses], [status.HTTP_202_ACCEPTED] * 3)
+        self.assertEqual([r.data['position'] for r in responses], [1, 2, 3])
+
+    def test_newcomer_queues_behind_waitlist_when_a_seat_is_free(self):
+        for student in self.students[1:3]:
+            self.enroll(student)
+        # A seat that has not been handed to the waitlist yet
+        Course.objects.filter(pk=self.course.pk).update(max_capacity=2)
+
+        response = self.enroll(self.students[3])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['position'], 3)
+        self.assertFalse(Enrollment.objects.filter(status=Enrollment.PENDING).exists())
+
+    def test_rejecting_approved_enrollment_promotes_head(self):
+        for student in self.students[1:]:
+            self.enroll(student)
+
+        request = APIRequestFactory().post(f'/enrollment/{self.approved.pk}/reject/')
+        force_authenticate(request, user=self.staff)
+        response = views.reject_enrollment(request, enrollment_id=self.approved.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        promoted = Enrollment.objects.get(status=Enrollment.PENDING)
+        self.assertEqual(promoted.student, self.students[1])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.current_capacity, 0)
+
+    def test_deleting_approved_enrollment_promotes_head(self):
+        self.enroll(self.students[1])
+
+        self.approved.delete()
+
+        self.assertEqual(Enrollment.objects.get(student=self.students[1]).status, Enrollment.PENDING)
+
+    def test_capacity_increase_promotes_as_many_as_new_seats(self):
+        for student in self.students[1:]:
+            self.enroll(student)
+
+        request = APIRequestFactory().put(f'/course/{self.course.pk}/', {
+            'name': 'Course1', 'course_type': self.course.course_type_id, 'max_capacity': 3, 'current_capacity': 1,
+        }, format='json')
+        views.update_course(request, course_id=self.course.pk)
+
+        self.assertEqual(
+            list(Enrollment.objects.filter(status=Enrollment.PENDING).order_by('id').values_list('student_id', flat=True)),
+            [self.students[1].pk, self.students[2].pk],
+        )
+        self.assertEqual(waitlist.position(Enrollment.objects.get(student=self.students[3])), 1)
+
+    @override_settings(WAITLIST_ORDER='score')
+    def test_score_order(self):
+        Student.objects.filter(pk=self.students[3].pk).update(average_score=Decimal('4.90'))
+        self.students[3].refresh_from_db()
+        for student in self.students[1:]:
+            self.enroll(student)
+
+        self.assertEqual(waitlist.promote(self.course.pk), [Enrollment.objects.get(student=self.students[3]).pk])
+
+
+class AsyncReadViewsTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        Subject.objects.bulk_create([
+            Subject(description=f'Subject {i}', course=self.course, ects_points=i + 1) for i in range(3)
+        ])
+        self.student = create_students(1, course=self.course)[0]
+        self.token = str(AccessToken.for_user(self.student.user))
+        self.factory = AsyncRequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def sync_get(self, url):
+        return APIClient().get(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def async_get(self, url, token=None):
+        return self.factory.get(url, headers={'Authorization': f'Bearer {token or self.token}'})
+
+    async def test_same_bytes_as_the_drf_views(self):
+        pk = self.student.pk
+        cases = [
+            (f'/student/{pk}/profile/', async_views.student_profile, {'id': pk}),
+            (f'/student/{pk}/courses/', async_views.courses_and_subjects, {'id': pk}),
+            ('/students/', async_views.student_list, {}),
+            (f'/course/{self.course.pk}/subjects/', async_views.subject_list, {'course_id': self.course.pk}),
+        ]
+        for url, view, kwargs in cases:
+            with self.subTest(url=url):
+                expected = await sync_to_async(self.sync_get)(url)
+                response = await view(self.async_get(url), **kwargs)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, expected.content)
+
+    async def test_profile_checks_token_and_owner(self):
+        url = f'/student/{self.student.pk}/profile/'
+
+        response = await async_views.student_profile(self.factory.get(url), id=self.student.pk)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await async_views.student_profile(self.async_get(url, token='not-a-token'), id=self.student.pk)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await async_views.student_profile(self.async_get(url), id=self.student.pk + 1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        await sync_to_async(revoke_tokens)(self.student.user.pk)
+        response = await async_views.student_profile(self.async_get(url), id=self.student.pk)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_subjects_revalidate_with_etag(self):
+        url = f'/course/{self.course.pk}/subjects/'
+        response = await async_views.subject_list(self.async_get(url), course_id=self.course.pk)
+
+        request = self.factory.get(url, headers={'If-None-Match': response['ETag']})
+        response = await async_views.subject_list(request, course_id=self.course.pk)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs a PostgreSQL server')
+class ConnectionPoolTestCase(TransactionTestCase):
+
+    def make_pool(self, max_size=2, timeout=0.2):
+        pool = ConnectionPool(1, max_size, timeout, **connection.get_connection_params())
+        self.addCleanup(pool.closeall)
+        return pool
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool()
+
+        first = pool.checkout()
+        pool.checkin(first)
+        second = pool.checkout()
+        pool.checkin(second)
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()['connects'], 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_checkout_waits_then_times_out(self):
+        pool = self.make_pool(max_size=1)
+        held = pool.checkout()
+
+        threading.Timer(0.05, pool.checkin, [held]).start()
+        pool.checkin(pool.checkout())
+        self.assertEqual(pool.stats()['waits'], 1)
+
+        held = pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        pool.checkin(held)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_broken_connections_are_evicted_on_checkout(self):
+        pool = self.make_pool()
+        broken = pool.checkout()
+        pid = broken.info.backend_pid
+        pool.checkin(broken)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        fresh = pool.checkout()
+        self.assertNotEqual(fresh.info.backend_pid, pid)
+        pool.checkin(fresh)
+        self.assertEqual(pool.stats()['evictions'], 1)
+
+
+class DatabasePoolMetricsTestCase(TestCase):
+
+    def test_admin_only(self):
+        user = UserProfile.objects.create_user(email='user@example.com', password='secret123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        self.assertEqual(client.get('/metrics/db-pool/').status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = client.get('/metrics/db-pool/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), pool_stats())
+
+    def test_prometheus_format(self):
+        text = metrics.to_prometheus('db_pool', 'database', {'default/db': {'waits': 3, 'checkouts': 10}})
+
+        self.assertEqual(text, 'db_pool_checkouts{database="default/db"} 10\ndb_pool_waits{database="default/db"} 3\n')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRouterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_replicas_until_the_request_writes(self):
+        token = routers.start_request()
+        try:
+            self.assertEqual(self.router.db_for_read(Student), 'replica')
+            self.assertEqual(self.router.db_for_write(Student), 'default')
+            self.assertEqual(self.router.db_for_read(Student), 'default')
+        finally:
+            self.assertTrue(routers.end_request(token))
+
+        # Outside a request nothing is pinned
+        self.assertEqual(self.router.db_for_read(Student), 'replica')
+
+    def test_write_sets_the_pin_cookie(self):
+        def write(request):
+            self.router.db_for_write(Student)
+            return HttpResponse()
+
+        def read(request):
+            return HttpResponse(self.router.db_for_read(Student))
+
+        response = ReadPrimaryMiddleware(write)(self.factory.post('/'))
+        cookie = response.cookies[settings.READ_PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.READ_PRIMARY_PIN_SECONDS)
+
+        self.assertEqual(ReadPrimaryMiddleware(read)(self.factory.get('/')).content, b'replica')
+        self.factory.cookies[settings.READ_PRIMARY_COOKIE] = '1'
+        self.assertEqual(ReadPrimaryMiddleware(read)(self.factory.get('/')).content, b'default')
+        self.assertNotIn(settings.READ_PRIMARY_COOKIE, ReadPrimaryMiddleware(read)(self.factory.get('/')).cookies)
+
+    def test_header_pins_to_primary(self):
+        def read(request):
+            return HttpResponse(self.router.db_for_read(Student))
+
+        response = ReadPrimaryMiddleware(read)(self.factory.get('/', headers={'X-Read-Primary': '1'}))
+
+        self.assertEqual(response.content, b'default')
+
+
+def _unreplicated_replica():
+    # A replica with its own test database, e.g. a second local SQLite or PostgreSQL database
+    return next((
+        alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+        if not settings.DATABASES[alias].get('TEST', {}).get('MIRROR')
+    ), None)
+
+
+@unittest.skipUnless(_unreplicated_replica(), 'needs a replica alias with its own database')
+class ReadYourWritesTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def test_writer_reads_from_primary_others_from_replica(self):
+        client = APIClient()
+        response = client.post('/student/register/', {
+            'name': 'Ana', 'surname': 'Anic', 'email': 'new@example.com', 'password': 'secret123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(settings.READ_PRIMARY_COOKIE, response.cookies)
+
+        user = UserProfile.objects.using('default').get(email='new@example.com')
+        client.force_authenticate(user=user)
+        url = f'/student/{user.pk}/profile/'
+
+        # Pinned by the cookie: the new row is on the primary
+        self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+
+        # Without it the read goes to the replica, which has not seen the write
+        client.cookies.clear()
+        self.assertEqual(client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QueryInstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        self.students = create_students(6, course=self.course)
+        self.factory = RequestFactory()
+
+    def run_view(self, view):
+        request = self.factory.get('/')
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='test_view')
+        return QueryInstrumentationMiddleware(view)(request)
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/student/{self.students[0].pk}/courses/')
+
+        self.assertRegex(
+            response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", view;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_view_time_is_logged_apart_from_total_time(self):
+        with self.assertLogs('app.requests', 'INFO') as logs:
+            self.client.get(f'/student/{self.students[0].pk}/courses/')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertLessEqual(record['db_ms'], record['view_ms'])
+        self.assertLessEqual(record['view_ms'], record['total_ms'])
+
+        # The resolver answered, no view ran
+        with self.assertLogs('app.requests', 'INFO') as logs:
+            response = self.client.get('/no-such-page/')
+        self.assertNotIn('view;', response['Server-Timing'])
+        self.assertIsNone(json.loads(logs.records[-1].getMessage())['view_ms'])
+
+    def test_repeated_queries_are_logged(self):
+        def view(request):
+            # One query per student: the N+1 pattern
+            emails = [Student.objects.get(pk=s.pk).user.email for s in self.students]
+            return HttpResponse(','.join(emails))
+
+        with self.assertLogs('app.requests', 'WARNING') as logs:
+            self.run_view(view)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'], 12)
+        self.assertEqual([entry['count'] for entry in record['repeated_queries']], [6, 6])
+        self.assertIn('WHERE "app_student"."user_id" = %s', record['repeated_queries'][0]['sql'])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_query_budget(self):
+        @query_budget(1)
+        def view(request):
+            return HttpResponse(Student.objects.count() + Course.objects.count())
+
+        with self.assertLogs('app.requests', 'WARNING'), self.assertRaises(QueryBudgetExceeded):
+            self.run_view(view)
+
+        view.query_budget = 2
+        self.assertEqual(self.run_view(view).status_code, status.HTTP_200_OK)
+
+    def test_enrollment_admin_has_no_repeated_queries(self):
+        admin_user = UserProfile.objects.create_superuser(email='admin@example.com', password='secret123')
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, course=self.course, status=Enrollment.APPROVED, admin=admin_user)
+            for student in self.students
+        ])
+        self.client.force_login(admin_user)
+
+        with self.assertNoLogs('app.requests', 'WARNING'):
+            response = self.client.get(reverse('admin:app_enrollment_changelist'))
+        self.assertContains(response, 'student5@example.com')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointBenchmarkTestCase(TestCase):
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_every_route_has_a_scenario(self):
+        self.assertIn('approve_enrollment', benchmarks.route_names())
+        self.assertEqual(benchmarks.missing_routes(), [])
+
+    def test_run_covers_all_scenarios_without_errors(self):
+        dataset = benchmarks.seed(students=10, courses=3, subjects_per_course=2)
+
+        results = benchmarks.run(dataset, requests=3, warmup=1)
+
+        self.assertEqual(set(results), {scenario.name for scenario in benchmarks.SCENARIOS})
+        for name, metrics in results.items():
+            self.assertEqual(metrics['errors'], 0, name)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertEqual(results['courses_and_subjects']['queries'], 2)
+
+    def test_regressions(self):
+        baseline = {'login': {'p95_ms': 100, 'rps': 50, 'queries': 2}}
+        thresholds = {'p95_ms': 0.25, 'rps': 0.2, 'queries': 0}
+
+        self.assertEqual(benchmarks.regressions({'login': {'p95_ms': 120, 'rps': 45, 'queries': 2}}, baseline, thresholds), [])
+        self.assertEqual(
+            benchmarks.regressions({'login': {'p95_ms': 130, 'rps': 30, 'queries': 3}}, baseline, thresholds),
+            [
+                'login: p95_ms 100 -> 130 (allowed +25%)',
+                'login: rps 50 -> 30 (allowed -20%)',
+                'login: queries 2 -> 3 (allowed +0%)',
+            ],
+        )
+        # Scenarios missing from the baseline are not compared
+        self.assertEqual(benchmarks.regressions({'new': {'p95_ms': 1}}, baseline, thresholds), [])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MergeDuplicatesMigrationTestCase(TransactionTestCase):
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('app', target)])
+        return executor.loader.project_state([('app', target)]).apps
+
+    def tearDown(self):
+        # Back to the latest migration
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('app')[0][1])
+
+    def test_duplicates_are_merged_before_the_constraints(self):
+        apps = self.migrate('0002_seat_shards_and_queues')
+        HistoricalCourseType, HistoricalCourse = apps.get_model('app', 'CourseType'), apps.get_model('app', 'Course')
+        HistoricalSubject, HistoricalEnrollment = apps.get_model('app', 'Subject'), apps.get_model('app', 'Enrollment')
+        types = [HistoricalCourseType.objects.create(name='Informaticki') for _ in range(2)]
+        courses = [HistoricalCourse.objects.create(name='Course1', course_type=t, max_capacity=10) for t in types]
+        for course in courses:
+            HistoricalSubject.objects.create(description='Subject', course=course, ects_points=5)
+        user = apps.get_model('app', 'UserProfile').objects.create(email='student@example.com', is_student=True)
+        student = apps.get_model('app', 'Student').objects.create(user=user, course=courses[1])
+        HistoricalEnrollment.objects.create(student=student, course=courses[0], status='pending')
+        approved = HistoricalEnrollment.objects.create(student=student, course=courses[1], status='approved')
+
+        self.migrate('0004_unique_catalog_and_enrollments')
+
+        course = Course.objects.get()
+        self.assertEqual((course.pk, course.course_type_id), (courses[0].pk, types[0].pk))
+        self.assertEqual(Subject.objects.get().course_id, course.pk)
+        self.assertEqual(Student.objects.get().course_id, course.pk)
+        self.assertEqual(list(Enrollment.objects.values_list('pk', 'course_id')), [(approved.pk, course.pk)])
+        self.assertEqual(course.current_capacity, 1)
+
+
+class DatasetGeneratorTestCase(TestCase):
+
+    def tearDown(self):
+        cache.clear()
+
+    def generate(self, **kwargs):
+        sizes = dict(random_seed=7, course_types=3, courses=12, subjects_per_course=2, students=300, professors=20)
+        sizes.update(kwargs)
+        return datasets.generate(**sizes)
+
+    def snapshot(self):
+        return list(Enrollment.objects.order_by('student__user__email', 'course__name').values_list(
+            'student__user__email', 'course__name', 'status',
+        ))
+
+    def test_loads_consistent_data(self):
+        counts = self.generate()
+
+        self.assertEqual(counts, {
+            'CourseType': 3, 'Course': 12, 'Subject': 24, 'UserProfile': 320,
+            'Student': 300, 'Professor': 20, 'Enrollment': 1500,
+        })
+        for course in Course.objects.all():
+            approved = course.enrollment_set.filter(status=Enrollment.APPROVED).count()
+            self.assertEqual(course.current_capacity, approved)
+            self.assertLessEqual(approved, course.max_capacity)
+        # Popularity is skewed: the most requested course gets over twice its fair share
+        requests = Enrollment.objects.values('course').annotate(n=Count('id')).order_by('-n')
+        self.assertGreater(requests[0]['n'], 2 * 1500 / 12)
+        self.assertTrue(Professor.objects.filter(is_admin=True, user__is_staff=True).exists())
+        self.assertTrue(check_password(datasets.PASSWORD, UserProfile.objects.first().password))
+
+        # New rows get IDs after the generated ones
+        self.assertGreater(Enrollment.objects.create(student=Student.objects.first(), course=Course.objects.create(
+            name='After', course_type=CourseType.objects.first())).pk, Enrollment.objects.order_by('-pk')[1].pk)
+
+    @override_settings(SEAT_COUNTER_SHARDS=4)
+    def test_sharded_seats_match_approved_requests(self):
+        counts = self.generate()
+
+        self.assertEqual(counts['CourseSeatShard'], 48)
+        for course in Course.objects.all():
+            approved = course.enrollment_set.filter(status=Enrollment.APPROVED).count()
+            self.assertEqual(seats.seat_count(course), approved)
+            self.assertEqual(course.seat_shards.aggregate(total=Sum('capacity'))['total'], course.max_capacity)
+
+    def test_same_seed_same_data(self):
+        snapshots = []
+        for _ in range(2):
+            with transaction.atomic():
+                self.generate()
+                snapshots.append(self.snapshot())
+                transaction.set_rollback(True)
+
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertEqual(len(snapshots[0]), 1500)
+
+    def test_seed_loads_once(self):
+        self.generate(students=5)
+
+        with self.assertRaisesMessage(ValueError, 'seed 7 is already loaded'):
+            self.generate(students=5)
+
+
+class ReadSerializerTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        Subject.objects.bulk_create([
+            Subject(description=f'Subject {i} \u017e\u2028', course=self.course, ects_points=i + 1) for i in range(3)
+        ])
+        self.students = create_students(5, course=self.course)
+        Student.objects.filter(pk=self.students[0].pk).update(
+            course=None, place_of_birth=None, school='Gimnazija "A"\u2029', average_score=Decimal('4.5'),
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_same_bytes_as_the_serializers(self):
+        cases = [
+            (Student.objects.order_by('pk'), StudentSerializer, student_rows),
+            (Subject.objects.order_by('pk'), SubjectSerializer, subject_rows),
+        ]
+        for queryset, serializer_class, read_serializer in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+                rows = read_serializer.to_rows(read_serializer.values(queryset))
+                self.assertEqual(FastJSONRenderer().render(rows), expected)
+
+        body = FastJSONRenderer().render(student_rows.to_rows(student_rows.values(Student.objects.filter(pk=self.students[0].pk))))
+        self.assertIn(b'"course":null', body)
+        self.assertIn(b'"average_score":"4.50"', body)
+        self.assertIn(b'\\u2029', body)
+
+    def test_student_list_pages(self):
+        client = APIClient()
+        client.force_authenticate(self.students[1].user)
+        url, results = '/students/?page_size=2', []
+        while url:
+            body = client.get(url).json()
+            results.extend(body['results'])
+            url = body['next']
+        self.assertEqual(results, json.loads(JSONRenderer().render(
+            StudentSerializer(Student.objects.order_by('pk'), many=True).data)))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'when': timezone.now(), 'day': timezone.now().date(), 'score': Decimal('1.10'), 1: [None, True],
+            'big': 2 ** 70, 'text': 'line\u2028separator',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        # Indented output is left to JSONRenderer
+        indented = FastJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(indented, JSONRenderer().render({'a': 1}, 'application/json; indent=4'))
+        self.assertIn(b'\n    ', indented)
+
+    def test_unsupported_fields(self):
+        class NestedSerializer(StudentSerializer):
+            course = CourseSerializer()
+
+        with self.assertRaises(ImproperlyConfigured):
+            ReadSerializer(NestedSerializer).names
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=1, LOGIN_HASH_QUEUE_TIMEOUT=0.05,
+)
+class LoginHashingExecutorTestCase(TestCase):
+
+    def setUp(self):
+        # The executor keeps the LOGIN_HASH_* settings it was built with; build it from this class's
+        hashing.reset_executor()
+        self.user = UserProfile.objects.create_user(email='login@example.com', password='secret123')
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def tearDown(self):
+        hashing.reset_executor()
+
+    def occupy_worker(self):
+        # Keep the executor's only thread busy until self.release is set
+        executor = hashing.get_executor()
+        threading.Thread(target=executor.call, args=(self.release.wait,), daemon=True).start()
+        for _ in range(100):
+            if executor.stats()['running']:
+                return executor
+            time.sleep(0.01)
+        self.fail('The blocking check never started')
+
+    def login(self, password='secret123'):
+        return APIClient().post('/login/', {'email': 'login@example.com', 'password': password}, format='json')
+
+    def test_login_checks_passwords_on_the_executor(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login('wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        stats = hashing.get_executor().stats()
+        self.assertEqual((stats['workers'], stats['submitted'], stats['completed']), (1, 2, 2))
+        self.assertEqual((stats['queued'], stats['running']), (0, 0))
+
+    def test_queue_timeout(self):
+        executor = self.occupy_worker()
+
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['detail'], hashing.HashingBusy.default_detail)
+        stats = executor.stats()
+        self.assertEqual((stats['timeouts'], stats['queued'], stats['rejected']), (1, 0, 0))
+
+        # The dropped check gave its queue slot back
+        self.release.set()
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_HASH_QUEUE=0)
+    def test_full_queue_rejects_at_once(self):
+        executor = self.occupy_worker()
+
+        self.assertEqual(self.login().status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual((executor.stats()['rejected'], executor.stats()['timeouts']), (1, 0))
+
+    def test_running_check_is_not_dropped(self):
+        executor = hashing.HashingExecutor(1, 0, timeout=0.01)
+        self.addCleanup(executor.shutdown)
+
+        self.assertEqual(executor.call(lambda: time.sleep(0.05) or 'done'), 'done')
+        self.assertEqual((executor.stats()['timeouts'], executor.stats()['completed']), (0, 1))
+
+    async def test_async_login(self):
+        factory = AsyncRequestFactory()
+
+        def request(password):
+            return factory.post(
+                '/login/', {'email': 'login@example.com', 'password': password}, content_type='application/json',
+            )
+
+        response = await async_views.login(request('secret123'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = json.loads(response.content)
+        self.assertEqual(body['user_id'], self.user.pk)
+        self.assertEqual(AccessToken(body['access'])['user_id'], self.user.pk)
+
+        response = await async_views.login(request('wrong'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        await sync_to_async(self.occupy_worker)()
+        response = await async_views.login(request('secret123'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_metrics(self):
+        self.login()
+        admin = UserProfile.objects.create_user(email='admin@example.com', password='secret123', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        self.assertEqual(client.get('/metrics/login/').json(), hashing.get_executor().stats())
+        text = client.get('/metrics/login/?output=prometheus').content.decode()
+        self.assertIn('password_hashing_completed{executor="login"} 1\n', text)
+        self.assertIn('password_hashing_queued{executor="login"} 0\n', text)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenRevocationTestCase(TestCase):
+
+    def setUp(self):
+        self.student = create_students(1)[0]
+        self.student.user.set_password('secret123')
+        self.student.user.save()
+        self.client = APIClient()
+        revocation.reset()
+
+    def tearDown(self):
+        cache.clear()
+        revocation.reset()
+
+    def login(self):
+        response = self.client.post('/login/', {'email': 'student0@example.com', 'password': 'secret123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def profile_status(self, access):
+        return self.client.get(f'/student/{self.student.pk}/profile/', HTTP_AUTHORIZATION=f'Bearer {access}').status_code
+
+    def refresh_status(self, refresh):
+        return self.client.post('/refresh/', {'refresh': refresh}, format='json').status_code
+
+    def test_logout_revokes_refresh_and_its_access_tokens(self):
+        tokens, other = self.login(), self.login()
+        refreshed = self.client.post('/refresh/', {'refresh': tokens['refresh']}, format='json').data['access']
+
+        response = self.client.post('/logout/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.refresh_status(tokens['refresh']), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.profile_status(tokens['access']), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.profile_status(refreshed), status.HTTP_401_UNAUTHORIZED)
+        # The user's other sessions are untouched
+        self.assertEqual(self.refresh_status(other['refresh']), status.HTTP_200_OK)
+        self.assertEqual(self.profile_status(other['access']), status.HTTP_200_OK)
+
+        self.assertEqual(self.client.post('/logout/', {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post('/logout/', {'refresh': 'garbage'}, format='json').status_code, status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_revoked_access_token(self):
+        tokens = self.login()
+
+        revoke_token(AccessToken(tokens['access']))
+
+        self.assertEqual(self.profile_status(tokens['access']), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh_status(tokens['refresh']), status.HTTP_200_OK)
+
+    async def test_async_authentication(self):
+        tokens = await sync_to_async(self.login)()
+        request = AsyncRequestFactory().get('/students/', headers={'Authorization': f"Bearer {tokens['access']}"})
+        self.assertEqual((await async_views.student_list(request)).status_code, status.HTTP_200_OK)
+
+        await sync_to_async(revoke_token)(RefreshToken(tokens['refresh']))
+
+        self.assertEqual((await async_views.student_list(request)).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_entries_expire_with_the_token(self):
+        access, refresh = AccessToken.for_user(self.student.user), RefreshToken.for_user(self.student.user)
+        for token in (access, refresh):
+            token.set_exp(lifetime=timedelta(seconds=1))
+            revoke_token(token)
+
+        time.sleep(1.1)
+        self.assertIsNone(cache.get(f"jwt:revoked:jti:{access['jti']}"))
+        # Access tokens made from the refresh token may still be valid
+        self.assertTrue(cache.get(f"jwt:revoked:jti:{refresh['jti']}"))
+
+    def test_unrevoked_tokens_skip_the_cache(self):
+        revocation.lookup(['jti:first'])
+
+        # Written behind the filter's back: the filter has never seen it, so the cache is not read
+        cache.set('jwt:revoked:jti:unseen', True)
+        self.assertEqual(revocation.lookup(['jti:unseen']), {})
+
+        revocation.revoke('jti:seen', True, 60)
+        self.assertEqual(revocation.lookup(['jti:seen', 'jti:unseen']), {'jti:seen': True})
+
+    def test_other_processes_pick_up_revocations(self):
+        revocation.revoke('user:1', 123, 60)
+        # A fresh filter, as in a process that did not make the revocation, loads it from the log
+        revocation.reset()
+        self.assertEqual(revocation.lookup(['user:1']), {'user:1': 123})
+
+        # A log number taken but not yet written is retried on later syncs
+        cache.incr(revocation.SEQUENCE_KEY)
+        revocation._filter.sync()
+        cache.set('jwt:revocations:2', 'jti:late', 60)
+        cache.set('jwt:revoked:jti:late', True, 60)
+        revocation._filter.sync_at = 0
+        self.assertEqual(revocation.lookup(['jti:late']), {'jti:late': True})
+
+        # A flushed cache takes the revocations with it and starts a new log
+        cache.clear()
+        revocation._filter.sync_at = 0
+        self.assertEqual(revocation.lookup(['user:1']), {})
+        self.assertNotIn('user:1', revocation._filter)
+
+    def test_bloom_filter(self):
+        bloom = revocation.BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'jti:{i}')
+
+        self.assertTrue(all(f'jti:{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other:{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StudentRegistrationTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        self.client = APIClient()
+
+    def tearDown(self):
+        cache.clear()
+
+    def register(self, email, **extra):
+        data = {'name': 'Ana', 'surname': 'Anic', 'email': email, 'password': 'secret123', **extra}
+        return self.client.post('/student/register/', data, format='json')
+
+    def test_registers_with_a_fixed_number_of_queries(self):
+        # Course lookup, then a savepoint around one insert each for the user and the student
+        with self.assertNumQueries(5):
+            response = self.register('ana@EXAMPLE.com', course=self.course.pk)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        student = Student.objects.select_related('user').get(pk=response.data['user_id'])
+        self.assertEqual((student.course, student.user.email, student.user.first_name), (self.course, 'ana@example.com', 'Ana'))
+        self.assertTrue(student.user.is_student)
+        self.assertTrue(student.user.check_password('secret123'))
+
+        with self.assertNumQueries(4):
+            self.assertEqual(self.register('ivo@example.com').status_code, status.HTTP_201_CREATED)
+
+    def test_taken_email_is_a_bad_request(self):
+        self.register('ana@example.com')
+
+        # No lookup before the insert; the unique violation is rolled back to the savepoint, which is released
+        with self.assertNumQueries(4):
+            response = self.register('ana@example.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'email': [registration.DUPLICATE_EMAIL]})
+        self.assertEqual(UserProfile.objects.count(), 1)
+
+    def test_invalid_input(self):
+        response = self.register('not-an-email', course=999)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {'email', 'course'})
+        self.assertEqual(self.register('a@example.com', name='x' * 151).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UserProfile.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StudentRegistrationTransactionTestCase(TransactionTestCase):
+
+    def test_deleted_course_leaves_no_user_behind(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        data = {'name': 'Ana', 'surname': 'Anic', 'email': 'ana@example.com', 'password': 'secret123', 'course': course}
+        # Deleted between validation and the insert: the foreign key check fails at commit
+        Course.objects.filter(pk=course.pk).delete()
+
+        with self.assertRaises(ValidationError) as raised:
+            registration.register_student(data)
+
+        self.assertIn('course', raised.exception.detail)
+        self.assertFalse(UserProfile.objects.exists())
+        cache.clear()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkStudentRegistrationTransactionTestCase(TransactionTestCase):
+
+    def test_course_deleted_during_import_is_reported(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course', course_type=course_type, max_capacity=10)
+        rows = [
+            {'name': 'Ana', 'surname': 'Anic', 'email': 'ana@example.com', 'password': 'secret123', 'course': course.pk},
+            {'name': 'Ivo', 'surname': 'Ivic', 'email': 'ivo@example.com', 'password': 'secret123'},
+        ]
+
+        def hash_and_delete(passwords, workers=1):
+            # The foreign key check of the first insert fails at commit
+            Course.objects.filter(pk=course.pk).delete()
+            return [make_password(password) for password in passwords]
+
+        with mock.patch.object(registration, 'hash_passwords', hash_and_delete):
+            report = registration.bulk_register_students(rows)
+
+        self.assertIn('course', report[0]['errors'])
+        self.assertIn('user_id', report[1])
+        self.assertEqual(list(UserProfile.objects.values_list('email', flat=True)), ['ivo@example.com'])
+        cache.clear()
+
+
+class SharedCacheCheckTestCase(SimpleTestCase):
+
+    def test_process_local_cache_fails_outside_debug(self):
+        with override_settings(CACHES=LOCAL_CACHES, DEBUG=False):
+            self.assertEqual([error.id for error in checks.shared_cache_check(None)], ['app.E001'])
+        with override_settings(CACHES=LOCAL_CACHES, DEBUG=True):
+            self.assertEqual([error.id for error in checks.shared_cache_check(None)], ['app.W001'])
+
+    def test_shared_cache_passes(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(checks.shared_cache_check(None), [])
+
+
+class CatalogSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        course_type = CourseType.objects.create(name='Tehnicki')
+        self.math = Course.objects.create(name='Matematika', course_type=course_type, max_capacity=10)
+        self.physics = Course.objects.create(name='Primijenjena fizika', course_type=course_type, max_capacity=10)
+        self.analysis = Subject.objects.create(description='Matematicka analiza', course=self.physics, ects_points=6)
+        self.mechanics = Subject.objects.create(description='Mehanika', course=self.physics, ects_points=5)
+
+    def test_terms(self):
+        self.assertEqual(search.terms('  Matematika, FIZIKA!  '), ['matematika', 'fizika'])
+        self.assertEqual(search.terms('?!'), [])
+        self.assertEqual(len(search.terms(' '.join(['word'] * 20))), search.MAX_TERMS)
+
+    def test_query_is_required(self):
+        for query in ('', '?q=', '?q=%20!', f'?q={"a" * 201}'):
+            response = self.client.get(f'/search/{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_page(self):
+        for params in ('page=x', 'page=0', 'page_size=0'):
+            response = self.client.get(f'/search/?q=mat&{params}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @unittest.skipIf(connection.vendor == 'postgresql', "Degraded mode of databases without full-text search")
+    def test_basic_mode(self):
+        response = self.client.get('/search/?q=Matemat')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mode'], search.BASIC)
+        self.assertEqual([(row['type'], row['id']) for row in response.data['results']], [
+            ('course', self.math.pk), ('subject', self.analysis.pk),
+        ])
+        self.assertEqual(response.data['results'][1], {
+            'type': 'subject', 'id': self.analysis.pk, 'text': 'Matematicka analiza', 'course': self.physics.pk,
+            'rank': 1.0,
+        })
+
+    @unittest.skipIf(connection.vendor == 'postgresql', "Degraded mode of databases without full-text search")
+    def test_basic_mode_ranks_prefix_matches_first(self):
+        response = self.client.get('/search/?q=fizika')
+
+        self.assertEqual([(row['id'], row['rank']) for row in response.data['results']], [(self.physics.pk, 0.5)])
+        response = self.client.get('/search/?q=analiza matematicka')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.analysis.pk])
+
+    def test_pagination(self):
+        course_type = CourseType.objects.get()
+        Course.objects.bulk_create([
+            Course(name=f'Statistika {i}', course_type=course_type, max_capacity=10) for i in range(5)
+        ])
+
+        # One ranked query on PostgreSQL, one per table in the degraded mode
+        with self.assertNumQueries(1 if connection.vendor == 'postgresql' else 2):
+            first = self.client.get('/search/?q=statistika&page_size=2').data
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+
+        pages = [first['results'], second['results'], third['results']]
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(len({row['id'] for page in pages for row in page}), 5)
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(third['next'])
+        self.assertEqual(self.client.get(third['previous']).data['results'], second['results'])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/search/?q=mat&page_size=100000')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_sees_new_rows(self):
+        self.assertEqual(self.client.get('/search/?q=kemija').data['results'], [])
+
+        subject = Subject.objects.create(description='Organska kemija', course=self.math, ects_points=4)
+
+        self.assertEqual([row['id'] for row in self.client.get('/search/?q=kemija').data['results']], [subject.pk])
+        subject.description = 'Anorganska kemija'
+        subject.save()
+        self.assertEqual(self.client.get('/search/?q=kemija').data['results'][0]['text'], 'Anorganska kemija')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Full-text search columns exist on PostgreSQL only")
+class PostgreSQLCatalogSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        course_type = CourseType.objects.create(name='Tehnicki')
+        self.math = Course.objects.create(name='Matematika', course_type=course_type, max_capacity=10)
+        self.physics = Course.objects.create(name='Primijenjena fizika', course_type=course_type, max_capacity=10)
+        self.analysis = Subject.objects.create(description='Matematicka analiza', course=self.physics, ects_points=6)
+        self.algebra = Subject.objects.create(description='Linearna algebra i matematicka logika', course=self.math, ects_points=6)
+
+    def test_ranked_fulltext(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/search/?q=matematicka analiza')
+
+        self.assertEqual(response.data['mode'], search.FULLTEXT)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.analysis.pk])
+        results = self.client.get('/search/?q=matemat').data['results']
+        self.assertEqual({(row['type'], row['id']) for row in results}, {
+            ('course', self.math.pk), ('subject', self.analysis.pk), ('subject', self.algebra.pk),
+        })
+        self.assertEqual([row['rank'] for row in results], sorted((row['rank'] for row in results), reverse=True))
+
+    def test_trigram_fallback_for_typos(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/search/?q=matematcka')
+
+        self.assertEqual(response.data['mode'], search.TRIGRAM)
+        self.assertIn(self.analysis.pk, [row['id'] for row in response.data['results'] if row['type'] == 'subject'])
+
+    def test_generated_column_follows_bulk_writes(self):
+        Subject.objects.filter(pk=self.analysis.pk).update(description='Teorijska mehanika')
+
+        self.assertEqual([row['id'] for row in self.client.get('/search/?q=mehanika').data['results']], [self.analysis.pk])
+
+    def test_search_columns_come_from_the_migration(self):
+        with connection.cursor() as cursor:
+            columns = [column.name for column in connection.introspection.get_table_description(cursor, 'app_subject')]
+        self.assertIn('search_vector', columns)
+
+    def test_fulltext_uses_the_gin_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(
+                "EXPLAIN SELECT id FROM app_subject WHERE search_vector @@ to_tsquery('simple', 'analiza:*')"
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('app_subject_search_vector', plan)
+
+
+@override_settings(SEAT_COUNTER_SHARDS=4)
+class ShardedSeatCounterTestCase(TestCase):
+
+    def setUp(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        self.course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=10)
+
+    def test_shards_are_created_on_first_reservation(self):
+        self.assertTrue(seats.reserve_seat(self.course.pk))
+
+        shards = CourseSeatShard.objects.filter(course=self.course)
+        self.assertEqual(shards.count(), 4)
+        self.assertEqual(sorted(shard.capacity for shard in shards), [2, 2, 3, 3])
+        self.assertEqual(seats.seat_count(self.course), 1)
+
+    def test_sharded_reservation_never_exceeds_max_capacity(self):
+        claimed = [seats.reserve_seat(self.course.pk) for _ in range(12)]
+
+        self.assertEqual(claimed.count(True), 10)
+        self.assertEqual(seats.seat_count(self.course), 10)
+        self.assertFalse(seats.has_free_seat(self.course))
+
+        self.assertTrue(seats.release_seat(self.course.pk))
+        self.assertTrue(seats.has_free_seat(self.course))
+
+    def test_rebalance_keeps_taken_seats_when_capacity_grows(self):
+        for _ in range(10):
+            seats.reserve_seat(self.course.pk)
+        Course.objects.filter(pk=self.course.pk).update(max_capacity=14)
+
+        claimed = [seats.reserve_seat(self.course.pk) for _ in range(5)]
+
+        self.assertEqual(claimed.count(True), 4)
+        self.assertEqual(seats.seat_count(self.course), 14)
+
+    def test_course_serializer_reports_seats_taken_on_the_shards(self):
+        for _ in range(3):
+            seats.reserve_seat(self.course.pk)
+        self.course.refresh_from_db()
+
+        self.assertEqual(self.course.current_capacity, 0)
+        self.assertEqual(CourseSerializer(self.course).data['current_capacity'], 3)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs row-level locking')
+class ConcurrentSeatReservationTestCase(TransactionTestCase):
+    """
+    Many threads approve enrollments for the same course at once.
+    The course must end up exactly full, never oversold.
+    """
+
+    capacity = 25
+    applicants = 200
+    workers = 16
+
+    def test_no_oversell_under_concurrent_approvals(self):
+        course_type = CourseType.objects.create(name='Informaticki')
+        course = Course.objects.create(name='Course1', course_type=course_type, max_capacity=self.capacity)
+        students = create_students(self.applicants)
+        enrollments = Enrollment.objects.bulk_create(
+            [Enrollment(student=s, course=course) for s in students]
+        )
+
+        queue = list(enrollments)
+        lock = threading.Lock()
+        results = []
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not queue:
+                            return
+                        enrollment = queue.pop()
+                    outcome = seats.approve(enrollment)
+                    with lock:
+                        results.append(outcome)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        course.refresh_from_db()
+        self.assertEqual(course.current_capacity, self.capacity)
+        self.assertEqual(results.count(seats.SEAT_CLAIMED), self.capacity)
+        self.assertEqual(Enrollment.objects.filter(status=Enrollment.APPROVED).count(), self.capacity)
@@ -1,16 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     
-    path('login/',  views.login, name='login'),
+    path('login/',  read_views.login, name='login'),
     path('refresh/', views.refresh_token, name='refresh_token'),
+    path('logout/', views.logout, name='logout'),
     path('student/register/',  views.student_registration, name='student_registration'),
-    path('student/<int:id>/profile/',  views.student_profile, name='student_profile'),
-    path('student/<int:id>/courses/', views.courses_and_subjects, name='courses_and_subjects'),
+    path('students/register/', views.bulk_student_registration, name='bulk_student_registration'),
+    path('student/<int:id>/profile/',  read_views.student_profile, name='student_profile'),
+    path('student/<int:id>/courses/', read_views.courses_and_subjects, name='courses_and_subjects'),
     path('student/<int:student_id>/course_enrollment/', views.course_enrollment, name='course_enrollment'),
-    path('students/', views.student_list, name='student_list'),
+    path('students/', read_views.student_list, name='student_list'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
+    path('metrics/db-pool/', views.database_pool_metrics, name='database_pool_metrics'),
+    path('metrics/login/', views.login_metrics, name='login_metrics'),
     path('professor/register/',  views.professor_registration, name='professor_registration'),
     path('professor/<int:user_id>/profile/',  views.professor_profile, name='professor_profile'),
-    path('course/<int:course_id>/subjects/',  views.subject_list, name='course_subjects'),
+    path('courses/', views.course_list, name='course_list'),
+    path('search/', views.catalog_search, name='catalog_search'),
+    path('course/<int:course_id>/subjects/',  read_views.subject_list, name='course_subjects'),
+    path('course/<int:course_id>/enrollments/pending/', views.pending_enrollments, name='pending_enrollments'),
+    path('course/<int:course_id>/enrollments/claim/', views.claim_pending_enrollments, name='claim_pending_enrollments'),
 ]
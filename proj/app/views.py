@@ -1,30 +1,68 @@
 # myapp/views.py
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import AllowAny
 
 from .permissions import IsProfessorOrAdmin
+from .roles import get_roles
+from .renderers import FastJSONRenderer
+from . import catalog, exports, hashing, metrics, registration, review_queue, search, seats, waitlist
+from .pagination import PendingEnrollmentCursorPagination, StudentCursorPagination
 
 from .models import Course, Enrollment, Subject, Student, Professor
-from .serializers import CourseEnrollmentSerializer, UserProfile, CourseSerializer, SubjectSerializer, StudentSerializer, ProfessorSerializer, StudentRegistrationSerializer
+from .serializers import CatalogCourseSerializer, ClaimBatchSerializer, CourseEnrollmentSerializer, PendingEnrollmentSerializer, UserProfile, CourseSerializer, SubjectSerializer, StudentSerializer, StudentCourseSerializer, ProfessorSerializer, StudentRegistrationSerializer, student_rows, subject_rows
 from django.contrib.auth import authenticate
 from django.contrib.auth.decorators import permission_required
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import F
+from .backend.authentication import access_token_for, is_revoked, refresh_token_for, revoke_token, stateless_token_for
+from .backend.postgresql_pool.base import pool_stats
+from .instrumentation import query_budget
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
 
 
 
+def login_tokens(user, stateless=False):
+    """
+    Token pair returned by a successful login.
+
+    Parameters:
+    - user: the authenticated user
+    - stateless: the request's `stateless` flag; true values issue tokens carrying the user's roles
+
+    Returns:
+    - dict: refresh, access and user_id
+    """
+
+    if stateless in (True, 'true', '1'):
+        refresh = stateless_token_for(user)
+    else:
+        refresh = refresh_token_for(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(access_token_for(refresh)),
+        'user_id': user.id
+    }
+
 @api_view(['POST'])
 def login(request):
     """
     A view for user login using email and password. 
     Accepts a POST request with email and password in the request data. 
     Returns tokens for authentication if the user is valid, else returns an error message.
+    With `stateless: true` the tokens carry the user's roles as claims, so later
+    requests are authenticated without loading the user from the database.
+    The password is checked on the bounded hashing executor; when it is saturated
+    the response is 503 (see app.hashing).
     """
 
     email = request.data.get('email')
@@ -35,12 +73,7 @@ def login(request):
 
     if user is not None:
         # User is authenticated, generate tokens
-        refresh = RefreshToken.for_user(user)
-        return Response({
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-            'user_id': user.id
-        }, status=status.HTTP_200_OK)
+        return Response(login_tokens(user, request.data.get('stateless')), status=status.HTTP_200_OK)
     else:
         # Authentication failed
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -54,18 +87,50 @@ def refresh_token(request):
 
     try:
         token = RefreshToken(refresh_token)
-        access_token = token.access_token
+        access_token = access_token_for(token)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
+    if is_revoked(token):
+        return Response({'error': 'Token has been revoked'}, status=status.HTTP_401_UNAUTHORIZED)
+
     return Response({'access': str(access_token)})
 
+@api_view(['POST'])
+def logout(request):
+    """
+    Revoke a refresh token and the access tokens issued from it.
+    Holding the refresh token is enough; no other authentication is needed.
+
+    Parameters:
+    - request: the HTTP request object with `refresh` in its data
+
+    Returns:
+    - Response: 200 once the token is revoked, 400 without a token, 401 for an invalid one
+    """
+
+    refresh_token = request.data.get('refresh')
+
+    if refresh_token is None:
+        return Response({'error': 'Refresh token is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        token = RefreshToken(refresh_token)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    revoke_token(token)
+    return Response({'message': 'Token revoked'}, status=status.HTTP_200_OK)
+
 #################################STUDENTS####################################################
+# The course lookup and the two inserts; inside an outer transaction (tests) the savepoint and its release count too
+@query_budget(5)
 @api_view(['POST'])
 def student_registration(request):
     """
     A view for registering a student, which accepts a POST request. 
     It saves the student data, including the course field, and returns the user ID if the data is valid. Otherwise, it returns the serializer errors with a 400 status code.
+    The user and student are created in one transaction, see registration.register_student().
     """
     
     if request.method == 'POST':
@@ -78,11 +143,60 @@ def student_registration(request):
 
         student_serializer = StudentRegistrationSerializer(data=data)
         if student_serializer.is_valid():
-            user = student_serializer.save()
+            user = registration.register_student(student_serializer.validated_data)
             return Response({'user_id': user.id}, status=status.HTTP_201_CREATED)
         else:
             return Response(student_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_student_registration(request):
+    """
+    Register a batch of students in one request.
+
+    Accepts a JSON list of students, a text/csv body or a multipart upload in the `file` field.
+    Each row has the fields of student registration (name, surname, email, password, course).
+
+    Returns:
+    - Response: a per-row report with the new user ID or the row's errors;
+      201 if at least one student was created, 400 otherwise, 413 for more than MAX_BULK_ROWS rows
+    """
+
+    too_large = Response({'error': (
+        f"At most {settings.MAX_BULK_ROWS} students per request. "
+        "Load larger intakes with `manage.py bulk_register_students`."
+    )}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    try:
+        if request.content_type.startswith('text/csv'):
+            rows = registration.read_rows(request.body.decode('utf-8-sig'), 'csv')
+        elif 'file' in request.FILES:
+            upload = request.FILES['file']
+            # Uploads are not bounded by DATA_UPLOAD_MAX_MEMORY_SIZE like request bodies are
+            max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+            if max_size is not None and upload.size > max_size:
+                return too_large
+            content_type = 'csv' if upload.name.endswith('.csv') else 'json'
+            rows = registration.read_rows(upload.read().decode('utf-8-sig'), content_type)
+        else:
+            rows = request.data
+            if not isinstance(rows, list):
+                raise ValueError("Expected a JSON list of students.")
+    except (ValueError, UnicodeDecodeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > settings.MAX_BULK_ROWS:
+        return too_large
+
+    # Hashed in this worker: forking a process pool per request would cost more than it
+    # saves and leave children behind; the bulk_register_students command uses the pool
+    report = registration.bulk_register_students(rows)
+    created = sum(1 for entry in report if 'user_id' in entry)
+
+    return Response(
+        {'created': created, 'failed': len(report) - created, 'rows': report},
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+    )
+
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
 def student_profile(request, id):
@@ -91,16 +205,17 @@ def student_profile(request, id):
     It checks if the authenticated user is the owner of the profile being accessed, 
     and returns the student profile information or allows updating it based on the request method.
     """
-        
+
+    # Check if the authenticated user is the owner of the profile being accessed.
+    # A student's primary key is its user's ID, so this needs no query.
+    if request.user.id != id:
+        return Response({'error': 'You are not authorized to access this profile'}, status=status.HTTP_403_FORBIDDEN)
+
     try:
         student = Student.objects.get(pk=id)
     except Student.DoesNotExist:
         return Response({'error': 'Student profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Check if the authenticated user is the owner of the profile being accessed
-    if request.user.id != student.user.id:
-        return Response({'error': 'You are not authorized to access this profile'}, status=status.HTTP_403_FORBIDDEN)
-
     if request.method == 'GET':
         serializer = StudentSerializer(student)
         return Response(serializer.data)
@@ -112,10 +227,29 @@ def student_profile(request, id):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def student_courses(student_id):
+    """
+    A student's courses (their profile course and courses with an approved enrollment)
+    with `total_ects` annotated and subjects prefetched: two queries in total.
+    """
+
+    return (
+        Course.objects.filter(
+            Q(pk__in=Student.objects.filter(pk=student_id).values('course'))
+            | Q(pk__in=Enrollment.objects.filter(student_id=student_id, status=Enrollment.APPROVED).values('course'))
+        )
+        .annotate(total_ects=Coalesce(Sum('subject__ects_points'), 0))
+        .prefetch_related(Prefetch('subject_set', queryset=Subject.objects.order_by('pk')))
+        .order_by('pk')
+    )
+
+@query_budget(3)
 @api_view(['GET'])
 def courses_and_subjects(request, id):
     """
     Retrieves courses and subjects for a student and returns the data as a response.
+    A student's courses are the course on their profile and any course with an approved enrollment.
+    Runs two queries however many courses and subjects there are.
     
     Parameters:
     - request: the request object
@@ -125,22 +259,13 @@ def courses_and_subjects(request, id):
     - Response: the response object with course data or error message
     """
     
-    try:
-        student = Student.objects.get(pk=id)
-        if student.course:
-            courses = student.course.all()
-            course_data = []
-            for course in courses:
-                course_info = {
-                    'id': course.id,
-                    'name': course.name,
-                    'subjects': [subject.name for subject in course.subject_set.all()]
-                }
-                course_data.append(course_info)
-            return Response(course_data, status=status.HTTP_200_OK)
-        else:
-            return Response({'message': 'No courses found for this student'}, status=status.HTTP_200_OK)
-    except Student.DoesNotExist:
+    courses = list(student_courses(id))
+
+    if courses:
+        return Response(StudentCourseSerializer(courses, many=True).data, status=status.HTTP_200_OK)
+    elif Student.objects.filter(pk=id).exists():
+        return Response({'message': 'No courses found for this student'}, status=status.HTTP_200_OK)
+    else:
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
@@ -164,19 +289,34 @@ def course_enrollment(request, student_id):
             course_id = serializer.validated_data.get('course_id')
             course = Course.objects.get(pk=course_id)
             
-            # Check if there is a free place available in the course
-            if course.current_capacity < course.max_capacity:
-                # Create a pending enrollment request
-                enrollment = Enrollment.objects.create(student=student, course=course, status='pending')
-                
-                # Update the course field of the student
-                student.course = course
-                student.save()
+            # Reject early if the course is already full, and queue behind students who are
+            # already waiting for a seat. Seats are claimed atomically on approval
+            # (see seats.reserve_seat), so these reads are only advisory.
+            if seats.has_free_seat(course) and not waitlist.queue(course.pk).exists():
+                try:
+                    with transaction.atomic():
+                        # Create a pending enrollment request
+                        Enrollment.objects.create(student=student, course=course, status=Enrollment.PENDING)
+                        
+                        # Update the course field of the student
+                        student.course = course
+                        student.save(update_fields=['course'])
+                except IntegrityError:
+                    # The unique (student, course) constraint caught a repeated request
+                    return Response({'error': 'Enrollment request for this course already exists.'}, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Provide feedback to the student about the enrollment request
                 return Response({'message': 'Enrollment request created. Waiting for admin approval.'}, status=status.HTTP_201_CREATED)
             else:
-                return Response({'error': 'Course is full. Enrollment request not created.'}, status=status.HTTP_400_BAD_REQUEST)
+                # Queue the student; the request becomes pending as soon as a seat frees up
+                try:
+                    enrollment = waitlist.join(student, course)
+                except IntegrityError:
+                    return Response({'error': 'Enrollment request for this course already exists.'}, status=status.HTTP_400_BAD_REQUEST)
+                return Response({
+                    'message': 'Course is full. You have been put on the waitlist.',
+                    'position': waitlist.position(enrollment),
+                }, status=status.HTTP_202_ACCEPTED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except (Student.DoesNotExist, Course.DoesNotExist):
@@ -184,40 +324,37 @@ def course_enrollment(request, student_id):
 
 @api_view(['POST'])
 #@permission_classes([IsAdminUser])
-def approve_enrollment(request, enrollment):
+def approve_enrollment(request, enrollment_id):
     """
     A view to approve an enrollment.
 
     Parameters:
     - request: the HTTP request object
-    - enrollment: the Enrollment object to be approved
+    - enrollment_id: the ID of the enrollment to be approved
 
     Returns:
     - HttpResponse: a response indicating the result of the approval process
     """
     try:
-        # Ensure that the user is authenticated and is a UserProfile instance
-        if request.user.is_authenticated and isinstance(request.user, UserProfile):
-            course = enrollment.course
+        # Staff or admin professors; stateless tokens answer both from their claims
+        user = request.user
+        if user.is_authenticated and (user.is_staff or get_roles(user).is_admin):
+            enrollment = Enrollment.objects.get(pk=enrollment_id)
 
-            # Increment current_capacity if it doesn't exceed max_capacity
-            if course.current_capacity < course.max_capacity:
-                # Increment current_capacity using F() expression to avoid race conditions
-                Course.objects.filter(pk=course.pk).update(current_capacity=F('current_capacity') + 1)
-
-                # Update enrollment status and admin
-                enrollment.status = Enrollment.APPROVED
-                # Set the admin field to the currently logged-in admin user
-                enrollment.admin = request.user  
-                enrollment.save()
+            # Claim the seat and approve in one transaction; the capacity check
+            # and the increment are a single conditional UPDATE, so seats are never oversold
+            result = seats.approve(enrollment, admin=request.user)
 
+            if result == seats.SEAT_CLAIMED:
                 return HttpResponse("Enrollment approved successfully")
+            elif result == seats.ALREADY_APPROVED:
+                return HttpResponse("Enrollment is already approved")
             else:
-                return HttpResponse("Course is already full")
+                return HttpResponse("Course is already full", status=status.HTTP_409_CONFLICT)
         else:
-            return HttpResponse("User is not authenticated or is not a UserProfile instance")
+            return HttpResponse("Only admins can approve enrollments", status=status.HTTP_403_FORBIDDEN)
     except Enrollment.DoesNotExist:
-        return HttpResponse("Enrollment request not found")
+        return HttpResponse("Enrollment request not found", status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(['POST'])
@@ -236,23 +373,141 @@ def reject_enrollment(request, enrollment_id):
     """
 
     try:
-        enrollment = Enrollment.objects.get(pk=enrollment_id)
-        enrollment.status = Enrollment.REJECTED
-        enrollment.admin = request.user
-        enrollment.save()
+        with transaction.atomic():
+            enrollment = Enrollment.objects.select_for_update().get(pk=enrollment_id)
+            was_approved = enrollment.status == Enrollment.APPROVED
+            enrollment.status = Enrollment.REJECTED
+            enrollment.admin_id = request.user.id
+            enrollment.save(update_fields=['status', 'admin'])
+
+            # Rejecting an approved enrollment frees its seat for the head of the waitlist
+            if was_approved:
+                waitlist.free_seat(enrollment.course_id)
         return Response({'message': 'Enrollment request rejected'}, status=status.HTTP_200_OK)
     except Enrollment.DoesNotExist:
         return Response({'error': 'Enrollment request not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def pending_enrollments(request, course_id):
+    """
+    Get a page of a course's pending enrollment requests in arrival order.
+
+    Pages are keyset-paginated on the enrollment ID; follow the opaque `next`/`previous` links.
+
+    Parameters:
+    - request: the HTTP request object
+    - course_id: the ID of the course
+    """
+
+    paginator = PendingEnrollmentCursorPagination()
+    page = paginator.paginate_queryset(review_queue.pending(course_id), request)
+    serializer = PendingEnrollmentSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def claim_pending_enrollments(request, course_id):
+    """
+    Claim a batch of a course's pending enrollment requests for the current reviewer.
+    Reviewers claiming in parallel get disjoint batches.
+
+    Parameters:
+    - request: the HTTP request object, optionally with `size` (default 50)
+    - course_id: the ID of the course
+
+    Returns:
+    - Response: the claimed enrollment requests
+    """
+
+    serializer = ClaimBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    batch = review_queue.claim_batch(course_id, request.user, serializer.validated_data['size'])
+    return Response(PendingEnrollmentSerializer(batch, many=True).data, status=status.HTTP_200_OK)
+
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def student_list(request):
     """
-    Get the list of students and return it as serialized data.
+    Get a page of students and return it as serialized data.
+
+    Pages are keyset-paginated on the primary key; follow the opaque `next`/`previous`
+    links to move through the list. `page_size` is capped by StudentCursorPagination.
+    Rows are read with values_list() (see read_serializers) and match StudentSerializer.
+    """
+    paginator = StudentCursorPagination()
+    # StudentSerializer only reads user_id/course_id, so no joins are needed
+    page = paginator.paginate_queryset(student_rows.values(Student.objects.all(), 'pk'), request)
+    return paginator.get_paginated_response(student_rows.to_rows(page))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, dataset):
+    """
+    Stream a full dump of students or enrollments.
+
+    Parameters:
+    - request: the HTTP request object; `?output=csv` selects CSV, NDJSON otherwise
+    - dataset: 'students' or 'enrollments'
+
+    Returns:
+    - StreamingHttpResponse: rows are read through a server-side cursor and sent as they arrive
+    """
+
+    if dataset not in exports.DATASETS:
+        return Response({'error': 'Unknown dataset'}, status=status.HTTP_404_NOT_FOUND)
+
+    output = request.query_params.get('output', 'ndjson')
+    if output not in exports.FORMATS:
+        return Response({'error': f'output must be one of {", ".join(exports.FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(exports.stream(dataset, output), content_type=exports.CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_pool_metrics(request):
+    """
+    Counters of this process's database connection pools.
+
+    Parameters:
+    - request: the HTTP request object; `?output=prometheus` selects the Prometheus text format, JSON otherwise
+
+    Returns:
+    - Response: per pool connects, checkouts, waits, timeouts, evictions, wait_seconds, in_use, idle and max_size
+    """
+
+    stats = pool_stats()
+    if request.query_params.get('output') == 'prometheus':
+        return HttpResponse(metrics.to_prometheus('db_pool', 'database', stats), content_type='text/plain; version=0.0.4')
+    return Response(stats, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def login_metrics(request):
     """
-    students = Student.objects.all()
-    serializer = StudentSerializer(students, many=True)
-    return Response(serializer.data)
+    Queue depth, wait times and outcomes of this process's password hashing executor.
+
+    Parameters:
+    - request: the HTTP request object; `?output=prometheus` selects the Prometheus text format, JSON otherwise
+
+    Returns:
+    - Response: workers, queue_size, queued, running, submitted, completed, rejected, timeouts,
+      wait_seconds and wait_max_seconds
+    """
+
+    stats = hashing.get_executor().stats()
+    if request.query_params.get('output') == 'prometheus':
+        return HttpResponse(
+            metrics.to_prometheus('password_hashing', 'executor', {'login': stats}),
+            content_type='text/plain; version=0.0.4',
+        )
+    return Response(stats, status=status.HTTP_200_OK)
 
 #################################SUBJECTS####################################################
 @api_view(['POST'])
@@ -273,24 +528,85 @@ def create_subject(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@query_budget(2)
 @api_view(['GET'])
 def subject_list(request, course_id):
     """
-    Retrieve subjects for the specified course ID
+    Retrieve subjects for the specified course ID.
+    Served from the versioned catalog cache, see catalog.cached_response().
     """
-    
-    try:
-        subjects = Subject.objects.filter(course_id=course_id)
-    except Subject.DoesNotExist:
-        return Response({'error': 'Subjects not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Serialize the subjects data
-    serializer = SubjectSerializer(subjects, many=True)
-
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return catalog.cached_response(
+        request,
+        f'subjects:{course_id}',
+        lambda: subject_rows.to_rows(subject_rows.values(Subject.objects.filter(course_id=course_id).order_by('pk'))),
+    )
 
 #################################COURSESS####################################################
 
+# Raised by the unique (name, course_type) constraint on Course
+DUPLICATE_COURSE = 'A course with the same name and course type already exists.'
+
+@query_budget(2)
+@api_view(['GET'])
+def course_list(request):
+    """
+    List the courses of the catalog.
+    Served from the versioned catalog cache, see catalog.cached_response().
+    """
+
+    return catalog.cached_response(
+        request,
+        'courses',
+        lambda: CatalogCourseSerializer(Course.objects.order_by('pk'), many=True).data,
+    )
+
+# Longest search query accepted, and the default and largest page of search results
+SEARCH_QUERY_MAX_LENGTH = 200
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+@query_budget(3)
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def catalog_search(request):
+    """
+    Search courses and subjects, best matches first, see search.search().
+    Takes the query in `q` and the page in `page` (from 1) and `page_size`.
+    The `next` and `previous` links keep the mode of the first page, so paging
+    through typo-tolerant (trigram) results stays in that mode.
+    """
+
+    query = request.query_params.get('q', '').strip()
+    if not search.terms(query) or len(query) > SEARCH_QUERY_MAX_LENGTH:
+        return Response(
+            {'error': f'q must contain a word and at most {SEARCH_QUERY_MAX_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = min(int(request.query_params.get('page_size', SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if page < 1 or page_size < 1:
+        return Response({'error': 'page and page_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.query_params.get('mode')
+    if mode not in (search.FULLTEXT, search.TRIGRAM):
+        mode = None
+    # One row more than the page tells whether there is a next page, without counting matches
+    rows, mode = search.search(query, page_size + 1, (page - 1) * page_size, mode)
+
+    url = request.build_absolute_uri()
+    if mode != search.BASIC:
+        url = replace_query_param(url, 'mode', mode)
+    return Response({
+        'mode': mode,
+        'next': replace_query_param(url, 'page', page + 1) if len(rows) > page_size else None,
+        'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+        'results': rows[:page_size],
+    })
+
 @api_view(['POST'])
 def create_course(request):
     """
@@ -303,7 +619,11 @@ def create_course(request):
 
     # Validate the data
     if serializer.is_valid():
-        serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            return Response({'error': DUPLICATE_COURSE}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     else:
         # Return an error response if data is not valid
@@ -320,12 +640,23 @@ def update_course(request, course_id):
     except Course.DoesNotExist:
         return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    old_max_capacity = course.max_capacity
+
     # Deserialize the data from the request, passing the existing course object
     serializer = CourseSerializer(instance=course, data=request.data)
 
     # Validate and save the updated course data
     if serializer.is_valid():
-        serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            return Response({'error': DUPLICATE_COURSE}, status=status.HTTP_400_BAD_REQUEST)
+        # Resize the seat shards to the new max_capacity
+        if seats.shard_count() > 1:
+            seats.rebalance_shards(course.id)
+        # Every added seat lets one more student off the waitlist
+        waitlist.promote(course.id, course.max_capacity - old_max_capacity)
         return Response(serializer.data, status=status.HTTP_200_OK)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Enrollment
+from . import seats
+
+
+def queue(course_id):
+    """
+    Waitlisted requests of a course in promotion order, served by the enrollment_waitlist index.
+    """
+
+    return Enrollment.objects.filter(course_id=course_id, status=Enrollment.WAITLISTED).order_by('-waitlist_priority', 'id')
+
+
+def join(student, course):
+    """
+    Put a student on the waitlist of a full course.
+
+    Returns:
+    - Enrollment: the waitlisted request
+    """
+
+    priority = student.average_score if getattr(settings, 'WAITLIST_ORDER', 'arrival') == 'score' else 0
+    return Enrollment.objects.create(
+        student=student, course=course, status=Enrollment.WAITLISTED, waitlist_priority=priority,
+    )
+
+
+def position(enrollment):
+    """
+    1-based position of a waitlisted request in its course's waitlist.
+    """
+
+    ahead = Enrollment.objects.filter(course_id=enrollment.course_id, status=Enrollment.WAITLISTED).filter(
+        Q(waitlist_priority__gt=enrollment.waitlist_priority)
+        | Q(waitlist_priority=enrollment.waitlist_priority, id__lt=enrollment.id)
+    ).count()
+    return ahead + 1
+
+
+def promote(course_id, count=1):
+    """
+    Move the first `count` waitlisted requests of a course to pending, so they join the
+    review queue. The head is read through the waitlist index and locked with
+    SKIP LOCKED, so the cost does not grow with the waitlist and concurrent
+    promotions never pick the same request.
+
+    Returns:
+    - list of int: IDs of the promoted enrollments
+    """
+
+    if count <= 0:
+        return []
+    with transaction.atomic():
+        heads = list(queue(course_id).select_for_update(skip_locked=True).values_list('id', flat=True)[:count])
+        if heads:
+            Enrollment.objects.filter(pk__in=heads).update(status=Enrollment.PENDING)
+    return heads
+
+
+def free_seat(course_id):
+    """
+    Give back the seat of an approved enrollment and promote the head of the waitlist in its place.
+
+    Returns:
+    - list of int: IDs of the promoted enrollments
+    """
+
+    with transaction.atomic():
+        if seats.release_seat(course_id):
+            return promote(course_id)
+    return []
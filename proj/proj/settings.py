@@ -48,7 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.ReadPrimaryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,12 +85,50 @@ WSGI_APPLICATION = 'proj.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'app.backend.postgresql_pool',
         'NAME': 'my_database',
         'USER': 'postgres',
         'PASSWORD': DATABASE_PASSWORD,
         'HOST': 'localhost',
         'PORT': '5432', 
+        # Connections per process: MIN_SIZE opened up front, at most MAX_SIZE, requests wait
+        # up to TIMEOUT seconds for a free one; each is checked with SELECT 1 on checkout
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.getenv('DATABASE_POOL_MAX_SIZE', 20)),
+            'TIMEOUT': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECK': True,
+        },
+    }
+}
+
+# Read replicas, as a comma-separated list of host or host:port in DATABASE_REPLICA_HOSTS.
+# Each becomes a 'replicaN' alias with the primary's other settings; test runs read
+# them through the primary's connection since there is no replication between test databases
+for index, replica in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['app.routers.PrimaryReplicaRouter']
+
+# After a write, the client's reads go to the primary for this many seconds (set it above
+# the replicas' usual lag)
+READ_PRIMARY_COOKIE = 'read_primary'
+READ_PRIMARY_PIN_SECONDS = 10
+
+
+# The cache must be shared by every worker process: it holds the catalog version, cached
+# roles and token revocations, and an entry only one process sees goes unnoticed by the rest
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
     }
 }
 
@@ -119,7 +159,8 @@ AUTHENTICATION_BACKENDS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that trusts role claims of stateless tokens instead of loading the user
+        'app.backend.authentication.StatelessJWTAuthentication',
     ],
 }
 
@@ -128,7 +169,85 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
-TEST_RUNNER = 'django.test.runner.DiscoverRunner'
+# Revoked tokens live in the cache; each process screens lookups with a Bloom filter sized
+# for this many revocations per token lifetime at this false positive rate, and picks up
+# revocations made by other processes at most this many seconds late
+REVOCATION_BLOOM_CAPACITY = 100_000
+REVOCATION_BLOOM_ERROR_RATE = 0.001
+REVOCATION_SYNC_INTERVAL = 1
+
+# Number of counter rows each course's seat count is spread over.
+# 1 keeps the single current_capacity counter on Course.
+SEAT_COUNTER_SHARDS = int(os.getenv('SEAT_COUNTER_SHARDS', 1))
+
+# Seconds a user's resolved roles are kept in the shared cache and in each process's LRU,
+# and how many users the LRU holds
+ROLE_CACHE_TTL = 300
+ROLE_CACHE_LOCAL_TTL = 30
+ROLE_CACHE_LOCAL_SIZE = 10000
+
+# Seconds a rendered catalog response (courses, subjects) is kept; entries are
+# also dropped as soon as the catalog changes
+CATALOG_CACHE_TTL = 24 * 60 * 60
+
+# Catalog search pages through at most this many best matches per table
+SEARCH_MAX_CANDIDATES = 1000
+
+# How long a reviewer keeps the pending enrollments they claimed
+REVIEW_CLAIM_LEASE = timedelta(minutes=15)
+
+# Order of a full course's waitlist: 'arrival' (first come, first served) or 'score'
+# (highest average_score first, then arrival)
+WAITLIST_ORDER = 'arrival'
+
+# Route login and the read endpoints (profile, courses, subjects, student list) to the native
+# async views in app/async_views.py. proj/asgi.py turns this on; under WSGI the DRF views
+# are cheaper since every async view would need its own event loop
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '0') == '1'
+
+# Rows POST /students/register/ takes per request. Every password is hashed on the request
+# thread, so larger intakes go through `manage.py bulk_register_students`
+MAX_BULK_ROWS = int(os.getenv('MAX_BULK_ROWS', 100))
+
+# Password checks at login run on a bounded thread pool (app/hashing.py): this many at
+# once (default: half the CPUs), at most LOGIN_HASH_QUEUE more waiting, each for at most
+# LOGIN_HASH_QUEUE_TIMEOUT seconds; logins beyond that get a 503
+LOGIN_HASH_WORKERS = int(os.getenv('LOGIN_HASH_WORKERS', 0)) or None
+LOGIN_HASH_QUEUE = int(os.getenv('LOGIN_HASH_QUEUE', 64))
+LOGIN_HASH_QUEUE_TIMEOUT = float(os.getenv('LOGIN_HASH_QUEUE_TIMEOUT', 2))
+
+# A request that runs the same SQL shape this many times is logged as a probable N+1
+QUERY_REPEAT_THRESHOLD = 5
+# Raise instead of only logging when a view exceeds its @query_budget; the test runner turns it on
+QUERY_BUDGET_STRICT = False
+
+# One JSON line per request (query count, database and total time) on the 'app.requests' logger
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'app.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# How much worse than the stored baseline an endpoint may get before bench_endpoints fails:
+# relative change per metric (throughput may drop, the others may grow by this fraction)
+BENCHMARK_THRESHOLDS = {
+    'p50_ms': 0.25,
+    'p95_ms': 0.35,
+    'p99_ms': 0.50,
+    'rps': 0.20,
+    'queries': 0,
+}
+
+TEST_RUNNER = 'app.test_runner.QueryBudgetTestRunner'
 FIXTURE_DIRS = [
     os.path.join(BASE_DIR, 'app', 'fixtures'),
 ]